@@ -0,0 +1,107 @@
+# bench_account_search.py
+# Purpose: Account Explorer selectbox cost as the account count grows, on the local backend.
+#   full:   the old path — select every account, build a label per row, ship all labels
+#   search: the typeahead path — top-N ILIKE matches for a typed term (account_search_sql)
+#
+#   Reports query + label-build latency and the payload pushed into st.selectbox
+#   (bytes of the option labels) for each account count.
+#
+# Usage: python benchmarks/bench_account_search.py [--sizes 10000 50000 200000] [--limit 50]
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "sql" / "30_streamlit+cortex"))
+
+from query_backend import LocalBackend  # noqa: E402
+from query_builder import account_search_sql, normalize_search_term  # noqa: E402
+
+
+ACCOUNTS_TBL = "GTM_COPILOT.RAW.ACCOUNTS"
+TERMS = ["a", "acme 1", "globex 42", "A0012", "initech"]
+NAMES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Wonka"]
+
+
+def synthetic_accounts(n: int) -> pd.DataFrame:
+    ids = pd.RangeIndex(n)
+    return pd.DataFrame({
+        "account_id": [f"A{i:07d}" for i in ids],
+        "account_name": [f"{NAMES[i % len(NAMES)]} {i}" for i in ids],
+        "segment": ["SMB", "Mid-Market", "Enterprise"] * (n // 3) + ["SMB"] * (n % 3),
+        "region": "NA",
+        "industry": "Technology",
+        "owner_rep_id": "R1",
+        "website": [f"https://example{i}.com" for i in ids],
+    })
+
+
+def _labels(df: pd.DataFrame) -> List[str]:
+    df = df.copy()
+    df["ACCOUNT_ID"] = df["ACCOUNT_ID"].astype(str)
+    df["ACCOUNT_NAME"] = df["ACCOUNT_NAME"].fillna("").astype(str)
+    return (df["ACCOUNT_NAME"] + " (" + df["ACCOUNT_ID"] + ")").tolist()
+
+
+def _payload_bytes(labels: List[str]) -> int:
+    return len(json.dumps(labels).encode("utf-8"))
+
+
+def bench_size(n: int, limit: int, repeats: int) -> Dict[str, float]:
+    backend = LocalBackend()
+    backend.load_frame(ACCOUNTS_TBL, synthetic_accounts(n))
+
+    full_s: List[float] = []
+    full_bytes = 0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        df = backend.query(f"select account_id, account_name, segment, region, industry, owner_rep_id, website from {ACCOUNTS_TBL}")
+        labels = _labels(df)
+        full_s.append(time.perf_counter() - t0)
+        full_bytes = _payload_bytes(labels)
+
+    search_s: List[float] = []
+    search_bytes: List[int] = []
+    for _ in range(repeats):
+        for term in TERMS:
+            t0 = time.perf_counter()
+            sql, params = account_search_sql(ACCOUNTS_TBL, normalize_search_term(term), limit)
+            labels = _labels(backend.query(sql, params))
+            search_s.append(time.perf_counter() - t0)
+            search_bytes.append(_payload_bytes(labels))
+
+    return {
+        "accounts": n,
+        "full_ms": round(1000 * statistics.median(full_s), 1),
+        "full_kb": round(full_bytes / 1024, 1),
+        "search_ms": round(1000 * statistics.median(search_s), 1),
+        "search_kb": round(max(search_bytes) / 1024, 1),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Account Explorer: full account list vs top-N typeahead search")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 200_000])
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = ap.parse_args()
+
+    rows = [bench_size(n, args.limit, args.repeats) for n in args.sizes]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'accounts':>9} {'full ms':>9} {'full KB':>9} {'search ms':>10} {'search KB':>10}")
+    for r in rows:
+        print(f"{r['accounts']:>9} {r['full_ms']:>9} {r['full_kb']:>9} {r['search_ms']:>10} {r['search_kb']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# bench_filter_cache_keys.py
+# Purpose: Compare cache hit rate of the legacy f-string filter SQL vs the canonical
+#   AccountFilter + bind-parameter templates, on simulated sidebar sessions sharing one cache.
+#
+#   Each session starts from the default sidebar (every value selected, in sorted domain
+#   order) and then, per rerun: keeps its filters (view switch / other widget), toggles one
+#   value, drops and re-picks a value (same set, new order: st.multiselect appends picks at
+#   the end), resets to the defaults, or changes the date range. Only the re-ordered
+#   selections produce SQL text the legacy keys had not seen for the same logical filter.
+#
+# Usage: python benchmarks/bench_filter_cache_keys.py [--sessions 200] [--reruns 25] [--seed 7]
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "sql" / "30_streamlit+cortex"))
+
+from query_builder import AccountFilter  # noqa: E402
+
+
+DOMAINS: Dict[str, List[str]] = {
+    "segments": ["Enterprise", "Mid-Market", "SMB"],
+    "regions": ["APAC", "EMEA", "LATAM", "NA"],
+    "industries": ["Education", "Finance", "Healthcare", "Manufacturing", "Media", "Retail", "Technology", "Travel"],
+    "rep_teams": ["Enterprise", "Growth", "Strategic"],
+    "rep_regions": ["APAC", "EMEA", "NA"],
+}
+
+TEMPLATE = """
+select m.account_id, m.month, m.total_mrr
+from GTM_COPILOT.MARTS.FCT_MRR_COMPLETE m
+join GTM_COPILOT.RAW.ACCOUNTS a on a.account_id = m.account_id
+left join GTM_COPILOT.RAW.SALES_REPS r on r.rep_id = a.owner_rep_id
+where m.month >= {start} and m.month <= {end} and {filter_sql}
+"""
+
+
+def _legacy_quote(values: List[str]) -> str:
+    return ", ".join("'" + v.replace("'", "''") + "'" for v in values)
+
+
+def legacy_sql(sel: Dict[str, List[str]], start: str, end: str) -> str:
+    cols = {"segments": "a.segment", "regions": "a.region", "industries": "a.industry", "rep_teams": "r.team", "rep_regions": "r.region"}
+    clauses = [f"{cols[k]} in ({_legacy_quote(v)})" for k, v in sel.items() if v]
+    return TEMPLATE.format(start=f"'{start}'", end=f"'{end}'", filter_sql=" and ".join(clauses) or "1=1")
+
+
+def bound_sql(sel: Dict[str, List[str]], start: str, end: str) -> Tuple[str, Tuple[str, ...]]:
+    flt = AccountFilter.from_selections(**sel)
+    filter_sql, params = flt.to_sql()
+    return TEMPLATE.format(start="?", end="?", filter_sql=filter_sql), (start, end, *params)
+
+
+# Per-rerun interaction mix
+ACTIONS = {"keep": 0.35, "toggle": 0.35, "reorder": 0.15, "reset": 0.05, "dates": 0.10}
+DATE_RANGES = [("2023-01-01", "2024-12-01"), ("2024-01-01", "2024-12-01"), ("2024-07-01", "2024-12-01")]
+
+
+def default_selection() -> Dict[str, List[str]]:
+    return {k: list(v) for k, v in DOMAINS.items()}
+
+
+def toggle(rng: random.Random, sel: Dict[str, List[str]]) -> None:
+    # Remove a selected value (never the last one) or pick a missing one (appended)
+    k = rng.choice(list(DOMAINS))
+    missing = [v for v in DOMAINS[k] if v not in sel[k]]
+    if missing and (len(sel[k]) == 1 or rng.random() < 0.5):
+        sel[k].append(rng.choice(missing))
+    else:
+        sel[k].remove(rng.choice(sel[k]))
+
+
+def reorder(rng: random.Random, sel: Dict[str, List[str]]) -> None:
+    # Drop a value and pick it again: the same set, with that value moved to the end
+    k = rng.choice([d for d in DOMAINS if len(sel[d]) > 1] or list(DOMAINS))
+    v = rng.choice(sel[k])
+    sel[k].remove(v)
+    sel[k].append(v)
+
+
+def simulate(sessions: int, reruns: int, seed: int) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(seed)
+    actions, weights = list(ACTIONS), list(ACTIONS.values())
+
+    seen = {"legacy": set(), "bound": set()}
+    hits = {"legacy": 0, "bound": 0}
+    texts = {"legacy": set(), "bound": set()}
+    requests = 0
+
+    for _ in range(sessions):
+        sel = default_selection()
+        start, end = DATE_RANGES[0]
+        for i in range(reruns):
+            action = "keep" if i == 0 else rng.choices(actions, weights=weights, k=1)[0]
+            if action == "toggle":
+                toggle(rng, sel)
+            elif action == "reorder":
+                reorder(rng, sel)
+            elif action == "reset":
+                sel = default_selection()
+            elif action == "dates":
+                start, end = rng.choice(DATE_RANGES)
+
+            legacy_key = legacy_sql(sel, start, end)
+            bound_key = bound_sql(sel, start, end)
+            for name, key, text in (("legacy", legacy_key, legacy_key), ("bound", bound_key, bound_key[0])):
+                if key in seen[name]:
+                    hits[name] += 1
+                seen[name].add(key)
+                texts[name].add(text)
+            requests += 1
+
+    return {
+        name: {
+            "requests": requests,
+            "cache_hits": hits[name],
+            "hit_rate_pct": round(100 * hits[name] / requests, 2),
+            "distinct_cache_keys": len(seen[name]),
+            "distinct_sql_texts": len(texts[name]),
+        }
+        for name in ("legacy", "bound")
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Filter cache-key hit rate: legacy f-string SQL vs bind parameters")
+    ap.add_argument("--sessions", type=int, default=200)
+    ap.add_argument("--reruns", type=int, default=25, help="reruns (cache lookups) per session")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = ap.parse_args()
+
+    result = simulate(args.sessions, args.reruns, args.seed)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{'mode':<8} {'hit rate':>9} {'cache keys':>11} {'sql texts':>10}")
+    for name, r in result.items():
+        print(f"{name:<8} {r['hit_rate_pct']:>8.2f}% {r['distinct_cache_keys']:>11} {r['distinct_sql_texts']:>10}")
+
+
+if __name__ == "__main__":
+    main()
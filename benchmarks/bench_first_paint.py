@@ -0,0 +1,84 @@
+# bench_first_paint.py
+# Purpose: Measure first paint of the Streamlit app (script rerun until the page is built)
+#   on the local DuckDB backend, with Streamlit's headless AppTest runner.
+#
+#   cold:          st.cache_data cleared, default view (what a new filter combination costs)
+#   warm:          same inputs again, everything served from cache
+#   filter change: one sidebar filter changed (new cache keys for every filtered dataset)
+#
+#   Run it against an older copy of streamlitcode.py (--script) to compare before / after.
+#
+# Usage:
+#   GTM_LOCAL_DATA_DIR=/path/to/data python benchmarks/bench_first_paint.py [--runs 5] [--script PATH]
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+APP_DIR = Path(__file__).resolve().parents[1] / "sql" / "30_streamlit+cortex"
+sys.path.insert(0, str(APP_DIR))
+
+
+def _timed_run(at) -> float:
+    t0 = time.perf_counter()
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"app raised: {[e.value for e in at.exception]}")
+    return time.perf_counter() - t0
+
+
+def measure(script: Path, runs: int) -> Dict[str, Dict[str, float]]:
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    samples: Dict[str, List[float]] = {"cold": [], "warm": [], "filter_change": []}
+
+    # Warm-up: builds the local backend (st.cache_resource) outside the measured runs
+    AppTest.from_file(str(script), default_timeout=300).run()
+
+    for _ in range(runs):
+        st.cache_data.clear()
+        at = AppTest.from_file(str(script), default_timeout=300)
+        samples["cold"].append(_timed_run(at))
+        samples["warm"].append(_timed_run(at))
+        segments = at.sidebar.multiselect[0]
+        if segments.options:
+            segments.set_value(segments.options[:1])
+        samples["filter_change"].append(_timed_run(at))
+
+    return {
+        name: {"median_s": round(statistics.median(v), 3), "min_s": round(min(v), 3), "runs": len(v)}
+        for name, v in samples.items()
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="First paint of the Streamlit app on the local backend")
+    ap.add_argument("--script", type=Path, default=APP_DIR / "streamlitcode.py")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = ap.parse_args()
+
+    os.environ.setdefault("GTM_QUERY_BACKEND", "local")
+    os.environ.setdefault("GTM_LOCAL_BUILD_MARTS", "1")
+    if not os.environ.get("GTM_LOCAL_DATA_DIR"):
+        ap.error("set GTM_LOCAL_DATA_DIR to a directory with RAW/*.parquet|csv")
+
+    result = measure(args.script.resolve(), args.runs)
+    if args.json:
+        print(json.dumps({"script": str(args.script), **result}, indent=2))
+        return
+
+    print(f"script: {args.script}")
+    print(f"{'scenario':<14} {'median':>8} {'min':>8}")
+    for name, r in result.items():
+        print(f"{name:<14} {r['median_s']:>7.3f}s {r['min_s']:>7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
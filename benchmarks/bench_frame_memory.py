@@ -0,0 +1,94 @@
+# bench_frame_memory.py
+# Purpose: Memory held by query result frames for one app session (default filters, every
+#   view opened once) on the local DuckDB backend, with and without the dtype compaction
+#   in query_backend.compact_frame (GTM_COMPACT_FRAMES=1 / 0; dates and decimals are decoded
+#   either way, 0 skips the category / int32 narrowing).
+#
+#   Every frame returned by the backend is measured with memory_usage(deep=True); the
+#   shared result cache is off so each query reaches the backend. Each mode runs in its
+#   own process (the flag is read at import).
+#
+# Usage:
+#   GTM_LOCAL_DATA_DIR=/path/to/data python benchmarks/bench_frame_memory.py [--json]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Dict
+
+APP_DIR = Path(__file__).resolve().parents[1] / "sql" / "30_streamlit+cortex"
+sys.path.insert(0, str(APP_DIR))
+
+
+def measure_session(script: Path) -> Dict[str, object]:
+    from streamlit.testing.v1 import AppTest
+
+    import query_backend
+
+    frames = {"n": 0, "bytes": 0, "rows": 0}
+    dtypes: Counter = Counter()
+    query = query_backend.LocalBackend.query
+
+    def measured_query(self, sql, params=None):
+        df = query(self, sql, params)
+        frames["n"] += 1
+        frames["rows"] += len(df)
+        frames["bytes"] += int(df.memory_usage(deep=True).sum())
+        dtypes.update(str(t) for t in df.dtypes)
+        return df
+
+    query_backend.LocalBackend.query = measured_query
+    at = AppTest.from_file(str(script), default_timeout=300)
+    at.run()
+    for view in at.radio[0].options:
+        at.radio[0].set_value(view).run()
+        if at.exception:
+            raise RuntimeError(f"{view} raised: {[e.value for e in at.exception]}")
+    return {**frames, "mb": round(frames["bytes"] / (1024 * 1024), 3), "dtypes": dict(dtypes.most_common())}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Result frame memory per session: compact vs as-returned dtypes")
+    ap.add_argument("--script", type=Path, default=APP_DIR / "streamlitcode.py")
+    ap.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    ap.add_argument("--_child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    os.environ.setdefault("GTM_QUERY_BACKEND", "local")
+    os.environ.setdefault("GTM_LOCAL_BUILD_MARTS", "1")
+    os.environ["GTM_RESULT_CACHE"] = "off"
+    if not os.environ.get("GTM_LOCAL_DATA_DIR"):
+        ap.error("set GTM_LOCAL_DATA_DIR to a directory with RAW/*.parquet|csv")
+
+    if args._child:
+        print(json.dumps(measure_session(args.script.resolve())))
+        return
+
+    result = {}
+    for mode, flag in (("as_returned", "0"), ("compact", "1")):
+        out = subprocess.run(
+            [sys.executable, __file__, "--_child", "--script", str(args.script)],
+            env={**os.environ, "GTM_COMPACT_FRAMES": flag},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{'mode':<12} {'queries':>8} {'rows':>9} {'MB':>8}")
+    for mode, r in result.items():
+        print(f"{mode:<12} {r['n']:>8} {r['rows']:>9} {r['mb']:>8.3f}")
+    before, after = result["as_returned"]["bytes"], result["compact"]["bytes"]
+    if before:
+        print(f"compact frames use {100 * (1 - after / before):.1f}% less memory")
+
+
+if __name__ == "__main__":
+    main()
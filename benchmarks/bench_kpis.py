@@ -0,0 +1,142 @@
+# bench_kpis.py
+# Purpose: Micro-benchmark of the headline KPI derivation: the legacy top-level block
+#   (copy + to_datetime + filter + sort + max per series) vs kpis.compute_kpis (one
+#   vectorized pass per series, no copies), on synthetic ARR / retention / closed-revenue
+#   frames shaped like the app's datasets. Both must produce the same numbers.
+#
+# Usage: python benchmarks/bench_kpis.py [--months 24 120 600] [--repeat 200] [--json]
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "sql" / "30_streamlit+cortex"))
+
+from kpis import compute_kpis  # noqa: E402
+
+
+def make_frames(months: int, seed: int = 7) -> Dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range("2000-01-01", periods=months, freq="MS")
+    arr = pd.DataFrame({"MONTH": idx, "TOTAL_ARR": rng.uniform(1e6, 5e6, months).round(2)})
+    start = rng.uniform(1e5, 4e5, months - 1).round(2)
+    ret = pd.DataFrame({
+        "MONTH": idx[:-1],
+        "START_MRR": start,
+        "END_MRR": (start * rng.uniform(0.9, 1.1, months - 1)).round(2),
+        "NRR_PCT": rng.uniform(85, 115, months - 1).round(2),
+        "GRR_PCT": rng.uniform(80, 100, months - 1).round(2),
+    })
+    closed = pd.DataFrame({
+        "CLOSE_MONTH": idx,
+        "TOTAL_CLOSED_REVENUE": rng.uniform(0, 2e5, months).round(2),
+        "WIN_RATE_PCT": rng.uniform(10, 40, months).round(2),
+    })
+    coverage = pd.DataFrame({
+        "TOTAL_OPEN_PIPELINE": [1.2e6], "AVG_3M_CLOSED_REVENUE": [1e5], "PIPELINE_COVERAGE_RATIO": [12.0],
+    })
+    # Shuffled rows: the derivation must not rely on query order
+    return {
+        "arr": arr.sample(frac=1, random_state=seed).reset_index(drop=True),
+        "ret": ret.sample(frac=1, random_state=seed).reset_index(drop=True),
+        "closed": closed.sample(frac=1, random_state=seed).reset_index(drop=True),
+        "coverage": coverage,
+    }
+
+
+def legacy_kpis(arr_df: pd.DataFrame, ret_df: pd.DataFrame, closed_df: pd.DataFrame) -> Dict[str, Optional[float]]:
+    # The top-level KPI block before kpis.py
+    arr_latest = arr_prev = None
+    arr_tmp = arr_df.copy()
+    arr_tmp["MONTH"] = pd.to_datetime(arr_tmp["MONTH"])
+    arr_valid = arr_tmp[arr_tmp["TOTAL_ARR"] > 0]
+    if not arr_valid.empty:
+        arr_valid = arr_valid.sort_values("MONTH")
+        latest_arr_ts = arr_valid["MONTH"].max()
+        arr_latest = float(arr_valid[arr_valid["MONTH"] == latest_arr_ts]["TOTAL_ARR"].iloc[0])
+        if len(arr_valid) >= 2:
+            arr_prev = float(arr_valid.iloc[-2]["TOTAL_ARR"])
+
+    nrr_latest = grr_latest = nrr_prev = None
+    tmp = ret_df.copy()
+    tmp["MONTH"] = pd.to_datetime(tmp["MONTH"])
+    ret_valid = tmp[tmp["START_MRR"] > 0]
+    if not ret_valid.empty:
+        latest_ret_ts = ret_valid["MONTH"].max()
+        ret_slice = ret_valid[ret_valid["MONTH"] == latest_ret_ts]
+        nrr_latest = float(ret_slice.iloc[0]["NRR_PCT"])
+        grr_latest = float(ret_slice.iloc[0]["GRR_PCT"])
+        ret_history = ret_valid[ret_valid["MONTH"] <= latest_ret_ts].sort_values("MONTH")
+        if len(ret_history) >= 2:
+            nrr_prev = float(ret_history.iloc[-2]["NRR_PCT"])
+
+    win_latest = win_prev = None
+    close_tmp = closed_df.copy()
+    close_tmp["CLOSE_MONTH"] = pd.to_datetime(close_tmp["CLOSE_MONTH"])
+    close_valid = close_tmp[close_tmp["TOTAL_CLOSED_REVENUE"] > 0]
+    if not close_valid.empty:
+        close_valid = close_valid.sort_values("CLOSE_MONTH")
+        latest_close_ts = close_valid["CLOSE_MONTH"].max()
+        win_latest = float(close_valid[close_valid["CLOSE_MONTH"] == latest_close_ts].iloc[0]["WIN_RATE_PCT"])
+        if len(close_valid) >= 2:
+            win_prev = float(close_valid.iloc[-2]["WIN_RATE_PCT"])
+
+    return {
+        "arr_latest": arr_latest, "arr_prev": arr_prev, "nrr_latest": nrr_latest, "nrr_prev": nrr_prev,
+        "grr_latest": grr_latest, "win_latest": win_latest, "win_prev": win_prev,
+    }
+
+
+def _time(fn, repeat: int) -> float:
+    samples: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="KPI derivation: legacy block vs kpis.compute_kpis")
+    ap.add_argument("--months", type=int, nargs="+", default=[24, 120, 600])
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = ap.parse_args()
+
+    results = []
+    for months in args.months:
+        f = make_frames(months)
+        old = legacy_kpis(f["arr"], f["ret"], f["closed"])
+        new = compute_kpis(f["arr"], f["ret"], f["closed"], f["coverage"])
+        same = old == {
+            "arr_latest": new.arr.latest, "arr_prev": new.arr.prev, "nrr_latest": new.nrr.latest,
+            "nrr_prev": new.nrr.prev, "grr_latest": new.grr.latest, "win_latest": new.win_rate.latest,
+            "win_prev": new.win_rate.prev,
+        }
+        legacy_ms = _time(lambda: legacy_kpis(f["arr"], f["ret"], f["closed"]), args.repeat)
+        kpis_ms = _time(lambda: compute_kpis(f["arr"], f["ret"], f["closed"], f["coverage"]), args.repeat)
+        results.append({
+            "months": months,
+            "legacy_ms": round(legacy_ms, 3),
+            "compute_kpis_ms": round(kpis_ms, 3),
+            "speedup": round(legacy_ms / kpis_ms, 1) if kpis_ms else None,
+            "same_values": same,
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'months':>7} {'legacy':>10} {'kpis':>10} {'speedup':>8}  same")
+    for r in results:
+        print(f"{r['months']:>7} {r['legacy_ms']:>8.3f}ms {r['compute_kpis_ms']:>8.3f}ms {r['speedup']:>7}x  {r['same_values']}")
+
+
+if __name__ == "__main__":
+    main()
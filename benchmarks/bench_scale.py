@@ -0,0 +1,325 @@
+# bench_scale.py
+# Purpose: How the marts build and the app's datasets scale with the number of accounts.
+#   For each scale: synthetic RAW tables (synthetic_data.py) loaded into the local DuckDB
+#   backend, every sql/10_marts script, then every dataset the app shows, through the
+#   gtm_metrics engine (default filter, full MRR window). Per step:
+#     - latency
+#     - peak Python memory of each dataset (tracemalloc: result frames and pandas work),
+#       from a second traced run so tracing overhead stays out of the latency
+#     - peak DuckDB buffer memory (the in-memory tables included) and rows scanned, from
+#       DuckDB's JSON query profile
+#     - SQL statements run and rows returned
+#   Dataset latency is the median of --repeat runs. Datasets run one at a time with the
+#   engine's frame memo off, so each step includes the MRR cube / rollup fetch it needs (the
+#   app shares one per filter state); `kpis` is the app's concurrent KPI fan-out end to end.
+#
+#   Every run is appended to a JSON history (--history); the report shows each step's
+#   latency against the previous run at the same scale, so regressions are visible.
+#
+#   The local backend keeps every table in memory: DuckDB peaks around 1.5 GB at 100k
+#   accounts, so the 1M scale needs a machine with ~16 GB.
+#
+# Usage: python benchmarks/bench_scale.py [--accounts 10000 100000 1000000] [--months 24]
+#          [--repeat 3] [--history PATH | --no-history] [--no-memory] [--json]
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "sql" / "30_streamlit+cortex"))
+
+import dataset_sql  # noqa: E402
+from gtm_metrics import DatasetTables, MetricsEngine, resolve_tables  # noqa: E402
+from query_backend import DB, MARTS_SQL_DIR, LocalBackend, _upper_columns, translate_snowflake_sql  # noqa: E402
+from query_builder import account_search_sql  # noqa: E402
+from synthetic_data import DEFAULT_END_MONTH, generate  # noqa: E402
+
+DEFAULT_HISTORY = Path(__file__).resolve().parent / "bench_scale_history.json"
+MB = 1024 * 1024
+
+
+class ProfilingBackend(LocalBackend):
+    # LocalBackend that runs every statement with DuckDB's JSON profiler on its own cursor
+    def __init__(self, profile_dir: str):
+        super().__init__()
+        self.profile_dir = profile_dir
+        self.profiles: List[Dict[str, Any]] = []
+        self._seq = itertools.count()
+        self._profiles_lock = threading.Lock()
+
+    def _profiled(self, sql: str, params: Optional[Sequence[Any]]) -> Any:
+        path = os.path.join(self.profile_dir, f"q{next(self._seq)}.json")
+        cur = self.con.cursor()
+        try:
+            cur.execute("pragma enable_profiling = 'json'")
+            cur.execute(f"pragma profiling_output = '{path}'")
+            cur.execute(translate_snowflake_sql(sql), list(params or []))
+            df = cur.df() if cur.description else None
+        finally:
+            cur.close()
+        self._stamp(sql)
+        profile = _read_profile(path)
+        with self._profiles_lock:
+            self.profiles.append(profile)
+        return df
+
+    def query(self, sql: str, params: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        return _upper_columns(self._profiled(sql, params))
+
+    def execute(self, sql: str, params: Optional[Sequence[Any]] = None) -> None:
+        self._profiled(sql, params)
+
+    def take_profiles(self) -> List[Dict[str, Any]]:
+        with self._profiles_lock:
+            out, self.profiles = self.profiles, []
+        return out
+
+
+def _read_profile(path: str) -> Dict[str, Any]:
+    # Top-level totals of the query profile (older DuckDB builds omit some: None)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            p = json.load(f)
+        os.remove(path)
+    except Exception:
+        return {}
+    peak = p.get("system_peak_buffer_memory")
+    return {
+        "rows_scanned": p.get("cumulative_rows_scanned"),
+        "db_peak_mb": round(peak / MB, 1) if peak is not None else None,
+    }
+
+
+def _rows(out: Any) -> Optional[int]:
+    if isinstance(out, int):  # load_frame
+        return out
+    if isinstance(out, pd.DataFrame):
+        return len(out)
+    if isinstance(out, tuple) and out and all(isinstance(x, pd.DataFrame) for x in out):
+        return sum(len(x) for x in out)
+    if isinstance(out, list):
+        return len(out)
+    return None
+
+
+def _py_peak_mb(fn: Callable[[], Any]) -> float:
+    # A second, traced run: tracemalloc slows pandas work several times over, so latency
+    # always comes from the untraced run
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / MB, 1)
+
+
+def measure(
+    backend: ProfilingBackend, step: str, fn: Callable[[], Any], repeat: int = 1, trace_memory: bool = False
+) -> Dict[str, Any]:
+    # Latency: median of `repeat` runs; profile totals from the first
+    backend.take_profiles()
+    samples: List[float] = []
+    for i in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn()
+        samples.append(time.perf_counter() - t0)
+        if i == 0:
+            profiles = backend.take_profiles()
+    elapsed = statistics.median(samples)
+    py_peak = _py_peak_mb(fn) if trace_memory else None
+    backend.take_profiles()
+    scanned = [p["rows_scanned"] for p in profiles if p.get("rows_scanned") is not None]
+    db_peaks = [p["db_peak_mb"] for p in profiles if p.get("db_peak_mb") is not None]
+    return {
+        "step": step,
+        "elapsed_s": round(elapsed, 4),
+        "py_peak_mb": py_peak,
+        "db_peak_mb": max(db_peaks) if db_peaks else None,
+        "rows_scanned": sum(scanned) if scanned else None,
+        "queries": len(profiles),
+        "rows": _rows(out),
+    }
+
+
+def dataset_steps(engine: MetricsEngine) -> Dict[str, Callable[[], Any]]:
+    # Every dataset the app's cached getters serve, in view order
+    start_d, end_d = engine.date_bounds()
+    f = engine.default_filter()
+    cohort = (pd.Timestamp(end_d) - pd.DateOffset(months=1)).date()
+    search_sql, search_params = account_search_sql(engine.tables.accounts, "account 12", 50)
+    return {
+        "filter_domains": engine.filter_domains,
+        "date_bounds": engine.date_bounds,
+        "mrr_cube": lambda: engine.query_mrr_cube(start_d, end_d, f),
+        "mrr_rollup_monthly": lambda: engine.query_mrr_rollup_monthly(start_d, end_d, f),
+        "arr_trend": lambda: engine.arr_trend(start_d, end_d, f),
+        "retention_trend": lambda: engine.retention_trend(start_d, end_d, f),
+        "closed_revenue_monthly": lambda: engine.closed_revenue_monthly(start_d, end_d, f),
+        "pipeline_coverage": lambda: engine.pipeline_coverage(start_d, end_d, f),
+        "open_pipeline_by_stage": lambda: engine.open_pipeline_by_stage(f),
+        "kpis": lambda: engine.kpis(start_d, end_d, f),
+        "mrr_movement_summary": lambda: engine.mrr_movement_summary(start_d, end_d, f),
+        "top_mrr_movers": lambda: engine.top_mrr_movers(start_d, end_d, f),
+        "retention_data_quality": lambda: engine.retention_data_quality(start_d, end_d, f, cohort),
+        "health_snapshot": lambda: engine.health_snapshot(start_d, end_d, f),
+        "ticket_counts_90d": lambda: engine.ticket_counts_90d(end_d),
+        "stage_durations": lambda: engine.stage_durations(f),
+        "stage_conversion": lambda: engine.stage_conversion(f),
+        "search_accounts": lambda: engine.query(search_sql, tuple(search_params)),
+        "data_quality_checks": engine.data_quality_checks,
+    }
+
+
+def _load(backend: ProfilingBackend, name: str, df: pd.DataFrame) -> Dict[str, Any]:
+    return measure(backend, f"load RAW.{name}", lambda: backend.load_frame(f"{DB}.RAW.{name}", df))
+
+
+def run_scale(accounts: int, months: int, seed: int, repeat: int = 3, trace_memory: bool = True) -> Dict[str, Any]:
+    steps: List[Dict[str, Any]] = []
+    raw_rows: Dict[str, int] = {}
+    with tempfile.TemporaryDirectory(prefix="gtm_bench_") as profile_dir:
+        backend = ProfilingBackend(profile_dir)
+        try:
+            # One table in memory at a time: each frame is dropped once DuckDB has it
+            for name, df in generate(accounts, months, DEFAULT_END_MONTH, seed):
+                raw_rows[name] = len(df)
+                steps.append(_load(backend, name, df))
+                df = None
+
+            for script in sorted(MARTS_SQL_DIR.glob("*.sql")):
+                steps.append(measure(backend, f"mart {script.stem}", lambda: backend.run_script(script)))
+
+            resolved: Dict[str, Optional[str]] = {}
+            steps.append(measure(backend, "resolve_tables", lambda: resolved.update(resolve_tables(backend))))
+            missing = [k for k in dataset_sql.REQUIRED_TABLES if not resolved.get(k)]
+            if missing:
+                raise RuntimeError(f"missing required tables after the marts build: {', '.join(missing)}")
+            engine = MetricsEngine(backend.query, DatasetTables.from_resolved(resolved), frame_cache_size=0)
+            for step, fn in dataset_steps(engine).items():
+                steps.append(measure(backend, step, fn, repeat, trace_memory))
+        finally:
+            backend.con.close()
+    return {"accounts": accounts, "raw_rows": raw_rows, "steps": steps}
+
+
+# -----------------------------
+# History
+# -----------------------------
+def load_history(path: Path) -> List[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            runs = json.load(f)
+        return runs if isinstance(runs, list) else []
+    except FileNotFoundError:
+        return []
+
+
+def append_history(path: Path, run: Dict[str, Any]) -> None:
+    runs = load_history(path) + [run]
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(runs, f, indent=1)
+    os.replace(tmp, path)
+
+
+def previous_steps(history: List[Dict[str, Any]], accounts: int, months: int) -> Dict[str, Dict[str, Any]]:
+    # Steps of the latest earlier run at the same scale and window
+    for run in reversed(history):
+        if run.get("months") != months:
+            continue
+        for scale in run.get("scales", []):
+            if scale.get("accounts") == accounts:
+                return {s["step"]: s for s in scale.get("steps", [])}
+    return {}
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, timeout=10,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _fmt(v: Any, width: int, spec: str = "") -> str:
+    return f"{'-':>{width}}" if v is None else f"{v:>{width}{spec}}"
+
+
+def print_report(run: Dict[str, Any], history: List[Dict[str, Any]]) -> None:
+    print(f"run {run['run_at']}  rev {run['git_rev'] or '?'}  duckdb {run['duckdb']}  months {run['months']}")
+    for scale in run["scales"]:
+        prev = previous_steps(history, scale["accounts"], run["months"])
+        print()
+        print(f"accounts: {scale['accounts']:,}  " + "  ".join(f"{k}={v:,}" for k, v in scale["raw_rows"].items()))
+        print(
+            f"{'step':<44} {'latency':>9} {'vs prev':>8} {'py MB':>8} {'db MB':>8} "
+            f"{'scanned':>12} {'rows':>10} {'sql':>4}"
+        )
+        for s in scale["steps"]:
+            p = prev.get(s["step"])
+            delta = "-"
+            if p and p.get("elapsed_s"):
+                delta = f"{(s['elapsed_s'] / p['elapsed_s'] - 1) * 100:+.0f}%"
+            print(
+                f"{s['step']:<44} {s['elapsed_s']:>8.3f}s {delta:>8} {_fmt(s['py_peak_mb'], 8, '.1f')} "
+                f"{_fmt(s['db_peak_mb'], 8, '.1f')} {_fmt(s['rows_scanned'], 12, ',')} {_fmt(s['rows'], 10, ',')} {s['queries']:>4}"
+            )
+        total = sum(s["elapsed_s"] for s in scale["steps"])
+        print(f"{'total':<44} {total:>8.3f}s")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Marts build + app datasets at 10k / 100k / 1M synthetic accounts")
+    ap.add_argument("--accounts", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ap.add_argument("--months", type=int, default=24)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--history", type=Path, default=DEFAULT_HISTORY, help="JSON file the run is appended to")
+    ap.add_argument("--no-history", action="store_true", help="don't append this run")
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per dataset (median)")
+    ap.add_argument("--no-memory", action="store_true", help="skip the traced second run of each dataset")
+    ap.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = ap.parse_args()
+
+    import duckdb
+
+    history = load_history(args.history)
+    run: Dict[str, Any] = {
+        "run_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "duckdb": duckdb.__version__,
+        "pandas": pd.__version__,
+        "months": args.months,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "scales": [run_scale(n, args.months, args.seed, args.repeat, not args.no_memory) for n in args.accounts],
+    }
+    if not args.no_history:
+        append_history(args.history, run)
+
+    if args.json:
+        print(json.dumps(run, indent=2))
+        return
+    print_report(run, history)
+
+
+if __name__ == "__main__":
+    main()
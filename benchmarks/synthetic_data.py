@@ -0,0 +1,261 @@
+# synthetic_data.py
+# Purpose: Synthetic GTM_COPILOT.RAW tables at any scale, with the columns and types of
+#   sql/01_load/002_create_raw_tables.sql (SUPPORT_TICKETS: the columns the app reads).
+#   Deterministic for a given (accounts, months, end month, seed). Tables are generated one
+#   at a time so a 1M-account run never holds every frame at once; strings and dates are
+#   Arrow-backed (DuckDB reads them as VARCHAR / DATE without per-row Python objects).
+#
+#   Shape, per account: ~1.3 subscriptions with monthly churn by segment, ~1.5 opportunities
+#   (stage history 1-5 rows each), ~2 support tickets; one sales rep per ~200 accounts.
+#   DIM_DATE has one row per day of the MRR window.
+#
+# Usage (writes <out>/RAW/<TABLE>.parquet, loadable with GTM_LOCAL_DATA_DIR=<out>):
+#   python benchmarks/synthetic_data.py --accounts 100000 --out /tmp/gtm_100k [--months 24]
+
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+TABLES = (
+    "DIM_DATE",
+    "SALES_REPS",
+    "ACCOUNTS",
+    "SUBSCRIPTION_MONTHLY_MRR",
+    "OPPORTUNITIES",
+    "OPPORTUNITY_STAGE_HISTORY",
+    "SUPPORT_TICKETS",
+)
+DEFAULT_END_MONTH = date(2025, 12, 1)
+
+SEGMENTS = np.array(["Enterprise", "Mid-Market", "SMB"])
+SEGMENT_P = [0.15, 0.35, 0.50]
+SEGMENT_MRR = np.array([12000.0, 2500.0, 400.0])     # median base MRR
+SEGMENT_CHURN = np.array([0.010, 0.020, 0.035])      # monthly churn probability
+SEGMENT_EMPLOYEES = np.array([5000.0, 400.0, 40.0])  # median employee count
+REGIONS = np.array(["NA", "EMEA", "APAC", "LATAM"])
+REGION_P = [0.45, 0.30, 0.17, 0.08]
+INDUSTRIES = np.array([
+    "Software", "Financial Services", "Healthcare", "Retail",
+    "Manufacturing", "Media", "Education", "Logistics",
+])
+TEAMS = np.array(["Enterprise AE", "Mid-Market AE", "SMB AE", "Expansion"])
+PRODUCTS = np.array(["P-CORE", "P-PRO", "P-ENT", "P-ADDON-AI", "P-ADDON-SEC", "P-ADDON-DATA"])
+OPEN_STAGES = np.array(["Prospecting", "Discovery", "Proposal", "Negotiation"])
+OPEN_PROBABILITY = np.array([0.10, 0.25, 0.50, 0.75])
+OPEN_FORECAST = np.array(["Pipeline", "Pipeline", "Best Case", "Commit"])
+LOSS_REASONS = np.array(["Price", "No Decision", "Competitor", "Timing", "Missing Feature"])
+COMPETITORS = np.array(["Acme Analytics", "Northwind BI", "Contoso Data", "Globex Insights"])
+TICKET_STATUS = np.array(["Open", "Pending", "Closed"])
+TICKET_PRIORITY = np.array(["Low", "Medium", "High", "Urgent"])
+TICKET_CATEGORY = np.array(["Billing", "Technical", "Onboarding", "Feature Request", "Access"])
+
+
+def _strings(values) -> pd.api.extensions.ExtensionArray:
+    return pd.array(values, dtype="string[pyarrow]")
+
+
+def _ids(prefix: str, n: int) -> pd.api.extensions.ExtensionArray:
+    width = max(6, len(str(n)))
+    return _strings([f"{prefix}{i:0{width}d}" for i in range(1, n + 1)])
+
+
+def _dates(days: np.ndarray) -> pd.Series:
+    # days since the epoch -> DATE (NaT stays NULL)
+    return pd.Series(pa.array(days.astype("datetime64[D]"), type=pa.date32()), dtype=pd.ArrowDtype(pa.date32()))
+
+
+def _month_days(end_month: date, months: int) -> np.ndarray:
+    end = np.datetime64(end_month, "M")
+    return np.arange(end - months + 1, end + 1).astype("datetime64[D]").astype(np.int64)
+
+
+def _within(counts: np.ndarray) -> np.ndarray:
+    # 0..n-1 inside each group of np.repeat(..., counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.arange(int(counts.sum())) - starts
+
+
+def generate(
+    accounts: int, months: int = 24, end_month: date = DEFAULT_END_MONTH, seed: int = 7
+) -> Iterator[Tuple[str, pd.DataFrame]]:
+    # Yields (table name, frame) in TABLES order
+    rng = np.random.default_rng(seed)
+    month_days = _month_days(end_month, months)
+    first_day, last_day = int(month_days[0]), int(month_days[-1]) + 27
+
+    # DIM_DATE: one row per day of the MRR window (the marts' month spine)
+    days = np.arange(first_day, (np.datetime64(end_month, "M") + 1).astype("datetime64[D]").astype(np.int64))
+    cal = pd.DatetimeIndex(days.astype("datetime64[D]"))
+    yield "DIM_DATE", pd.DataFrame({
+        "DATE": _dates(days),
+        "YEAR": cal.year.astype(np.int64),
+        "QUARTER": cal.quarter.astype(np.int64),
+        "MONTH": cal.month.astype(np.int64),
+        "MONTH_START": _dates(days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)),
+        "WEEK": cal.isocalendar().week.to_numpy().astype(np.int64),
+        "DAY_OF_WEEK": cal.dayofweek.astype(np.int64),
+        "IS_WEEKEND": cal.dayofweek >= 5,
+    })
+    del days, cal
+
+    # SALES_REPS
+    n_reps = max(10, accounts // 200)
+    rep_ids = _ids("REP", n_reps)
+    rep_region = rng.choice(REGIONS, n_reps, p=REGION_P)
+    yield "SALES_REPS", pd.DataFrame({
+        "REP_ID": rep_ids,
+        "REP_NAME": _strings([f"Rep {i}" for i in range(1, n_reps + 1)]),
+        "TEAM": _strings(rng.choice(TEAMS, n_reps)),
+        "REGION": _strings(rep_region),
+        "EMAIL": _strings([f"rep{i}@example.com" for i in range(1, n_reps + 1)]),
+        "HIRE_DATE": _dates(first_day - rng.integers(0, 5 * 365, n_reps)),
+    })
+
+    # ACCOUNTS
+    account_ids = _ids("ACC", accounts)
+    seg = rng.choice(len(SEGMENTS), accounts, p=SEGMENT_P)
+    owner = rng.integers(0, n_reps, accounts)
+    yield "ACCOUNTS", pd.DataFrame({
+        "ACCOUNT_ID": account_ids,
+        "ACCOUNT_NAME": _strings([f"Account {i}" for i in range(1, accounts + 1)]),
+        "SEGMENT": _strings(SEGMENTS[seg]),
+        "REGION": _strings(rng.choice(REGIONS, accounts, p=REGION_P)),
+        "INDUSTRY": _strings(rng.choice(INDUSTRIES, accounts)),
+        "CREATED_DATE": _dates(first_day - rng.integers(0, 3 * 365, accounts)),
+        "EMPLOYEE_COUNT": np.maximum(1, rng.lognormal(np.log(SEGMENT_EMPLOYEES[seg]), 0.6)).astype(np.int64),
+        "OWNER_REP_ID": rep_ids.take(owner),
+        "WEBSITE": _strings([f"https://account{i}.example.com" for i in range(1, accounts + 1)]),
+    })
+
+    # SUBSCRIPTION_MONTHLY_MRR: subscriptions start up to half a window before it, churn geometrically
+    sub_account = np.repeat(np.arange(accounts), 1 + (rng.random(accounts) < 0.3))
+    n_subs = len(sub_account)
+    is_addon = np.r_[False, sub_account[1:] == sub_account[:-1]]
+    sub_seg = seg[sub_account]
+    start = rng.integers(-(months // 2), months, n_subs)
+    last = np.minimum(start + rng.geometric(SEGMENT_CHURN[sub_seg]) - 1, months - 1)
+    first = np.maximum(start, 0)
+    live = last >= first
+    sub_idx = np.flatnonzero(live)
+    counts = (last - first + 1)[live]
+    row_sub = np.repeat(sub_idx, counts)
+    month_idx = first[row_sub] + _within(counts)
+    base = rng.lognormal(np.log(SEGMENT_MRR[sub_seg] * np.where(is_addon, 0.25, 1.0)), 0.5)
+    growth = rng.normal(0.01, 0.015, n_subs)
+    mrr = np.round(base[row_sub] * (1.0 + growth[row_sub]) ** (month_idx - start[row_sub]), 2)
+    product = np.where(is_addon, rng.integers(3, 6, n_subs), 2 - sub_seg)
+    row_account = sub_account[row_sub]
+    yield "SUBSCRIPTION_MONTHLY_MRR", pd.DataFrame({
+        "SUBSCRIPTION_ID": _ids("SUB", n_subs).take(row_sub),
+        "ACCOUNT_ID": account_ids.take(row_account),
+        "PRODUCT_ID": _strings(PRODUCTS).take(product[row_sub]),
+        "MONTH": _dates(month_days[month_idx]),
+        "MRR": mrr,
+        "EVENT_TYPE": _strings(np.array(["recurring", "new"])).take((month_idx == start[row_sub]).astype(np.int64)),
+    })
+    del row_sub, month_idx, mrr, row_account
+
+    # OPPORTUNITIES: 30% won / 70% lost among closed; open deals sit in one of four stages
+    n_opps = int(accounts * 1.5)
+    opp_ids = _ids("OPP", n_opps)
+    opp_account = rng.integers(0, accounts, n_opps)
+    opp_seg = seg[opp_account]
+    created = rng.integers(first_day, last_day + 1, n_opps)
+    cycle = rng.integers(14, 181, n_opps)
+    closed = rng.random(n_opps) < 0.7
+    won = closed & (rng.random(n_opps) < 0.3)
+    lost = closed & ~won
+    depth = np.where(won, 4, rng.integers(1, 5, n_opps))  # open stages reached
+    stage = np.where(won, "Closed Won", np.where(lost, "Closed Lost", OPEN_STAGES[depth - 1]))
+    probability = np.where(won, 1.0, np.where(lost, 0.0, OPEN_PROBABILITY[depth - 1]))
+    forecast = np.where(won, "Closed", np.where(lost, "Omitted", OPEN_FORECAST[depth - 1]))
+    amount = np.round(rng.lognormal(np.log(SEGMENT_MRR[opp_seg] * 12), 0.7), 2)
+    yield "OPPORTUNITIES", pd.DataFrame({
+        "OPP_ID": opp_ids,
+        "ACCOUNT_ID": account_ids.take(opp_account),
+        "PRODUCT_ID": _strings(rng.choice(PRODUCTS, n_opps)),
+        "REP_ID": rep_ids.take(owner[opp_account]),
+        "CREATED_DATE": _dates(created),
+        "CLOSE_DATE": _dates(created + cycle),
+        "CURRENT_STAGE": _strings(stage),
+        "PROBABILITY": probability,
+        "FORECAST_CATEGORY": _strings(forecast),
+        "AMOUNT": amount,
+        "IS_CLOSED": closed,
+        "IS_WON": won,
+        "LOSS_REASON": _strings(np.where(lost, rng.choice(LOSS_REASONS, n_opps), None)),
+        "COMPETITOR": _strings(np.where(lost & (rng.random(n_opps) < 0.5), rng.choice(COMPETITORS, n_opps), None)),
+    })
+    del stage, probability, forecast, amount
+
+    # OPPORTUNITY_STAGE_HISTORY: one row per open stage reached (cycle split evenly), plus the
+    # closing stage; the current stage of an open deal has no end date
+    rows = depth + closed
+    row_opp = np.repeat(np.arange(n_opps), rows)
+    j = _within(rows)
+    step = cycle[row_opp] // depth[row_opp]
+    stage_start = created[row_opp] + j * step
+    is_open_stage = j < depth[row_opp]
+    ended = is_open_stage & ((j < depth[row_opp] - 1) | closed[row_opp])
+    stage_name = np.where(
+        is_open_stage,
+        OPEN_STAGES[np.minimum(j, 3)],
+        np.where(won[row_opp], "Closed Won", "Closed Lost"),
+    )
+    yield "OPPORTUNITY_STAGE_HISTORY", pd.DataFrame({
+        "OPP_ID": opp_ids.take(row_opp),
+        "ACCOUNT_ID": account_ids.take(opp_account[row_opp]),
+        "STAGE": _strings(stage_name),
+        "STAGE_START_DATE": _dates(stage_start),
+        "STAGE_END_DATE": _dates(np.where(ended, stage_start + step, np.datetime64("NaT").astype(np.int64))),
+    })
+    del row_opp, j, step, stage_start, stage_name
+
+    # SUPPORT_TICKETS
+    n_tickets = accounts * 2
+    category = rng.choice(TICKET_CATEGORY, n_tickets)
+    yield "SUPPORT_TICKETS", pd.DataFrame({
+        "TICKET_ID": _ids("TKT", n_tickets),
+        "ACCOUNT_ID": account_ids.take(rng.integers(0, accounts, n_tickets)),
+        "CREATED_DATE": _dates(rng.integers(first_day, last_day + 1, n_tickets)),
+        "STATUS": _strings(rng.choice(TICKET_STATUS, n_tickets, p=[0.15, 0.15, 0.70])),
+        "PRIORITY": _strings(rng.choice(TICKET_PRIORITY, n_tickets, p=[0.35, 0.40, 0.20, 0.05])),
+        "CATEGORY": _strings(category),
+        "SUBJECT": _strings(np.char.add(category.astype(str), " request")),
+    })
+
+
+def write_dir(out: Path, accounts: int, months: int = 24, end_month: date = DEFAULT_END_MONTH, seed: int = 7) -> Dict[str, int]:
+    raw = Path(out) / "RAW"
+    raw.mkdir(parents=True, exist_ok=True)
+    written: Dict[str, int] = {}
+    for name, df in generate(accounts, months, end_month, seed):
+        df.to_parquet(raw / f"{name}.parquet", index=False)
+        written[name] = len(df)
+    return written
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Write synthetic RAW tables as Parquet")
+    ap.add_argument("--accounts", type=int, default=10000)
+    ap.add_argument("--months", type=int, default=24)
+    ap.add_argument("--end-month", type=date.fromisoformat, default=DEFAULT_END_MONTH)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", type=Path, required=True)
+    args = ap.parse_args()
+
+    written = write_dir(args.out, args.accounts, args.months, args.end_month.replace(day=1), args.seed)
+    for name, n in written.items():
+        print(f"{name:<28} {n:>12,} rows")
+    print(f"GTM_LOCAL_DATA_DIR={args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,10 @@
 -- 103_fct_mrr_complete.sql
--- Purpose: Create full account × month grid and explicitly model zero MRR
+-- Purpose: Account × DIM_DATE month MRR with explicit churn months, stored sparse:
+--          every FCT_MRR row plus one trailing zero month after each month with MRR
+--          (both within the DIM_DATE months). Months not stored are zero MRR, so the
+--          stored rows (previous_mrr / movement_type included) are exactly the non-zero
+--          and churn rows of the full account × month grid. Marts that report per grid
+--          cell (105 FCT_ARR, 116 rollup) rebuild the grid from DIM_DATE.
 
 create or replace table GTM_COPILOT.MARTS.FCT_MRR_COMPLETE as
 
@@ -15,25 +20,39 @@ accounts as (
     from GTM_COPILOT.RAW.ACCOUNTS
 ),
 
-account_month_grid as (
-    -- Create full account × month combinations
+mrr_rows as (
+    -- Actual revenue data for known accounts
     select
-        a.account_id,
-        m.month
-    from accounts a
-    cross join months m
+        f.account_id,
+        f.month,
+        f.total_mrr
+    from GTM_COPILOT.MARTS.FCT_MRR f
+    join accounts a
+        on a.account_id = f.account_id
+    join months m
+        on m.month = f.month
 ),
 
-mrr_joined as (
-    -- Join actual revenue data
+churn_months as (
+    -- One zero row after each non-zero month that has no revenue the month after
     select
-        g.account_id,
-        g.month,
-        coalesce(f.total_mrr, 0) as total_mrr
-    from account_month_grid g
-    left join GTM_COPILOT.MARTS.FCT_MRR f
-        on g.account_id = f.account_id
-        and g.month = f.month
+        r.account_id,
+        dateadd(month, 1, r.month) as month,
+        0 as total_mrr
+    from mrr_rows r
+    join months m
+        on m.month = dateadd(month, 1, r.month)
+    left join mrr_rows n
+        on n.account_id = r.account_id
+        and n.month = dateadd(month, 1, r.month)
+    where r.total_mrr <> 0
+      and n.account_id is null
+),
+
+mrr_joined as (
+    select account_id, month, total_mrr from mrr_rows
+    union all
+    select account_id, month, total_mrr from churn_months
 ),
 
 movement as (
@@ -1,11 +1,29 @@
 -- 105_fct_arr.sql
--- Purpose: Create ARR fact table (annualized recurring revenue)
+-- Purpose: Create ARR fact table (annualized recurring revenue) over the full
+--          account × DIM_DATE month grid (FCT_MRR_COMPLETE stores only non-zero and
+--          churn months; the months it does not store are zero ARR)
 
 create or replace table GTM_COPILOT.MARTS.FCT_ARR as
 
+with months as (
+    -- Get one row per month from date dimension
+    select distinct
+        month_start as month
+    from GTM_COPILOT.RAW.DIM_DATE
+),
+
+accounts as (
+    select distinct account_id
+    from GTM_COPILOT.RAW.ACCOUNTS
+)
+
 select
-    account_id,
-    month,
-    total_mrr,
-    total_mrr * 12 as arr
-from GTM_COPILOT.MARTS.FCT_MRR_COMPLETE;
+    a.account_id,
+    m.month,
+    coalesce(f.total_mrr, 0) as total_mrr,
+    coalesce(f.total_mrr, 0) * 12 as arr
+from accounts a
+cross join months m
+left join GTM_COPILOT.MARTS.FCT_MRR_COMPLETE f
+    on f.account_id = a.account_id
+    and f.month = m.month;
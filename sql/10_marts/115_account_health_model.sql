@@ -9,21 +9,29 @@ with latest_month as (
     where total_mrr > 0
 ),
 
-recent_revenue as (
-    select
-        f.account_id,
-        f.month,
-        f.total_mrr,
-        lag(f.total_mrr,1) over (partition by f.account_id order by f.month) as mrr_1m_ago,
-        lag(f.total_mrr,2) over (partition by f.account_id order by f.month) as mrr_2m_ago
-    from GTM_COPILOT.MARTS.FCT_MRR_COMPLETE f
+accounts as (
+    select distinct account_id
+    from GTM_COPILOT.RAW.ACCOUNTS
 ),
 
 latest_revenue as (
-    select r.*
-    from recent_revenue r
-    join latest_month l
-        on r.month = l.max_month
+    -- Calendar-month lookups: FCT_MRR_COMPLETE is sparse, months not stored are zero MRR
+    select
+        a.account_id,
+        coalesce(f0.total_mrr, 0) as total_mrr,
+        coalesce(f1.total_mrr, 0) as mrr_1m_ago,
+        coalesce(f2.total_mrr, 0) as mrr_2m_ago
+    from accounts a
+    cross join latest_month l
+    left join GTM_COPILOT.MARTS.FCT_MRR_COMPLETE f0
+        on f0.account_id = a.account_id
+        and f0.month = l.max_month
+    left join GTM_COPILOT.MARTS.FCT_MRR_COMPLETE f1
+        on f1.account_id = a.account_id
+        and f1.month = dateadd(month, -1, l.max_month)
+    left join GTM_COPILOT.MARTS.FCT_MRR_COMPLETE f2
+        on f2.account_id = a.account_id
+        and f2.month = dateadd(month, -2, l.max_month)
 ),
 
 open_pipeline as (
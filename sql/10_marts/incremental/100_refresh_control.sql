@@ -0,0 +1,16 @@
+-- 100_refresh_control.sql
+-- Purpose: Watermark + refresh-window tables for incremental MARTS refresh
+--          (written by sql/40_jobs/refresh_marts.py; the merge scripts in this folder
+--           only reprocess months >= MART_REFRESH_WINDOW.since_month)
+
+create table if not exists GTM_COPILOT.UTIL.MART_WATERMARKS (
+    mart_name        varchar(100),
+    watermark_month  date,          -- last RAW month loaded into the mart
+    rows_touched     bigint,
+    refresh_mode     varchar(20),   -- full | incremental
+    refreshed_at     timestamp
+);
+
+create table if not exists GTM_COPILOT.UTIL.MART_REFRESH_WINDOW (
+    since_month      date
+);
@@ -0,0 +1,50 @@
+-- 101_fct_mrr_merge.sql
+-- Purpose: Incremental FCT_MRR — re-aggregate RAW subscription MRR for months in the
+--          refresh window and MERGE (insert / update changed / delete vanished rows)
+
+merge into GTM_COPILOT.MARTS.FCT_MRR t
+using (
+    with refresh_window as (
+        select since_month
+        from GTM_COPILOT.UTIL.MART_REFRESH_WINDOW
+    ),
+
+    source_rows as (
+        select
+            account_id,
+            month,
+            sum(mrr) as total_mrr
+        from GTM_COPILOT.RAW.SUBSCRIPTION_MONTHLY_MRR
+        where month >= (select since_month from refresh_window)
+        group by
+            account_id,
+            month
+    ),
+
+    target_rows as (
+        select
+            account_id,
+            month
+        from GTM_COPILOT.MARTS.FCT_MRR
+        where month >= (select since_month from refresh_window)
+    )
+
+    select
+        coalesce(s.account_id, f.account_id) as account_id,
+        coalesce(s.month, f.month) as month,
+        s.total_mrr,
+        s.account_id is not null as in_source
+    from source_rows s
+    full outer join target_rows f
+        on f.account_id = s.account_id
+        and f.month = s.month
+) s
+    on t.account_id = s.account_id
+    and t.month = s.month
+when matched and not s.in_source then
+    delete
+when matched and t.total_mrr is distinct from s.total_mrr then
+    update set total_mrr = s.total_mrr
+when not matched and s.in_source then
+    insert (account_id, month, total_mrr)
+    values (s.account_id, s.month, s.total_mrr);
@@ -0,0 +1,127 @@
+-- 103_fct_mrr_complete_merge.sql
+-- Purpose: Incremental FCT_MRR_COMPLETE — rebuild the sparse rows (revenue months + one
+--          trailing zero month, within the DIM_DATE months) for months in the refresh window and MERGE changed rows.
+--          FCT_MRR is read from one month before the window so the first refreshed month
+--          gets its churn row and previous_mrr. (The driver pulls the window back when a
+--          new account arrives with history older than the window.)
+
+merge into GTM_COPILOT.MARTS.FCT_MRR_COMPLETE t
+using (
+    with refresh_window as (
+        select since_month
+        from GTM_COPILOT.UTIL.MART_REFRESH_WINDOW
+    ),
+
+    months as (
+        select distinct
+            month_start as month
+        from GTM_COPILOT.RAW.DIM_DATE
+    ),
+
+    accounts as (
+        select distinct account_id
+        from GTM_COPILOT.RAW.ACCOUNTS
+    ),
+
+    mrr_rows as (
+        select
+            f.account_id,
+            f.month,
+            f.total_mrr
+        from GTM_COPILOT.MARTS.FCT_MRR f
+        join accounts a
+            on a.account_id = f.account_id
+        join months m
+            on m.month = f.month
+        where f.month >= dateadd(month, -1, (select since_month from refresh_window))
+    ),
+
+    churn_months as (
+        select
+            r.account_id,
+            dateadd(month, 1, r.month) as month,
+            0 as total_mrr
+        from mrr_rows r
+        join months m
+            on m.month = dateadd(month, 1, r.month)
+        left join mrr_rows n
+            on n.account_id = r.account_id
+            and n.month = dateadd(month, 1, r.month)
+        where r.total_mrr <> 0
+          and n.account_id is null
+    ),
+
+    mrr_joined as (
+        select account_id, month, total_mrr from mrr_rows
+        union all
+        select account_id, month, total_mrr from churn_months
+    ),
+
+    movement as (
+        select
+            account_id,
+            month,
+            total_mrr,
+            lag(total_mrr) over (
+                partition by account_id
+                order by month
+            ) as previous_mrr
+        from mrr_joined
+    ),
+
+    source_rows as (
+        select
+            account_id,
+            month,
+            total_mrr,
+            coalesce(previous_mrr, 0) as previous_mrr,
+            total_mrr - coalesce(previous_mrr, 0) as mrr_change,
+            case
+                when coalesce(previous_mrr, 0) = 0 and total_mrr > 0 then 'New'
+                when previous_mrr > 0 and total_mrr = 0 then 'Churn'
+                when total_mrr > previous_mrr then 'Expansion'
+                when total_mrr < previous_mrr and total_mrr > 0 then 'Contraction'
+                else 'Flat'
+            end as movement_type
+        from movement
+        where month >= (select since_month from refresh_window)
+    ),
+
+    target_rows as (
+        select
+            account_id,
+            month
+        from GTM_COPILOT.MARTS.FCT_MRR_COMPLETE
+        where month >= (select since_month from refresh_window)
+    )
+
+    select
+        coalesce(s.account_id, f.account_id) as account_id,
+        coalesce(s.month, f.month) as month,
+        s.total_mrr,
+        s.previous_mrr,
+        s.mrr_change,
+        s.movement_type,
+        s.account_id is not null as in_source
+    from source_rows s
+    full outer join target_rows f
+        on f.account_id = s.account_id
+        and f.month = s.month
+) s
+    on t.account_id = s.account_id
+    and t.month = s.month
+when matched and not s.in_source then
+    delete
+when matched and (
+        t.total_mrr is distinct from s.total_mrr
+        or t.previous_mrr is distinct from s.previous_mrr
+        or t.movement_type is distinct from s.movement_type
+    ) then
+    update set
+        total_mrr = s.total_mrr,
+        previous_mrr = s.previous_mrr,
+        mrr_change = s.mrr_change,
+        movement_type = s.movement_type
+when not matched and s.in_source then
+    insert (account_id, month, total_mrr, previous_mrr, mrr_change, movement_type)
+    values (s.account_id, s.month, s.total_mrr, s.previous_mrr, s.mrr_change, s.movement_type);
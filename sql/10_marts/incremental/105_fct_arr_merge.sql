@@ -0,0 +1,66 @@
+-- 105_fct_arr_merge.sql
+-- Purpose: Incremental FCT_ARR — MERGE the refresh window of the account × DIM_DATE month
+--          grid from FCT_MRR_COMPLETE
+
+merge into GTM_COPILOT.MARTS.FCT_ARR t
+using (
+    with refresh_window as (
+        select since_month
+        from GTM_COPILOT.UTIL.MART_REFRESH_WINDOW
+    ),
+
+    months as (
+        select distinct
+            month_start as month
+        from GTM_COPILOT.RAW.DIM_DATE
+        where month_start >= (select since_month from refresh_window)
+    ),
+
+    accounts as (
+        select distinct account_id
+        from GTM_COPILOT.RAW.ACCOUNTS
+    ),
+
+    source_rows as (
+        select
+            a.account_id,
+            m.month,
+            coalesce(f.total_mrr, 0) as total_mrr,
+            coalesce(f.total_mrr, 0) * 12 as arr
+        from accounts a
+        cross join months m
+        left join GTM_COPILOT.MARTS.FCT_MRR_COMPLETE f
+            on f.account_id = a.account_id
+            and f.month = m.month
+    ),
+
+    target_rows as (
+        select
+            account_id,
+            month
+        from GTM_COPILOT.MARTS.FCT_ARR
+        where month >= (select since_month from refresh_window)
+    )
+
+    select
+        coalesce(s.account_id, f.account_id) as account_id,
+        coalesce(s.month, f.month) as month,
+        s.total_mrr,
+        s.arr,
+        s.account_id is not null as in_source
+    from source_rows s
+    full outer join target_rows f
+        on f.account_id = s.account_id
+        and f.month = s.month
+) s
+    on t.account_id = s.account_id
+    and t.month = s.month
+when matched and not s.in_source then
+    delete
+when matched and t.total_mrr is distinct from s.total_mrr then
+    update set
+        total_mrr = s.total_mrr,
+        arr = s.arr
+when not matched and s.in_source then
+    insert (account_id, month, total_mrr, arr)
+    values (s.account_id, s.month, s.total_mrr, s.arr);
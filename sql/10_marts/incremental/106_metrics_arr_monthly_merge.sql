@@ -0,0 +1,49 @@
+-- 106_metrics_arr_monthly_merge.sql
+-- Purpose: Incremental METRICS_ARR_MONTHLY — recompute only months in the refresh window
+
+merge into GTM_COPILOT.MARTS.METRICS_ARR_MONTHLY t
+using (
+    with refresh_window as (
+        select since_month
+        from GTM_COPILOT.UTIL.MART_REFRESH_WINDOW
+    ),
+
+    max_valid_month as (
+        select max(month) as max_month
+        from GTM_COPILOT.MARTS.FCT_MRR_COMPLETE
+        where total_mrr > 0
+    ),
+
+    source_rows as (
+        select
+            f.month,
+            sum(f.arr) as total_arr
+        from GTM_COPILOT.MARTS.FCT_ARR f
+        join max_valid_month m
+            on f.month <= m.max_month
+        where f.month >= (select since_month from refresh_window)
+        group by f.month
+    ),
+
+    target_rows as (
+        select month
+        from GTM_COPILOT.MARTS.METRICS_ARR_MONTHLY
+        where month >= (select since_month from refresh_window)
+    )
+
+    select
+        coalesce(s.month, f.month) as month,
+        s.total_arr,
+        s.month is not null as in_source
+    from source_rows s
+    full outer join target_rows f
+        on f.month = s.month
+) s
+    on t.month = s.month
+when matched and not s.in_source then
+    delete
+when matched and t.total_arr is distinct from s.total_arr then
+    update set total_arr = s.total_arr
+when not matched and s.in_source then
+    insert (month, total_arr)
+    values (s.month, s.total_arr);
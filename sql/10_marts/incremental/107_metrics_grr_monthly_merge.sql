@@ -0,0 +1,83 @@
+-- 107_metrics_grr_monthly_merge.sql
+-- Purpose: Incremental METRICS_GRR_MONTHLY — recompute only months in the refresh window
+
+merge into GTM_COPILOT.MARTS.METRICS_GRR_MONTHLY t
+using (
+    with refresh_window as (
+        select since_month
+        from GTM_COPILOT.UTIL.MART_REFRESH_WINDOW
+    ),
+
+    max_valid_month as (
+        select max(month) as max_month
+        from GTM_COPILOT.MARTS.FCT_MRR_COMPLETE
+        where total_mrr > 0
+    ),
+
+    base as (
+        -- One extra month so the first refreshed month has its previous_mrr
+        select
+            account_id,
+            month,
+            total_mrr,
+            lag(total_mrr) over (partition by account_id order by month) as previous_mrr
+        from GTM_COPILOT.MARTS.FCT_MRR_COMPLETE
+        where month >= dateadd(month, -1, (select since_month from refresh_window))
+    ),
+
+    eligible as (
+        select
+            account_id,
+            month,
+            previous_mrr,
+            case
+                when total_mrr >= previous_mrr then previous_mrr
+                else total_mrr
+            end as retained
+        from base
+        where previous_mrr > 0
+          and month >= (select since_month from refresh_window)
+    ),
+
+    source_rows as (
+        select
+            e.month,
+            sum(e.previous_mrr) as start_mrr,
+            sum(e.retained) as retained_mrr,
+            round((sum(e.retained) / sum(e.previous_mrr)) * 100, 2) as grr_pct
+        from eligible e
+        join max_valid_month m
+            on e.month <= m.max_month
+        group by e.month
+    ),
+
+    target_rows as (
+        select month
+        from GTM_COPILOT.MARTS.METRICS_GRR_MONTHLY
+        where month >= (select since_month from refresh_window)
+    )
+
+    select
+        coalesce(s.month, f.month) as month,
+        s.start_mrr,
+        s.retained_mrr,
+        s.grr_pct,
+        s.month is not null as in_source
+    from source_rows s
+    full outer join target_rows f
+        on f.month = s.month
+) s
+    on t.month = s.month
+when matched and not s.in_source then
+    delete
+when matched and (
+        t.start_mrr is distinct from s.start_mrr
+        or t.retained_mrr is distinct from s.retained_mrr
+    ) then
+    update set
+        start_mrr = s.start_mrr,
+        retained_mrr = s.retained_mrr,
+        grr_pct = s.grr_pct
+when not matched and s.in_source then
+    insert (month, start_mrr, retained_mrr, grr_pct)
+    values (s.month, s.start_mrr, s.retained_mrr, s.grr_pct);
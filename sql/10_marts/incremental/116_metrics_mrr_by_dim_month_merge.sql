@@ -0,0 +1,113 @@
+-- 116_metrics_mrr_by_dim_month_merge.sql
+-- Purpose: Incremental METRICS_MRR_BY_DIM_MONTH — replace the month partitions touched by
+--          the refresh window. The rollup key includes nullable dimensions (no reliable
+--          MERGE match), so affected months are deleted and re-inserted.
+--          Dimensions follow current ACCOUNTS / SALES_REPS attributes; re-segmenting
+--          accounts needs a full rebuild of 116.
+
+delete from GTM_COPILOT.MARTS.METRICS_MRR_BY_DIM_MONTH
+where month >= dateadd(month, -1, (select since_month from GTM_COPILOT.UTIL.MART_REFRESH_WINDOW));
+
+insert into GTM_COPILOT.MARTS.METRICS_MRR_BY_DIM_MONTH
+
+with refresh_window as (
+    -- since - 1: its retention (next_month_mrr) depends on the first refreshed month
+    select dateadd(month, -1, since_month) as first_month
+    from GTM_COPILOT.UTIL.MART_REFRESH_WINDOW
+),
+
+months as (
+    -- One extra month before first_month so lag() sees the previous month
+    select distinct
+        month_start as month
+    from GTM_COPILOT.RAW.DIM_DATE
+    where month_start >= dateadd(month, -1, (select first_month from refresh_window))
+),
+
+base as (
+    -- Full account × month grid: FCT_MRR_COMPLETE only stores non-zero and churn months
+    select
+        a.account_id,
+        m.month,
+        coalesce(f.total_mrr, 0) as total_mrr,
+        a.segment,
+        a.region,
+        a.industry,
+        r.team as rep_team,
+        r.region as rep_region
+    from GTM_COPILOT.RAW.ACCOUNTS a
+    cross join months m
+    left join GTM_COPILOT.MARTS.FCT_MRR_COMPLETE f
+        on f.account_id = a.account_id
+        and f.month = m.month
+    left join GTM_COPILOT.RAW.SALES_REPS r
+        on r.rep_id = a.owner_rep_id
+),
+
+movement as (
+    select
+        b.*,
+        lag(b.total_mrr) over (
+            partition by b.account_id
+            order by b.month
+        ) as previous_mrr,
+        n.total_mrr as next_month_mrr
+    from base b
+    left join GTM_COPILOT.MARTS.FCT_MRR_COMPLETE n
+        on n.account_id = b.account_id
+        and n.month = dateadd(month, 1, b.month)
+),
+
+classified as (
+    -- Same classification as the app's movement summary
+    select
+        *,
+        total_mrr - coalesce(previous_mrr, 0) as mrr_change,
+        case
+            when previous_mrr is null and total_mrr > 0 then 'New'
+            when previous_mrr > 0 and total_mrr = 0 then 'Churn'
+            when total_mrr > previous_mrr then 'Expansion'
+            when total_mrr < previous_mrr then 'Contraction'
+            else 'Flat'
+        end as movement_type
+    from movement
+    where month >= (select first_month from refresh_window)
+)
+
+select
+    month,
+    segment,
+    region,
+    industry,
+    rep_team,
+    rep_region,
+
+    count(*) as account_rows,
+    sum(total_mrr) as total_mrr,
+
+    -- Retention cohort: accounts with MRR > 0 this month, tracked to month + 1
+    sum(case when total_mrr > 0 then 1 else 0 end) as active_accounts,
+    sum(case when total_mrr > 0 then total_mrr else 0 end) as active_mrr,
+    sum(case when total_mrr > 0 then coalesce(next_month_mrr, 0) else 0 end) as next_month_mrr,
+    sum(case when total_mrr > 0 then least(coalesce(next_month_mrr, 0), total_mrr) else 0 end) as retained_mrr,
+
+    -- Movement buckets (row counts + net MRR change)
+    sum(case when movement_type = 'New' then 1 else 0 end) as new_rows,
+    sum(case when movement_type = 'New' then mrr_change else 0 end) as new_mrr_change,
+    sum(case when movement_type = 'Expansion' then 1 else 0 end) as expansion_rows,
+    sum(case when movement_type = 'Expansion' then mrr_change else 0 end) as expansion_mrr_change,
+    sum(case when movement_type = 'Contraction' then 1 else 0 end) as contraction_rows,
+    sum(case when movement_type = 'Contraction' then mrr_change else 0 end) as contraction_mrr_change,
+    sum(case when movement_type = 'Churn' then 1 else 0 end) as churn_rows,
+    sum(case when movement_type = 'Churn' then mrr_change else 0 end) as churn_mrr_change,
+    sum(case when movement_type = 'Flat' then 1 else 0 end) as flat_rows,
+    sum(case when movement_type = 'Flat' then mrr_change else 0 end) as flat_mrr_change
+
+from classified
+group by
+    month,
+    segment,
+    region,
+    industry,
+    rep_team,
+    rep_region;
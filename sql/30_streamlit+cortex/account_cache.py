@@ -0,0 +1,153 @@
+# account_cache.py
+# Purpose: Account Explorer drill-down data, fetched per account instead of filtering the
+#   full account-month frame client-side. An AccountBundle holds one account's MRR history,
+#   opportunities and support tickets; AccountBundleCache keeps the most recently viewed
+#   bundles (LRU with a TTL), so switching back and forth between a handful of accounts
+#   does not touch the warehouse. Several accounts (e.g. the Health tab's at-risk list) are
+#   fetched as one batch: one `account_id in (...)` query per dataset, split client-side.
+
+import io
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+
+@dataclass
+class AccountBundle:
+    account_id: str
+    mrr: pd.DataFrame
+    opportunities: pd.DataFrame
+    tickets: Optional[pd.DataFrame]
+    fetched_at: float = field(default_factory=time.monotonic)
+
+    def mrr_between(self, start_d: date, end_d: date) -> pd.DataFrame:
+        # The bundle carries the account's full MRR history; date range changes are a slice
+        if self.mrr.empty:
+            return self.mrr
+        months = self.mrr["MONTH"]
+        keep = (months >= pd.Timestamp(start_d)) & (months <= pd.Timestamp(end_d))
+        return self.mrr[keep].reset_index(drop=True)
+
+
+class AccountBundleCache:
+    def __init__(self, capacity: int = 16, ttl_s: float = 600.0):
+        self.capacity = int(capacity)
+        self.ttl_s = float(ttl_s)
+        self._items: "OrderedDict[str, AccountBundle]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, account_id: str) -> Optional[AccountBundle]:
+        with self._lock:
+            bundle = self._items.get(account_id)
+            if bundle is not None and time.monotonic() - bundle.fetched_at > self.ttl_s:
+                del self._items[account_id]
+                bundle = None
+            if bundle is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(account_id)
+            self.hits += 1
+            return bundle
+
+    def put(self, bundle: AccountBundle) -> None:
+        with self._lock:
+            self._items[bundle.account_id] = bundle
+            self._items.move_to_end(bundle.account_id)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def get_or_fetch(self, account_id: str, fetch: Callable[[str], AccountBundle]) -> AccountBundle:
+        # Fetch runs outside the lock; two concurrent misses for one account both fetch and
+        # the later put wins, which is harmless for read-only data
+        bundle = self.get(account_id)
+        if bundle is None:
+            bundle = fetch(account_id)
+            self.put(bundle)
+        return bundle
+
+    def get_or_fetch_many(
+        self,
+        account_ids: Sequence[str],
+        fetch_many: Callable[[List[str]], Dict[str, AccountBundle]],
+    ) -> Dict[str, AccountBundle]:
+        # Cached accounts are served from memory; the rest go to the warehouse in one batch
+        out: Dict[str, AccountBundle] = {}
+        missing: List[str] = []
+        for account_id in dict.fromkeys(account_ids):
+            bundle = self.get(account_id)
+            if bundle is None:
+                missing.append(account_id)
+            else:
+                out[account_id] = bundle
+        if missing:
+            fetched = fetch_many(missing)
+            for bundle in fetched.values():
+                self.put(bundle)
+            out.update(fetched)
+        return {a: out[a] for a in dict.fromkeys(account_ids) if a in out}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def account_ids(self) -> List[str]:
+        # Most recently used last
+        with self._lock:
+            return list(self._items)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._items), "capacity": self.capacity, "hits": self.hits, "misses": self.misses}
+
+
+def split_by_account(df: Optional[pd.DataFrame], account_ids: Iterable[str]) -> Dict[str, Optional[pd.DataFrame]]:
+    # One frame per requested account (empty frame with the same columns when it has no rows)
+    ids = list(account_ids)
+    if df is None:
+        return {a: None for a in ids}
+    if df.empty:
+        return {a: df.drop(columns=["ACCOUNT_ID"], errors="ignore") for a in ids}
+    keys = df["ACCOUNT_ID"].astype(str)
+    groups = {k: g.drop(columns=["ACCOUNT_ID"]).reset_index(drop=True) for k, g in df.groupby(keys, sort=False)}
+    empty = df.iloc[0:0].drop(columns=["ACCOUNT_ID"])
+    return {a: groups.get(a, empty) for a in ids}
+
+
+def batch_summary(bundles: Dict[str, AccountBundle], start_d: date, end_d: date) -> pd.DataFrame:
+    rows = []
+    for account_id, bundle in bundles.items():
+        mrr = bundle.mrr_between(start_d, end_d)
+        opps = bundle.opportunities
+        open_opps = opps[~opps["IS_CLOSED"].fillna(False).astype(bool)] if opps is not None and not opps.empty else None
+        rows.append({
+            "ACCOUNT_ID": account_id,
+            "LATEST_MRR": float(mrr["TOTAL_MRR"].iloc[-1]) if not mrr.empty else 0.0,
+            "OPEN_OPPS": 0 if open_opps is None else len(open_opps),
+            "OPEN_PIPELINE": 0.0 if open_opps is None else float(pd.to_numeric(open_opps["AMOUNT"], errors="coerce").sum()),
+            "TICKETS": None if bundle.tickets is None else len(bundle.tickets),
+        })
+    return pd.DataFrame(rows, columns=["ACCOUNT_ID", "LATEST_MRR", "OPEN_OPPS", "OPEN_PIPELINE", "TICKETS"])
+
+
+def bundles_to_zip(bundles: Dict[str, AccountBundle]) -> bytes:
+    # One file for the whole batch: a CSV per dataset, every row tagged with its ACCOUNT_ID
+    frames: Dict[str, List[pd.DataFrame]] = {"mrr": [], "opportunities": [], "tickets": []}
+    for account_id, bundle in bundles.items():
+        for name, df in (("mrr", bundle.mrr), ("opportunities", bundle.opportunities), ("tickets", bundle.tickets)):
+            if df is not None and not df.empty:
+                frames[name].append(df.assign(ACCOUNT_ID=account_id)[["ACCOUNT_ID", *df.columns]])
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, parts in frames.items():
+            data = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["ACCOUNT_ID"])
+            zf.writestr(f"{name}.csv", data.to_csv(index=False))
+    return buf.getvalue()
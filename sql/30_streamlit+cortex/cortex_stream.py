@@ -0,0 +1,139 @@
+# cortex_stream.py
+# Purpose: Streaming Cortex completions, so the Q&A answer and the executive narrative render
+#   token by token (st.write_stream / a re-rendered placeholder) instead of behind a spinner.
+#   - SnowflakeStreamer: snowflake.cortex.Complete(..., stream=True) on the app's Snowpark
+#                        session (snowflake-ml-python); falls back to one blocking
+#                        AI_COMPLETE call, yielded whole, when the package is not available
+#                        or the streaming call fails before its first chunk
+#   - BlockingStreamer:  any blocking complete(model, prompt) -> text, chunked
+#   - MockStreamer:      canned responses in the prompt's required format, with a per-chunk
+#                        delay (offline dev on the local backend, GTM_CORTEX_MOCK=1)
+
+import re
+import time
+from typing import Any, Callable, Iterator, Optional
+
+
+def chunk_text(text: str, words_per_chunk: int = 3) -> Iterator[str]:
+    # Whitespace is kept with the word before it, so "".join(chunks) == text
+    parts = re.findall(r"\S+\s*|\s+", text or "")
+    for i in range(0, len(parts), words_per_chunk):
+        yield "".join(parts[i:i + words_per_chunk])
+
+
+class CompletionStreamer:
+    name = "base"
+
+    def stream(self, model: str, prompt: str) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class BlockingStreamer(CompletionStreamer):
+    name = "blocking"
+
+    def __init__(self, complete: Callable[[str, str], Optional[str]]):
+        self._complete = complete
+
+    def stream(self, model: str, prompt: str) -> Iterator[str]:
+        yield from chunk_text(self._complete(model, prompt) or "")
+
+
+class SnowflakeStreamer(CompletionStreamer):
+    name = "snowflake"
+
+    def __init__(self, session: Any, fallback: Callable[[str, str], Optional[str]]):
+        self._session = session
+        self._fallback = fallback
+
+    def stream(self, model: str, prompt: str) -> Iterator[str]:
+        try:
+            from snowflake.cortex import Complete
+
+            chunks = iter(Complete(model, prompt, session=self._session, stream=True))
+            # The request is made lazily: a failing call surfaces on the first chunk
+            first = next(chunks, None)
+        except Exception:
+            text = self._fallback(model, prompt)
+            if text:
+                yield text
+            return
+        if first:
+            yield first
+        for chunk in chunks:
+            if chunk:
+                yield chunk
+
+
+_MOCK_NARRATIVE = """Headline:
+Revenue base is stable with pipeline coverage above target for the selected period.
+
+Executive Summary:
+ARR held steady across the window while new business offset contraction. Pipeline coverage sits above the 3x benchmark, which supports the next two quarters. Retention should be read together with the data-quality flag for the cohort month.
+
+Key Risks:
+1. Contraction concentrated in a small number of accounts
+2. Win rate softness in late-stage deals
+3. Incomplete boundary-month retention data
+
+Recommended Actions:
+1. Review the top contracting accounts with Customer Success
+2. Inspect stage-to-stage conversion for late stages
+3. Re-check NRR and GRR once the next month is fully loaded"""
+
+_MOCK_ANSWER = """Answer:
+This is a mock Cortex response for offline development. It follows the required format but is not grounded in the pack.
+
+Evidence:
+- Mock evidence bullet one
+- Mock evidence bullet two
+- Mock evidence bullet three
+
+What I would check next:
+- Run against Snowflake for a real answer
+- Compare with the Retention tab
+- Compare with the Pipeline tab
+
+Confidence Level:
+Low — mock response."""
+
+_MOCK_AGENT = """Plan:
+1. Read metrics
+2. Check data quality
+3. Answer
+
+Reasoning Chain:
+Step 1: Mock step.
+Step 2: Mock step.
+Step 3: Mock step.
+
+Answer:
+This is a mock Cortex agent response for offline development.
+
+Evidence:
+- Mock evidence
+- Mock evidence
+- Mock evidence
+
+Confidence Level:
+Low — mock response."""
+
+
+class MockStreamer(CompletionStreamer):
+    name = "mock"
+
+    def __init__(self, delay_s: float = 0.02, words_per_chunk: int = 3):
+        self.delay_s = float(delay_s)
+        self.words_per_chunk = int(words_per_chunk)
+
+    def respond(self, prompt: str) -> str:
+        if "Reasoning Chain:" in prompt:
+            return _MOCK_AGENT
+        if "Headline:" in prompt:
+            return _MOCK_NARRATIVE
+        return _MOCK_ANSWER
+
+    def stream(self, model: str, prompt: str) -> Iterator[str]:
+        for chunk in chunk_text(self.respond(prompt), self.words_per_chunk):
+            if self.delay_s:
+                time.sleep(self.delay_s)
+            yield chunk
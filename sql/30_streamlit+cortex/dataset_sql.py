@@ -0,0 +1,469 @@
+# dataset_sql.py
+# Purpose: SQL for the app's datasets (table resolution, filter domains, MRR date bounds, the
+#   five KPI datasets, health, stage dynamics, data quality checks), used by the metrics
+#   engine (gtm_metrics) and the cache warm-up job (sql/40_jobs/warm_cache.py). The shared
+#   result cache keys on the SQL text + bind params, so both sides must build exactly the
+#   same statements.
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+import mrr_rollup
+from query_builder import AccountFilter
+
+
+DB = "GTM_COPILOT"
+RAW = f"{DB}.RAW"
+MARTS = f"{DB}.MARTS"
+
+# Candidate tables (auto-resolve first existing)
+TABLE_CANDIDATES: Dict[str, List[str]] = {
+    "ACCOUNTS": [
+        f"{RAW}.ACCOUNTS",
+        f"{DB}.RAW.ACCOUNTS",
+    ],
+    "SALES_REPS": [
+        f"{RAW}.SALES_REPS",
+        f"{DB}.RAW.SALES_REPS",
+    ],
+    "FCT_MRR": [
+        f"{MARTS}.FCT_MRR_COMPLETE",
+        f"{MARTS}.FCT_MRR",
+    ],
+    "FCT_PIPELINE": [
+        f"{MARTS}.FCT_PIPELINE",
+    ],
+    "STAGE_HISTORY": [
+        f"{RAW}.OPPORTUNITY_STAGE_HISTORY",
+        f"{MARTS}.OPPORTUNITY_STAGE_HISTORY",
+    ],
+    "SUPPORT_TICKETS": [
+        f"{RAW}.SUPPORT_TICKETS",
+    ],
+    "HEALTH_SNAPSHOT": [
+        f"{MARTS}.ACCOUNT_HEALTH",
+        f"{MARTS}.METRICS_ACCOUNT_HEALTH",
+        f"{MARTS}.FCT_ACCOUNT_HEALTH",
+    ],
+    "MRR_DIM_ROLLUP": [
+        f"{MARTS}.METRICS_MRR_BY_DIM_MONTH",
+    ],
+}
+
+REQUIRED_TABLES = ("ACCOUNTS", "FCT_MRR", "FCT_PIPELINE")
+
+SqlWithParams = Tuple[str, Tuple[Any, ...]]
+
+
+@dataclass(frozen=True)
+class DatasetTables:
+    accounts: str
+    fct_mrr: str
+    fct_pipeline: str
+    reps: Optional[str] = None
+    mrr_rollup: Optional[str] = None
+    stage_history: Optional[str] = None
+    support_tickets: Optional[str] = None
+    health: Optional[str] = None
+
+    @classmethod
+    def from_resolved(cls, tables: Dict[str, Optional[str]]) -> "DatasetTables":
+        return cls(
+            accounts=tables["ACCOUNTS"],
+            fct_mrr=tables["FCT_MRR"],
+            fct_pipeline=tables["FCT_PIPELINE"],
+            reps=tables.get("SALES_REPS"),
+            mrr_rollup=tables.get("MRR_DIM_ROLLUP"),
+            stage_history=tables.get("STAGE_HISTORY"),
+            support_tickets=tables.get("SUPPORT_TICKETS"),
+            health=tables.get("HEALTH_SNAPSHOT"),
+        )
+
+    def filter_sql(self, account_filter: AccountFilter, a_alias: str = "a", r_alias: str = "r") -> Tuple[str, List[Any]]:
+        # Rep filters only apply when SALES_REPS is available
+        return account_filter.to_sql(a_alias, r_alias if self.reps else None)
+
+    def reps_join(self, on: str) -> str:
+        return f"left join {self.reps} r on r.rep_id = {on}" if self.reps else ""
+
+    @property
+    def month_spine(self) -> Optional[str]:
+        # FCT_MRR_COMPLETE stores only non-zero and churn months of the account × DIM_DATE
+        # grid (103_fct_mrr_complete.sql); the MRR datasets report on the full grid
+        return f"{RAW}.DIM_DATE" if self.fct_mrr == f"{MARTS}.FCT_MRR_COMPLETE" else None
+
+
+# -----------------------------
+# Startup
+# -----------------------------
+def table_probe_sql(fqn: str) -> str:
+    # Fallback when table metadata is unavailable: one probe per candidate
+    return f"select 1 as ok from {fqn} limit 1"
+
+
+def resolve_from_metadata(known: Iterable[str]) -> Dict[str, Optional[str]]:
+    # First existing candidate per dataset, matched against one INFORMATION_SCHEMA listing
+    names = {t.upper() for t in known}
+    return {key: next((c for c in candidates if c.upper() in names), None) for key, candidates in TABLE_CANDIDATES.items()}
+
+
+def account_domains_sql(t: DatasetTables) -> str:
+    return f"""
+        select
+            distinct
+            segment,
+            region,
+            industry
+        from {t.accounts}
+        """
+
+
+def rep_domains_sql(t: DatasetTables) -> Optional[str]:
+    return f"select distinct team, region as rep_region from {t.reps}" if t.reps else None
+
+
+def _distinct(df: Optional[pd.DataFrame], col: str) -> List[str]:
+    if df is None or col not in df.columns:
+        return []
+    return sorted([x for x in df[col].dropna().unique().tolist()])
+
+
+def filter_domains(accounts_df: pd.DataFrame, reps_df: Optional[pd.DataFrame]) -> Dict[str, List[str]]:
+    return {
+        "SEGMENT": _distinct(accounts_df, "SEGMENT"),
+        "REGION": _distinct(accounts_df, "REGION"),
+        "INDUSTRY": _distinct(accounts_df, "INDUSTRY"),
+        "REP_TEAM": _distinct(reps_df, "TEAM"),
+        "REP_REGION": _distinct(reps_df, "REP_REGION"),
+    }
+
+
+def default_filter(domains: Dict[str, List[str]], t: DatasetTables) -> AccountFilter:
+    # The sidebar's initial state: every value of every dimension selected
+    return AccountFilter.from_selections(
+        segments=domains["SEGMENT"],
+        regions=domains["REGION"],
+        industries=domains["INDUSTRY"],
+        rep_teams=domains["REP_TEAM"] if t.reps else None,
+        rep_regions=domains["REP_REGION"] if t.reps else None,
+    )
+
+
+def date_bounds_sql(t: DatasetTables) -> str:
+    if t.month_spine:
+        return f"select min(month_start) as min_month, max(month_start) as max_month from {t.month_spine}"
+    return f"select min(month) as min_month, max(month) as max_month from {t.fct_mrr}"
+
+
+def date_bounds(df: pd.DataFrame) -> Tuple[date, date]:
+    if df.empty or pd.isna(df.loc[0, "MIN_MONTH"]) or pd.isna(df.loc[0, "MAX_MONTH"]):
+        return date(2023, 1, 1), date.today()
+    return df.loc[0, "MIN_MONTH"].date(), df.loc[0, "MAX_MONTH"].date()
+
+
+# -----------------------------
+# KPI datasets
+# -----------------------------
+def mrr_cube_sql(t: DatasetTables, start_d: date, end_d: date, account_filter: AccountFilter) -> SqlWithParams:
+    filter_sql, filter_params = t.filter_sql(account_filter)
+    if t.month_spine:
+        # Every account × month in range; months FCT_MRR_COMPLETE does not store are zero MRR
+        sql = f"""
+    with months as (
+        select distinct
+            month_start as month
+        from {t.month_spine}
+        where month_start >= ?
+          and month_start <= ?
+    )
+    select
+        a.account_id,
+        mo.month,
+        coalesce(m.total_mrr, 0) as total_mrr,
+        a.account_name,
+        a.segment,
+        a.region,
+        a.industry
+    from {t.accounts} a
+    cross join months mo
+    left join {t.fct_mrr} m
+        on m.account_id = a.account_id
+        and m.month = mo.month
+    {t.reps_join("a.owner_rep_id")}
+    where {filter_sql};
+    """
+        return sql, (start_d, end_d, *filter_params)
+
+    sql = f"""
+    select
+        m.account_id,
+        m.month,
+        m.total_mrr,
+        a.account_name,
+        a.segment,
+        a.region,
+        a.industry
+    from {t.fct_mrr} m
+    join {t.accounts} a
+        on a.account_id = m.account_id
+    {t.reps_join("a.owner_rep_id")}
+    where m.month >= ?
+      and m.month <= ?
+      and {filter_sql};
+    """
+    return sql, (start_d, end_d, *filter_params)
+
+
+def rollup_applies(t: DatasetTables, account_filter: AccountFilter) -> bool:
+    # The rollup only matches the account-level path when both read FCT_MRR_COMPLETE
+    return (
+        t.mrr_rollup is not None
+        and t.fct_mrr == f"{MARTS}.FCT_MRR_COMPLETE"
+        and mrr_rollup.supports(account_filter)
+    )
+
+
+def rollup_monthly_sql(t: DatasetTables, start_d: date, end_d: date, account_filter: AccountFilter) -> SqlWithParams:
+    sql, filter_params = mrr_rollup.monthly_sql(t.mrr_rollup, account_filter)
+    return sql, (start_d, end_d, *filter_params)
+
+
+def closed_revenue_sql(t: DatasetTables, start_d: date, end_d: date, account_filter: AccountFilter) -> SqlWithParams:
+    filter_sql, filter_params = t.filter_sql(account_filter)
+    sql = f"""
+    with base as (
+        select
+            p.*,
+            date_trunc('month', p.close_date) as close_month
+        from {t.fct_pipeline} p
+        join {t.accounts} a
+            on a.account_id = p.account_id
+        {t.reps_join("p.rep_id")}
+        where p.is_closed = true
+          and p.close_date is not null
+          and date_trunc('month', p.close_date) >= ?
+          and date_trunc('month', p.close_date) <= ?
+          and {filter_sql}
+    )
+    select
+        close_month,
+        round(sum(amount), 2) as total_closed_revenue,
+        round(sum(case when is_won then amount else 0 end), 2) as total_won_revenue,
+        round(100 * sum(case when is_won then 1 else 0 end) / nullif(count(*), 0), 2) as win_rate_pct,
+        round(avg(datediff(day, created_date, close_date)), 2) as avg_sales_cycle_days
+    from base
+    group by close_month
+    order by close_month;
+    """
+    return sql, (start_d, end_d, *filter_params)
+
+
+def pipeline_coverage_sql(t: DatasetTables, start_d: date, end_d: date, account_filter: AccountFilter) -> SqlWithParams:
+    filter_sql, filter_params = t.filter_sql(account_filter)
+    sql = f"""
+    with open_pipe as (
+        select
+            round(sum(p.amount), 2) as total_open_pipeline
+        from {t.fct_pipeline} p
+        join {t.accounts} a
+            on a.account_id = p.account_id
+        {t.reps_join("p.rep_id")}
+        where p.is_closed = false
+          and {filter_sql}
+    ),
+    closed as (
+        select
+            date_trunc('month', p.close_date) as close_month,
+            round(sum(p.amount), 2) as total_closed_revenue
+        from {t.fct_pipeline} p
+        join {t.accounts} a
+            on a.account_id = p.account_id
+        {t.reps_join("p.rep_id")}
+        where p.is_closed = true
+          and p.close_date is not null
+          and date_trunc('month', p.close_date) >= ?
+          and date_trunc('month', p.close_date) <= ?
+          and {filter_sql}
+        group by 1
+    ),
+    last3 as (
+        select *
+        from closed
+        order by close_month desc
+        limit 3
+    ),
+    avg3 as (
+        select avg(total_closed_revenue) as avg_3m_closed_revenue from last3
+    )
+    select
+        o.total_open_pipeline,
+        a.avg_3m_closed_revenue,
+        round(o.total_open_pipeline / nullif(a.avg_3m_closed_revenue, 0), 2) as pipeline_coverage_ratio
+    from open_pipe o
+    cross join avg3 a;
+    """
+    return sql, (*filter_params, start_d, end_d, *filter_params)
+
+
+def open_pipeline_by_stage_sql(t: DatasetTables, account_filter: AccountFilter) -> SqlWithParams:
+    filter_sql, filter_params = t.filter_sql(account_filter)
+    sql = f"""
+    select
+        current_stage,
+        round(sum(amount), 2) as open_pipeline,
+        round(sum(amount * probability), 2) as weighted_pipeline,
+        count(*) as opp_count
+    from {t.fct_pipeline} p
+    join {t.accounts} a on a.account_id = p.account_id
+    {t.reps_join("p.rep_id")}
+    where p.is_closed = false
+      and {filter_sql}
+    group by current_stage
+    order by open_pipeline desc;
+    """
+    return sql, tuple(filter_params)
+
+
+def kpi_queries(t: DatasetTables, start_d: date, end_d: date, account_filter: AccountFilter) -> Dict[str, SqlWithParams]:
+    # The statements behind the five KPI datasets; ARR and retention share one MRR query
+    # (the rollup when it applies, else the account-level cube)
+    if rollup_applies(t, account_filter):
+        mrr = ("mrr_rollup_monthly", rollup_monthly_sql(t, start_d, end_d, account_filter))
+    else:
+        mrr = ("mrr_cube", mrr_cube_sql(t, start_d, end_d, account_filter))
+    return {
+        mrr[0]: mrr[1],
+        "closed_revenue_monthly": closed_revenue_sql(t, start_d, end_d, account_filter),
+        "pipeline_coverage": pipeline_coverage_sql(t, start_d, end_d, account_filter),
+        "open_pipeline_by_stage": open_pipeline_by_stage_sql(t, account_filter),
+    }
+
+
+# -----------------------------
+# Health, stage dynamics, data quality
+# -----------------------------
+def health_snapshot_sql(t: DatasetTables, start_d: date, end_d: date) -> SqlWithParams:
+    sql = f"""
+    with h as (
+        select *
+        from {t.health}
+    ),
+    scoped as (
+        select *
+        from h
+        where month >= ? and month <= ?
+    ),
+    maxm as (select max(month) as max_month from scoped)
+    select
+        s.*
+    from scoped s
+    join maxm on s.month = maxm.max_month;
+    """
+    return sql, (start_d, end_d)
+
+
+def ticket_counts_90d_sql(t: DatasetTables, as_of_month: date) -> SqlWithParams:
+    sql = f"""
+    select
+        account_id,
+        count(*) as ticket_cnt_90d
+    from {t.support_tickets}
+    where created_date >= dateadd(day, -90, to_date(?))
+    group by account_id;
+    """
+    return sql, (as_of_month,)
+
+
+def stage_durations_sql(t: DatasetTables, account_filter: AccountFilter) -> SqlWithParams:
+    filter_sql, filter_params = t.filter_sql(account_filter)
+    sql = f"""
+    with sh as (
+        select
+            sh.opp_id,
+            sh.account_id,
+            sh.stage,
+            sh.stage_start_date,
+            sh.stage_end_date
+        from {t.stage_history} sh
+        join {t.accounts} a on a.account_id = sh.account_id
+        {t.reps_join("a.owner_rep_id")}
+        where {filter_sql}
+    )
+    select
+        stage,
+        count(distinct opp_id) as deals_reached_stage,
+        round(avg(datediff(day, stage_start_date, stage_end_date)), 2) as avg_stage_duration_days
+    from sh
+    where stage_end_date is not null
+    group by stage
+    order by deals_reached_stage desc;
+    """
+    return sql, tuple(filter_params)
+
+
+def stage_conversion_sql(t: DatasetTables, account_filter: AccountFilter) -> SqlWithParams:
+    filter_sql, filter_params = t.filter_sql(account_filter)
+    sql = f"""
+    with sh as (
+        select
+            sh.opp_id,
+            sh.account_id,
+            sh.stage,
+            sh.stage_start_date
+        from {t.stage_history} sh
+        join {t.accounts} a on a.account_id = sh.account_id
+        {t.reps_join("a.owner_rep_id")}
+        where {filter_sql}
+    ),
+    ordered as (
+        select
+            opp_id,
+            stage as from_stage,
+            lead(stage) over (partition by opp_id order by stage_start_date) as to_stage
+        from sh
+    ),
+    trans as (
+        select
+            from_stage,
+            to_stage,
+            count(*) as deals_progressed
+        from ordered
+        where to_stage is not null
+        group by from_stage, to_stage
+    ),
+    in_stage as (
+        select
+            stage as from_stage,
+            count(distinct opp_id) as deals_in_stage
+        from sh
+        group by stage
+    )
+    select
+        t.from_stage,
+        t.to_stage,
+        t.deals_progressed,
+        i.deals_in_stage,
+        round(100 * t.deals_progressed / nullif(i.deals_in_stage, 0), 2) as conversion_rate_pct
+    from trans t
+    join in_stage i using(from_stage)
+    order by conversion_rate_pct desc;
+    """
+    return sql, tuple(filter_params)
+
+
+def data_quality_sql(t: DatasetTables) -> List[Tuple[str, str]]:
+    checks = [
+        ("MRR date bounds", f"select min(month) as min_month, max(month) as max_month from {t.fct_mrr}"),
+        ("Pipeline close bounds", f"select min(close_date) as min_close, max(close_date) as max_close from {t.fct_pipeline}"),
+        ("Row count — Accounts", f"select count(*) as row_count from {t.accounts}"),
+        ("Row count — FCT_MRR", f"select count(*) as row_count from {t.fct_mrr}"),
+        ("Row count — FCT_PIPELINE", f"select count(*) as row_count from {t.fct_pipeline}"),
+    ]
+    if t.stage_history:
+        checks.append(("Row count — Stage History", f"select count(*) as row_count from {t.stage_history}"))
+    if t.support_tickets:
+        checks.append(("Row count — Support Tickets", f"select count(*) as row_count from {t.support_tickets}"))
+    return checks
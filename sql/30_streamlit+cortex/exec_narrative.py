@@ -0,0 +1,333 @@
+# exec_narrative.py
+# Purpose: The executive narrative prompt and its KPI context (ctx), shared by the app and
+#   the batch job sql/40_jobs/generate_slice_narratives.py.
+#   - exec_narrative_prompt(ctx): the board-update prompt for one filter state
+#   - slice_kpis_sql() / slice_contexts(): ctx for every segment / region slice (plus ALL)
+#     from one grouped query (GROUPING SETS over the MRR rollup and the pipeline)
+#   - the job writes one narrative per slice to AGENTS.EXEC_NARRATIVES; the app looks up the
+#     row for its slice + window + narrative_ctx_key(ctx), so a narrative generated from
+#     different numbers (the marts were refreshed since) is never shown
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+import mrr_rollup
+from formatting import fmt_currency, fmt_pct, fmt_x
+from gtm_metrics.quality import RETENTION_COVERAGE_THRESHOLD_PCT, retention_quality
+from kpis import compute_kpis
+from llm_cache import pack_fingerprint
+from query_builder import AccountFilter
+
+
+CORTEX_MODEL = "mistral-large2"
+LLM_PROMPT_VERSION = "1"  # bump when a prompt template changes (invalidates cached responses)
+
+DB = "GTM_COPILOT"
+NARRATIVES_TABLE = f"{DB}.AGENTS.EXEC_NARRATIVES"
+PROMPTS_TABLE = f"{DB}.AGENTS.SLICE_NARRATIVE_PROMPTS"
+
+# Sliced dimensions -> account column; every slice is one value of one dimension, plus ALL
+SLICE_DIMS: Dict[str, str] = {"SEGMENT": "segment", "REGION": "region"}
+ALL_SLICE = ("ALL", "ALL")
+
+
+def _metric_for_llm(v: Any, label: str, kind: str) -> str:
+    if v is None or (isinstance(v, float) and pd.isna(v)):
+        return f"{label} data not available for selected period"
+    try:
+        x = float(v)
+        if kind == "currency":
+            return fmt_currency(x)
+        if kind == "pct":
+            return fmt_pct(x)
+        if kind == "x":
+            return fmt_x(x)
+        return str(v)
+    except Exception:
+        s = str(v).strip()
+        return s if s else f"{label} data not available for selected period"
+
+
+def exec_narrative_prompt(ctx: Dict) -> str:
+    arr = _metric_for_llm(ctx.get("arr_latest"), "ARR", "currency")
+    nrr = _metric_for_llm(ctx.get("nrr_latest"), "NRR", "pct")
+    grr = _metric_for_llm(ctx.get("grr_latest"), "GRR", "pct")
+    win = _metric_for_llm(ctx.get("win_latest"), "Win Rate", "pct")
+    coverage = _metric_for_llm(ctx.get("coverage_ratio"), "Pipeline Coverage", "x")
+
+    retention_interpretable = bool(ctx.get("retention_interpretable", False))
+    retention_note = str(ctx.get("retention_note") or "Retention interpretability not provided; treat as NOT fully loaded.")
+
+    prompt = f"""
+You are a Chief Revenue Officer writing a board-level executive update.
+
+IMPORTANT:
+- Do NOT use markdown symbols like ### or ##
+- Do NOT include quotation marks
+- Do NOT repeat the prompt
+- Write in clean executive prose
+- Be concise, structured, and confident
+
+STRICT DATA INTERPRETATION RULES (NON-NEGOTIABLE):
+- Retention interpretability flag: {retention_interpretable}
+- Retention note: {retention_note}
+
+- If retention_interpretable is FALSE:
+  You MUST NOT interpret NRR/GRR as churn or deterioration.
+  You MUST say retention is not fully loaded/complete for the selected period.
+
+- If NRR or GRR equals 0.00% AND retention_interpretable is FALSE:
+  DO NOT interpret this as churn. Call it a data completeness/boundary issue.
+
+- Only discuss churn if explicitly supported by confirmed retention data (retention_interpretable = TRUE).
+
+Time Window:
+{ctx.get('filters_text')}
+
+Key Metrics:
+ARR: {arr}
+NRR: {nrr}
+GRR: {grr}
+Win Rate: {win}
+Pipeline Coverage: {coverage}
+
+Structure your response EXACTLY as:
+
+Headline:
+<1 strong executive sentence>
+
+Executive Summary:
+<3–5 sentences explaining overall performance>
+
+Key Risks:
+1. ...
+2. ...
+3. ...
+
+Recommended Actions:
+1. ...
+2. ...
+3. ...
+"""
+    return prompt
+
+
+def narrative_ctx_key(ctx: Dict, model: str = CORTEX_MODEL, version: str = LLM_PROMPT_VERSION) -> str:
+    # The numbers the narrative was written from; filters_text is presentation only
+    return pack_fingerprint("exec_narrative", model, version, {k: v for k, v in ctx.items() if k != "filters_text"})
+
+
+def slice_label(slice_dim: str, slice_value: str) -> str:
+    return "All accounts" if slice_dim == "ALL" else f"{slice_dim.title()}: {slice_value}"
+
+
+def slice_for_filter(account_filter: AccountFilter, domains: Dict[str, List[str]]) -> Optional[Tuple[str, str]]:
+    # The precomputed slice matching the sidebar: every dimension unfiltered (nothing or
+    # everything selected) except at most one SLICE_DIMS dimension narrowed to one value
+    picked: List[Tuple[str, str]] = []
+    for dim, values in account_filter.dimensions().items():
+        full = tuple(sorted({str(v) for v in domains.get(dim, []) if v is not None}))
+        if not values or values == full:
+            continue
+        if dim in SLICE_DIMS and len(values) == 1:
+            picked.append((dim, values[0]))
+            continue
+        return None
+    if len(picked) > 1:
+        return None
+    return picked[0] if picked else ALL_SLICE
+
+
+# -----------------------------
+# All slices from one grouped query
+# -----------------------------
+def _grouping_sets(prefix: Sequence[str], dims: Dict[str, str]) -> str:
+    sets = [f"({', '.join(prefix)})" if prefix else "()"]
+    sets += [f"({', '.join([*prefix, col])})" for col in dims.values()]
+    return ", ".join(sets)
+
+
+def _slice_columns(dims: Dict[str, str]) -> str:
+    dim_case = " ".join(f"when grouping({col}) = 0 then '{dim}'" for dim, col in dims.items())
+    value_case = " ".join(f"when grouping({col}) = 0 then cast({col} as varchar)" for col in dims.values())
+    return f"case {dim_case} else 'ALL' end as slice_dim,\n            case {value_case} else 'ALL' end as slice_value"
+
+
+def slice_kpis_sql(
+    rollup_tbl: str,
+    pipeline_tbl: str,
+    accounts_tbl: str,
+    dims: Dict[str, str] = SLICE_DIMS,
+) -> str:
+    # Params: (start, end, start, end). One row set per DATASET:
+    #   MRR    per slice x month (rollup measures)
+    #   CLOSED per slice x close month (closed revenue, win rate)
+    #   OPEN   per slice (open pipeline)
+    slice_cols = _slice_columns(dims)
+    dim_cols = ", ".join(f"a.{col}" for col in dims.values())
+    return f"""
+    with mrr as (
+        select
+            {slice_cols},
+            month,
+            sum(total_mrr) as total_mrr,
+            sum(account_rows) as account_rows,
+            sum(active_accounts) as active_accounts,
+            sum(active_mrr) as active_mrr,
+            sum(next_month_mrr) as next_month_mrr,
+            sum(retained_mrr) as retained_mrr
+        from {rollup_tbl}
+        where month >= ?
+          and month <= ?
+        group by grouping sets ({_grouping_sets(["month"], dims)})
+    ),
+    closed_base as (
+        select
+            {dim_cols},
+            date_trunc('month', p.close_date) as month,
+            p.amount,
+            p.is_won
+        from {pipeline_tbl} p
+        join {accounts_tbl} a
+            on a.account_id = p.account_id
+        where p.is_closed = true
+          and p.close_date is not null
+          and date_trunc('month', p.close_date) >= ?
+          and date_trunc('month', p.close_date) <= ?
+    ),
+    closed as (
+        select
+            {slice_cols},
+            month,
+            round(sum(amount), 2) as total_closed_revenue,
+            round(100 * sum(case when is_won then 1 else 0 end) / nullif(count(*), 0), 2) as win_rate_pct
+        from closed_base
+        group by grouping sets ({_grouping_sets(["month"], dims)})
+    ),
+    open_base as (
+        select
+            {dim_cols},
+            p.amount
+        from {pipeline_tbl} p
+        join {accounts_tbl} a
+            on a.account_id = p.account_id
+        where p.is_closed = false
+    ),
+    open_pipe as (
+        select
+            {slice_cols},
+            round(sum(amount), 2) as total_open_pipeline
+        from open_base
+        group by grouping sets ({_grouping_sets([], dims)})
+    )
+    select 'MRR' as dataset, slice_dim, slice_value, month,
+           total_mrr, account_rows, active_accounts, active_mrr, next_month_mrr, retained_mrr,
+           null as total_closed_revenue, null as win_rate_pct, null as total_open_pipeline
+    from mrr
+    where slice_value is not null
+    union all
+    select 'CLOSED', slice_dim, slice_value, month,
+           null, null, null, null, null, null,
+           total_closed_revenue, win_rate_pct, null
+    from closed
+    where slice_value is not null
+    union all
+    select 'OPEN', slice_dim, slice_value, null,
+           null, null, null, null, null, null,
+           null, null, total_open_pipeline
+    from open_pipe
+    where slice_value is not null
+    """
+
+
+@dataclass
+class SliceContext:
+    slice_dim: str
+    slice_value: str
+    ctx: Dict[str, Any]
+
+    @property
+    def label(self) -> str:
+        return slice_label(self.slice_dim, self.slice_value)
+
+
+def _slice_ctx(rows: pd.DataFrame, filters_text: str, coverage_threshold_pct: float) -> Dict[str, Any]:
+    # The app's KPI derivation (kpis.compute_kpis over mrr_rollup's ARR / retention trends,
+    # the closed-revenue and pipeline-coverage frames) applied to one slice's rows
+    mrr = rows[rows["DATASET"] == "MRR"].sort_values("MONTH")
+    closed = rows[rows["DATASET"] == "CLOSED"].sort_values("MONTH")
+    open_rows = rows[rows["DATASET"] == "OPEN"]
+
+    open_pipeline = open_rows["TOTAL_OPEN_PIPELINE"].iloc[0] if not open_rows.empty else None
+    avg3 = closed["TOTAL_CLOSED_REVENUE"].tail(3).mean() if not closed.empty else None
+    coverage_ratio = None
+    if open_pipeline is not None and not pd.isna(open_pipeline) and avg3:
+        coverage_ratio = round(float(open_pipeline) / float(avg3), 2)
+
+    kpis = compute_kpis(
+        mrr_rollup.arr_trend(mrr),
+        mrr_rollup.retention_trend(mrr),
+        closed.rename(columns={"MONTH": "CLOSE_MONTH"}),
+        pd.DataFrame({"PIPELINE_COVERAGE_RATIO": [coverage_ratio]}),
+    )
+
+    cohort_accounts = next_accounts = None
+    if kpis.ret_month is not None:
+        counts = mrr_rollup.retention_cohort_counts(mrr, kpis.ret_month)
+        cohort_accounts, next_accounts = counts["cohort_accounts"], counts["next_month_accounts"]
+
+    dq = retention_quality(kpis.ret_month, cohort_accounts, next_accounts, coverage_threshold_pct)
+    return {
+        "filters_text": filters_text,
+        **kpis.ctx_values(),
+        "retention_interpretable": dq["retention_interpretable"],
+        "retention_note": dq["retention_note"],
+    }
+
+
+def slice_contexts(
+    df: pd.DataFrame,
+    start_d: date,
+    end_d: date,
+    coverage_threshold_pct: float = RETENTION_COVERAGE_THRESHOLD_PCT,
+) -> List[SliceContext]:
+    if df is None or df.empty:
+        return []
+    frame = df.assign(**{
+        col: pd.to_numeric(df[col], errors="coerce").astype("float64")
+        for col in df.columns
+        if col not in ("DATASET", "SLICE_DIM", "SLICE_VALUE", "MONTH")
+    })
+
+    out: List[SliceContext] = []
+    for (slice_dim, slice_value), rows in frame.groupby(["SLICE_DIM", "SLICE_VALUE"], sort=True):
+        filters_text = f"{start_d} to {end_d}"
+        if slice_dim != "ALL":
+            filters_text += f" · {slice_label(slice_dim, slice_value)}"
+        out.append(SliceContext(str(slice_dim), str(slice_value), _slice_ctx(rows, filters_text, coverage_threshold_pct)))
+    # ALL first, then by dimension and value
+    return sorted(out, key=lambda s: (s.slice_dim != "ALL", s.slice_dim, s.slice_value))
+
+
+def latest_narrative_sql(table: str = NARRATIVES_TABLE) -> str:
+    # Params: (slice_dim, slice_value, window_start, window_end, model, prompt_version, ctx_key)
+    return f"""
+    select
+        narrative,
+        filters_text,
+        generated_at
+    from {table}
+    where slice_dim = ?
+      and slice_value = ?
+      and window_start = ?
+      and window_end = ?
+      and model = ?
+      and prompt_version = ?
+      and ctx_key = ?
+      and narrative is not null
+    order by generated_at desc
+    limit 1
+    """
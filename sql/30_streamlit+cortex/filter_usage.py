@@ -0,0 +1,64 @@
+# filter_usage.py
+# Purpose: Which segment / region selections people actually use, so the cache warm-up job
+#   (sql/40_jobs/warm_cache.py) pre-fills the common ones and not just the default state.
+#   The app records each new filter state of a session as a daily counter per combination
+#   in UTIL.FILTER_USAGE (off the render path); the job reads the top N of a recent window.
+#   Selections are stored as JSON arrays of the canonical (sorted) values; [] means the
+#   user cleared that filter.
+
+import json
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from query_backend import QueryBackend
+from query_builder import AccountFilter
+
+
+USAGE_TABLE = "GTM_COPILOT.UTIL.FILTER_USAGE"
+
+Combo = Tuple[Tuple[str, ...], Tuple[str, ...]]  # (segments, regions)
+
+
+class FilterUsageLog:
+    def __init__(self, backend: QueryBackend, table: str = USAGE_TABLE):
+        self.backend = backend
+        self.table = table
+        self.backend.execute(
+            f"""
+            create table if not exists {table} (
+                usage_day date not null,
+                segments varchar not null,
+                regions varchar not null,
+                uses integer not null
+            )
+            """
+        )
+
+    def record(self, account_filter: AccountFilter, day: Optional[date] = None) -> None:
+        key = (day or date.today(), json.dumps(list(account_filter.segments)), json.dumps(list(account_filter.regions)))
+        where = "usage_day = ? and segments = ? and regions = ?"
+        # A lost increment under concurrent sessions only skews a ranking
+        self.backend.execute(f"update {self.table} set uses = uses + 1 where {where}", key)
+        self.backend.execute(
+            f"insert into {self.table} (usage_day, segments, regions, uses) "
+            f"select ?, ?, ?, 1 where not exists (select 1 from {self.table} where {where})",
+            key + key,
+        )
+
+    def top(self, n: int, days: int = 30, today: Optional[date] = None) -> List[Tuple[Combo, int]]:
+        since = (today or date.today()) - timedelta(days=days)
+        df = self.backend.query(
+            f"""
+            select segments, regions, sum(uses) as uses
+            from {self.table}
+            where usage_day >= ?
+            group by segments, regions
+            order by uses desc, segments, regions
+            limit ?
+            """,
+            (since, int(n)),
+        )
+        return [
+            ((tuple(json.loads(s)), tuple(json.loads(r))), int(u))
+            for s, r, u in zip(df["SEGMENTS"], df["REGIONS"], df["USES"])
+        ]
@@ -0,0 +1,47 @@
+# formatting.py
+# Purpose: Display formatting for KPI values ($1.23M, 98.50%, 3.20x), shared by the app and
+#   the narrative prompts (exec_narrative.py), so a batch-generated narrative quotes the
+#   numbers exactly as the KPI cards show them.
+
+from typing import Optional
+
+import pandas as pd
+
+
+def fmt_currency(x: Optional[float]) -> str:
+    if x is None or pd.isna(x):
+        return "—"
+    sign = "-" if x < 0 else ""
+    x = abs(float(x))
+    if x >= 1_000_000_000:
+        return f"{sign}${x/1_000_000_000:,.2f}B"
+    if x >= 1_000_000:
+        return f"{sign}${x/1_000_000:,.2f}M"
+    if x >= 1_000:
+        return f"{sign}${x:,.0f}"
+    return f"{sign}${x:,.2f}"
+
+
+def fmt_number(x: Optional[float]) -> str:
+    if x is None or pd.isna(x):
+        return "—"
+    x = float(x)
+    if abs(x) >= 1_000_000_000:
+        return f"{x/1_000_000_000:,.2f}B"
+    if abs(x) >= 1_000_000:
+        return f"{x/1_000_000:,.2f}M"
+    if abs(x) >= 1_000:
+        return f"{x:,.0f}"
+    return f"{x:,.2f}"
+
+
+def fmt_pct(x: Optional[float]) -> str:
+    if x is None or pd.isna(x):
+        return "—"
+    return f"{float(x):.2f}%"
+
+
+def fmt_x(x: Optional[float]) -> str:
+    if x is None or pd.isna(x):
+        return "—"
+    return f"{float(x):.2f}x"
@@ -0,0 +1,31 @@
+# gtm_metrics
+# Purpose: Headless metrics engine. The datasets and headline KPIs behind every view of the
+#   Streamlit app, over any query backend, importable without running the UI.
+#
+#   from query_backend import backend_from_env
+#   from gtm_metrics import MetricsEngine
+#
+#   engine = MetricsEngine.from_backend(backend_from_env())
+#   start_d, end_d = engine.date_bounds()
+#   kpis = engine.kpis(start_d, end_d, engine.default_filter())
+
+from dataset_sql import DatasetTables
+from kpis import KpiResult, KpiValue, compute_kpis
+from query_builder import AccountFilter
+
+from gtm_metrics.engine import DataQualityCheck, MetricsEngine, QueryFn, resolve_tables
+from gtm_metrics.quality import RETENTION_COVERAGE_THRESHOLD_PCT, retention_quality
+
+__all__ = [
+    "AccountFilter",
+    "DataQualityCheck",
+    "DatasetTables",
+    "KpiResult",
+    "KpiValue",
+    "MetricsEngine",
+    "QueryFn",
+    "RETENTION_COVERAGE_THRESHOLD_PCT",
+    "compute_kpis",
+    "resolve_tables",
+    "retention_quality",
+]
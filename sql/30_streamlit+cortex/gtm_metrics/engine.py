@@ -0,0 +1,275 @@
+# engine.py
+# Purpose: Every dataset the app shows, as plain methods over a query function: no Streamlit,
+#   no module-level state. The app, batch jobs, benchmarks and tests call the same code.
+#     - query:  (sql, params) -> DataFrame; QueryBackend.query, or the app's cached run_sql
+#     - tables: the resolved DatasetTables (MetricsEngine.from_backend resolves them)
+#   mrr_cube / mrr_rollup_monthly are the frames the MRR datasets derive from. They are
+#   memoized per engine (a few filter states); a caller with its own cache overrides them
+#   (the app routes them through st.cache_data) and fetches with query_mrr_cube /
+#   query_mrr_rollup_monthly.
+
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import dataset_sql
+import mrr_cube
+import mrr_rollup
+from dataset_sql import DatasetTables
+from gtm_metrics.quality import retention_quality
+from kpis import KpiResult, compute_kpis
+from query_backend import QueryBackend
+from query_builder import AccountFilter
+from query_executor import run_concurrent
+from table_versions import TRACKED_SCHEMAS, table_metadata
+
+
+QueryFn = Callable[[str, Optional[Tuple[Any, ...]]], pd.DataFrame]
+DataQualityCheck = Tuple[str, Optional[pd.DataFrame], Optional[str]]
+
+
+def resolve_tables(backend: QueryBackend) -> Dict[str, Optional[str]]:
+    # One metadata query; per-candidate probes only when it fails (as in the app)
+    try:
+        return dataset_sql.resolve_from_metadata(table_metadata(backend.table_metadata(TRACKED_SCHEMAS)))
+    except Exception:
+        pass
+    resolved: Dict[str, Optional[str]] = {}
+    for key, candidates in dataset_sql.TABLE_CANDIDATES.items():
+        resolved[key] = None
+        for c in candidates:
+            try:
+                backend.query(dataset_sql.table_probe_sql(c))
+            except Exception:
+                continue
+            resolved[key] = c
+            break
+    return resolved
+
+
+class MetricsEngine:
+    def __init__(self, query: QueryFn, tables: DatasetTables, frame_cache_size: int = 8):
+        self.query = query
+        self.tables = tables
+        self.frame_cache_size = int(frame_cache_size)
+        self._frames: "OrderedDict[Tuple[Any, ...], Any]" = OrderedDict()
+        self._inflight: Dict[Tuple[Any, ...], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_backend(cls, backend: QueryBackend, query: Optional[QueryFn] = None, **kwargs: Any) -> "MetricsEngine":
+        resolved = resolve_tables(backend)
+        missing = [k for k in dataset_sql.REQUIRED_TABLES if not resolved.get(k)]
+        if missing:
+            raise ValueError(f"missing required tables: {', '.join(missing)}")
+        return cls(query or backend.query, DatasetTables.from_resolved(resolved), **kwargs)
+
+    def _run(self, sql: str, params: Optional[Tuple[Any, ...]] = None) -> pd.DataFrame:
+        return self.query(sql, params)
+
+    def _memo(self, key: Tuple[Any, ...], compute: Callable[[], Any]) -> Any:
+        # Single-flight: concurrent datasets of one filter state share one fetch
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                return self._frames[key]
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._frames:
+                    return self._frames[key]
+            value = compute()
+            with self._lock:
+                self._frames[key] = value
+                self._inflight.pop(key, None)
+                while len(self._frames) > self.frame_cache_size:
+                    self._frames.popitem(last=False)
+        return value
+
+    # -----------------------------
+    # Startup
+    # -----------------------------
+    def filter_domains(self) -> Dict[str, List[str]]:
+        t = self.tables
+        df = self._run(dataset_sql.account_domains_sql(t))
+        reps_sql = dataset_sql.rep_domains_sql(t)
+        return dataset_sql.filter_domains(df, self._run(reps_sql) if reps_sql else None)
+
+    def date_bounds(self) -> Tuple[date, date]:
+        return dataset_sql.date_bounds(self._run(dataset_sql.date_bounds_sql(self.tables)))
+
+    def default_filter(self) -> AccountFilter:
+        return dataset_sql.default_filter(self.filter_domains(), self.tables)
+
+    # -----------------------------
+    # MRR frames
+    # -----------------------------
+    def query_mrr_cube(self, start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+        # One scan of FCT_MRR ⨝ ACCOUNTS per filter state; every MRR-based dataset derives from it
+        return mrr_cube.prepare_cube(self._run(*dataset_sql.mrr_cube_sql(self.tables, start_d, end_d, account_filter)))
+
+    def query_mrr_rollup_monthly(
+        self, start_d: date, end_d: date, account_filter: AccountFilter
+    ) -> Optional[pd.DataFrame]:
+        # Per-month sums of the dimension rollup for this slice; None -> use the account-level cube
+        if not dataset_sql.rollup_applies(self.tables, account_filter):
+            return None
+        try:
+            return mrr_rollup.prepare_monthly(
+                self._run(*dataset_sql.rollup_monthly_sql(self.tables, start_d, end_d, account_filter))
+            )
+        except Exception:
+            return None
+
+    def mrr_cube(self, start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+        return self._memo(("cube", start_d, end_d, account_filter), lambda: self.query_mrr_cube(start_d, end_d, account_filter))
+
+    def mrr_rollup_monthly(self, start_d: date, end_d: date, account_filter: AccountFilter) -> Optional[pd.DataFrame]:
+        return self._memo(
+            ("rollup", start_d, end_d, account_filter),
+            lambda: self.query_mrr_rollup_monthly(start_d, end_d, account_filter),
+        )
+
+    # -----------------------------
+    # KPI datasets
+    # -----------------------------
+    def arr_trend(self, start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+        monthly = self.mrr_rollup_monthly(start_d, end_d, account_filter)
+        if monthly is not None:
+            return mrr_rollup.arr_trend(monthly)
+        return mrr_cube.arr_trend(self.mrr_cube(start_d, end_d, account_filter))
+
+    def retention_trend(self, start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+        # Cohort logic: accounts with MRR>0 in month T vs the same accounts in T+1; boundary month excluded
+        monthly = self.mrr_rollup_monthly(start_d, end_d, account_filter)
+        if monthly is not None:
+            return mrr_rollup.retention_trend(monthly)
+        return mrr_cube.retention_trend(self.mrr_cube(start_d, end_d, account_filter))
+
+    def closed_revenue_monthly(self, start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+        return self._run(*dataset_sql.closed_revenue_sql(self.tables, start_d, end_d, account_filter))
+
+    def pipeline_coverage(self, start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+        return self._run(*dataset_sql.pipeline_coverage_sql(self.tables, start_d, end_d, account_filter))
+
+    def open_pipeline_by_stage(self, account_filter: AccountFilter) -> pd.DataFrame:
+        return self._run(*dataset_sql.open_pipeline_by_stage_sql(self.tables, account_filter))
+
+    def kpi_datasets(
+        self, start_d: date, end_d: date, account_filter: AccountFilter, max_workers: int = 8
+    ) -> Dict[str, pd.DataFrame]:
+        # The five independent datasets behind the KPI cards, fanned out concurrently
+        results, _ = run_concurrent({
+            "arr_trend": lambda: self.arr_trend(start_d, end_d, account_filter),
+            "retention_trend": lambda: self.retention_trend(start_d, end_d, account_filter),
+            "closed_revenue_monthly": lambda: self.closed_revenue_monthly(start_d, end_d, account_filter),
+            "pipeline_coverage": lambda: self.pipeline_coverage(start_d, end_d, account_filter),
+            "open_pipeline_by_stage": lambda: self.open_pipeline_by_stage(account_filter),
+        }, max_workers=max_workers)
+        return results
+
+    def kpis(
+        self, start_d: date, end_d: date, account_filter: AccountFilter, arr_trend_lookback: int = 3
+    ) -> KpiResult:
+        d = self.kpi_datasets(start_d, end_d, account_filter)
+        return compute_kpis(
+            d["arr_trend"], d["retention_trend"], d["closed_revenue_monthly"], d["pipeline_coverage"],
+            arr_trend_lookback=arr_trend_lookback,
+        )
+
+    # -----------------------------
+    # Retention detail
+    # -----------------------------
+    def mrr_movement_summary(self, start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+        monthly = self.mrr_rollup_monthly(start_d, end_d, account_filter)
+        if monthly is not None:
+            return mrr_rollup.movement_summary(monthly)
+        return mrr_cube.movement_summary(self.mrr_cube(start_d, end_d, account_filter))
+
+    def top_mrr_movers(
+        self, start_d: date, end_d: date, account_filter: AccountFilter
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        return mrr_cube.top_movers(self.mrr_cube(start_d, end_d, account_filter))
+
+    def retention_data_quality(
+        self,
+        start_d: date,
+        end_d: date,
+        account_filter: AccountFilter,
+        cohort_month: Optional[date],
+        coverage_threshold_pct: float = 90.0,
+    ) -> Dict[str, Any]:
+        if cohort_month is None:
+            return retention_quality(None, None, None, coverage_threshold_pct)
+        try:
+            monthly = self.mrr_rollup_monthly(start_d, end_d, account_filter)
+            if monthly is not None:
+                counts = mrr_rollup.retention_cohort_counts(monthly, cohort_month)
+            else:
+                counts = mrr_cube.retention_cohort_counts(self.mrr_cube(start_d, end_d, account_filter), cohort_month)
+            return retention_quality(
+                cohort_month, counts["cohort_accounts"], counts["next_month_accounts"], coverage_threshold_pct
+            )
+        except Exception as e:
+            return {
+                "cohort_accounts": None,
+                "next_month_accounts": None,
+                "next_month_coverage_pct": None,
+                "retention_interpretable": False,
+                "coverage_threshold_pct": float(coverage_threshold_pct),
+                "retention_note": f"Retention data-quality check failed: {str(e)}",
+            }
+
+    # -----------------------------
+    # Health (the health mart when present, else the fallback score over the cube)
+    # -----------------------------
+    def ticket_counts_90d(self, as_of_month: date) -> pd.DataFrame:
+        if not self.tables.support_tickets:
+            return pd.DataFrame()
+        return self._run(*dataset_sql.ticket_counts_90d_sql(self.tables, as_of_month))
+
+    def health_snapshot(self, start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+        if self.tables.health:
+            try:
+                df = self._run(*dataset_sql.health_snapshot_sql(self.tables, start_d, end_d))
+                if not df.empty:
+                    return df
+            except Exception:
+                pass
+
+        cube = self.mrr_cube(start_d, end_d, account_filter)
+        if cube.empty:
+            return pd.DataFrame()
+
+        ticket_counts = None
+        if self.tables.support_tickets:
+            ticket_counts = self.ticket_counts_90d(cube["MONTH"].max().date())
+        return mrr_cube.health_snapshot(cube, ticket_counts)
+
+    # -----------------------------
+    # Stage dynamics (empty without a stage history table)
+    # -----------------------------
+    def stage_durations(self, account_filter: AccountFilter) -> pd.DataFrame:
+        if not self.tables.stage_history:
+            return pd.DataFrame()
+        return self._run(*dataset_sql.stage_durations_sql(self.tables, account_filter))
+
+    def stage_conversion(self, account_filter: AccountFilter) -> pd.DataFrame:
+        if not self.tables.stage_history:
+            return pd.DataFrame()
+        return self._run(*dataset_sql.stage_conversion_sql(self.tables, account_filter))
+
+    # -----------------------------
+    # Data quality
+    # -----------------------------
+    def data_quality_checks(self) -> List[DataQualityCheck]:
+        results: List[DataQualityCheck] = []
+        for title, q in dataset_sql.data_quality_sql(self.tables):
+            try:
+                results.append((title, self._run(q), None))
+            except Exception as e:
+                results.append((title, None, str(e)))
+        return results
@@ -0,0 +1,44 @@
+# quality.py
+# Purpose: Retention data-quality gate: NRR / GRR for a cohort month are only interpreted
+#   when next month's MRR is (mostly) loaded for the cohort. Used by MetricsEngine and the
+#   executive narrative context (app and batch job).
+
+from datetime import date
+from typing import Any, Dict, Optional
+
+
+RETENTION_COVERAGE_THRESHOLD_PCT = 90.0
+
+
+def retention_quality(
+    cohort_month: Optional[date],
+    cohort_accounts: Optional[int],
+    next_month_accounts: Optional[int],
+    coverage_threshold_pct: float = RETENTION_COVERAGE_THRESHOLD_PCT,
+) -> Dict[str, Any]:
+    # Retention is only interpretable when next month's MRR is (mostly) loaded for the cohort
+    if cohort_month is None:
+        return {
+            "cohort_accounts": None,
+            "next_month_accounts": None,
+            "next_month_coverage_pct": None,
+            "retention_interpretable": False,
+            "coverage_threshold_pct": float(coverage_threshold_pct),
+            "retention_note": "Retention cohort month not available for selected filters.",
+        }
+
+    cov = round(100 * next_month_accounts / cohort_accounts, 2) if cohort_accounts else None
+    interpretable = (cov is not None) and float(cov) >= float(coverage_threshold_pct)
+    note = (
+        "Retention is interpretable (next-month MRR coverage is high)."
+        if interpretable
+        else "Retention is NOT interpretable: next-month MRR appears incomplete/not loaded for the selected period."
+    )
+    return {
+        "cohort_accounts": int(cohort_accounts) if cohort_accounts is not None else None,
+        "next_month_accounts": int(next_month_accounts) if next_month_accounts is not None else None,
+        "next_month_coverage_pct": float(cov) if cov is not None else None,
+        "retention_interpretable": bool(interpretable),
+        "coverage_threshold_pct": float(coverage_threshold_pct),
+        "retention_note": note,
+    }
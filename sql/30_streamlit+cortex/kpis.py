@@ -0,0 +1,135 @@
+# kpis.py
+# Purpose: Headline KPIs (ARR, NRR, GRR, win rate, pipeline coverage) derived once per filter
+#   state from the ARR trend, retention trend, closed-revenue and coverage frames. One
+#   vectorized pass per series (mask the valid rows, order by month, take the last two):
+#   no frame copies, no date re-parsing (frames arrive decoded, query_backend.compact_frame).
+#   The KpiResult feeds the KPI cards, the alert banner, the executive narrative ctx and the
+#   Q&A evidence pack, so every consumer shows the same numbers.
+#     - ARR:       latest month with TOTAL_ARR > 0, previous such month
+#     - NRR / GRR: latest complete cohort month (START_MRR > 0), previous cohort month
+#     - win rate:  latest close month with TOTAL_CLOSED_REVENUE > 0, previous such month
+
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class KpiValue:
+    latest: Optional[float] = None
+    prev: Optional[float] = None
+    month: Optional[date] = None
+
+    @property
+    def delta(self) -> Optional[float]:
+        if self.latest is None or self.prev is None:
+            return None
+        return self.latest - self.prev
+
+
+@dataclass(frozen=True)
+class KpiResult:
+    arr: KpiValue = field(default_factory=KpiValue)
+    nrr: KpiValue = field(default_factory=KpiValue)
+    grr: KpiValue = field(default_factory=KpiValue)
+    win_rate: KpiValue = field(default_factory=KpiValue)
+    start_mrr: Optional[float] = None  # cohort MRR of the latest complete retention month
+    close_month: Optional[date] = None
+    coverage_ratio: Optional[float] = None
+    coverage_open: Optional[float] = None
+    coverage_avg3: Optional[float] = None
+    arr_trending_down: bool = False
+
+    @property
+    def ret_month(self) -> Optional[date]:
+        return self.nrr.month
+
+    def alerts(self, nrr_below: float, grr_below: float, coverage_below: float) -> List[str]:
+        out: List[str] = []
+        if self.nrr.latest is not None and self.nrr.latest < nrr_below:
+            out.append(f"Net Revenue Retention below {nrr_below:.0f}% (NRR={self.nrr.latest:.2f}%).")
+        if self.grr.latest is not None and self.grr.latest < grr_below:
+            out.append(f"Gross Revenue Retention below {grr_below:.0f}% (GRR={self.grr.latest:.2f}%).")
+        if self.coverage_ratio is not None and self.coverage_ratio < coverage_below:
+            out.append(f"Pipeline coverage below {coverage_below:.1f}x (Coverage={self.coverage_ratio:.2f}x).")
+        if self.arr_trending_down:
+            out.append("ARR trending down over recent months.")
+        return out
+
+    def ctx_values(self) -> Dict[str, Optional[float]]:
+        # The KPI part of the executive narrative ctx
+        return {
+            "arr_latest": self.arr.latest,
+            "nrr_latest": self.nrr.latest,
+            "grr_latest": self.grr.latest,
+            "win_latest": self.win_rate.latest,
+            "coverage_ratio": self.coverage_ratio,
+        }
+
+
+def _has(df: Optional[pd.DataFrame], cols: Sequence[str]) -> bool:
+    return df is not None and not df.empty and all(c in df.columns for c in cols)
+
+
+def latest_two(
+    df: Optional[pd.DataFrame], month_col: str, valid_col: str, value_cols: Sequence[str]
+) -> Tuple[Optional[date], Dict[str, float], Dict[str, float]]:
+    # (latest month, values at the latest month, values at the previous month) over the rows
+    # where valid_col > 0; months need not be sorted
+    if not _has(df, [month_col, valid_col, *value_cols]):
+        return None, {}, {}
+    valid = np.flatnonzero(df[valid_col].to_numpy(dtype="float64", na_value=np.nan) > 0)
+    if valid.size == 0:
+        return None, {}, {}
+    months = df[month_col].to_numpy()[valid]
+    order = valid[np.argsort(months, kind="stable")]
+    last = order[-1]
+    latest = {c: float(df[c].iat[last]) for c in value_cols}
+    prev = {c: float(df[c].iat[order[-2]]) for c in value_cols} if order.size >= 2 else {}
+    return pd.Timestamp(df[month_col].iat[last]).date(), latest, prev
+
+
+def _first_float(df: Optional[pd.DataFrame], col: str) -> Optional[float]:
+    if not _has(df, [col]):
+        return None
+    v = df[col].iat[0]
+    return None if pd.isna(v) else float(v)
+
+
+def compute_kpis(
+    arr_df: Optional[pd.DataFrame],
+    ret_df: Optional[pd.DataFrame],
+    closed_df: Optional[pd.DataFrame],
+    coverage_df: Optional[pd.DataFrame],
+    arr_trend_lookback: int = 3,
+) -> KpiResult:
+    arr_month, arr_now, arr_before = latest_two(arr_df, "MONTH", "TOTAL_ARR", ["TOTAL_ARR"])
+    ret_month, ret_now, ret_before = latest_two(ret_df, "MONTH", "START_MRR", ["NRR_PCT", "GRR_PCT", "START_MRR"])
+    close_month, win_now, win_before = latest_two(
+        closed_df, "CLOSE_MONTH", "TOTAL_CLOSED_REVENUE", ["WIN_RATE_PCT"]
+    )
+    if close_month is None:
+        # Closed-revenue months without a win-rate column still date the pipeline
+        close_month, _, _ = latest_two(closed_df, "CLOSE_MONTH", "TOTAL_CLOSED_REVENUE", [])
+
+    trending_down = False
+    if arr_trend_lookback >= 3 and _has(arr_df, ["MONTH", "TOTAL_ARR"]) and len(arr_df) >= arr_trend_lookback:
+        order = np.argsort(arr_df["MONTH"].to_numpy(), kind="stable")
+        tail = arr_df["TOTAL_ARR"].to_numpy()[order[-arr_trend_lookback:]]
+        trending_down = bool(tail[-1] < tail[0])
+
+    return KpiResult(
+        arr=KpiValue(arr_now.get("TOTAL_ARR"), arr_before.get("TOTAL_ARR"), arr_month),
+        nrr=KpiValue(ret_now.get("NRR_PCT"), ret_before.get("NRR_PCT"), ret_month),
+        grr=KpiValue(ret_now.get("GRR_PCT"), ret_before.get("GRR_PCT"), ret_month),
+        win_rate=KpiValue(win_now.get("WIN_RATE_PCT"), win_before.get("WIN_RATE_PCT"), close_month),
+        start_mrr=ret_now.get("START_MRR"),
+        close_month=close_month,
+        coverage_ratio=_first_float(coverage_df, "PIPELINE_COVERAGE_RATIO"),
+        coverage_open=_first_float(coverage_df, "TOTAL_OPEN_PIPELINE"),
+        coverage_avg3=_first_float(coverage_df, "AVG_3M_CLOSED_REVENUE"),
+        arr_trending_down=trending_down,
+    )
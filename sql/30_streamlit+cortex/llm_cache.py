@@ -0,0 +1,419 @@
+# llm_cache.py
+# Purpose: Response cache for AI_COMPLETE calls (Q&A, agent, executive narrative).
+#   st.cache_data keys on the exact (question, pack_json) / ctx, so a rephrased question or
+#   a float that differs in its last digit pays for a fresh completion. Here the key is a
+#   fingerprint of the normalized prompt inputs:
+#     - the JSON pack / ctx canonicalized (sorted keys, floats rounded to significant digits)
+#     - the question lowercased, punctuation / filler stripped, whitespace collapsed
+#     - the call kind, model and prompt version
+#   An optional embedding lookup serves a cached answer for the same pack when the question
+#   embedding is close enough (cosine >= threshold).
+#
+#   Stores are persistent and shared by app replicas:
+#     - TableStore:  GTM_COPILOT.CORTEX.LLM_RESPONSE_CACHE through the query backend
+#     - SQLiteStore: a local file (offline dev)
+#   Entries expire after ttl_s; past max_entries the least recently used are evicted.
+
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from query_backend import QueryBackend
+
+
+DEFAULT_TABLE = "GTM_COPILOT.CORTEX.LLM_RESPONSE_CACHE"
+COLUMNS = ["cache_key", "pack_key", "kind", "question_norm", "embedding", "response", "created_at", "last_used_at", "hits"]
+
+_FILLER = re.compile(
+    r"^(?:(?:please|pls|hey|hi|can you|could you|would you|will you|tell me|i want to know|i'd like to know)\b\s*)+"
+)
+_PUNCT = re.compile(r"[^\w\s%.$-]+")
+
+
+# -----------------------------
+# Normalization / fingerprints
+# -----------------------------
+def _round_sig(x: float, digits: int) -> float:
+    if x == 0 or not math.isfinite(x):
+        return x
+    return round(x, digits - 1 - int(math.floor(math.log10(abs(x)))))
+
+
+def canonicalize(value: Any, float_digits: int = 6) -> Any:
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, float):
+        return _round_sig(value, float_digits)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, dict):
+        return {str(k): canonicalize(v, float_digits) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(v, float_digits) for v in value]
+    try:
+        # numpy / pandas scalars
+        return canonicalize(value.item(), float_digits)
+    except Exception:
+        return str(value)
+
+
+def canonical_json(pack: Any, float_digits: int = 6) -> str:
+    if isinstance(pack, str):
+        try:
+            pack = json.loads(pack)
+        except ValueError:
+            return pack.strip()
+    return json.dumps(canonicalize(pack, float_digits), sort_keys=True, separators=(",", ":"), default=str)
+
+
+def normalize_question(question: Optional[str]) -> str:
+    q = unicodedata.normalize("NFKC", question or "").lower()
+    q = _PUNCT.sub(" ", q)
+    q = " ".join(q.split())
+    q = _FILLER.sub("", q)
+    return q.rstrip(" .")
+
+
+def _sha(*parts: str) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def pack_fingerprint(kind: str, model: str, version: str, pack: Any, float_digits: int = 6) -> str:
+    return _sha(kind, model, version, canonical_json(pack, float_digits))
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+# -----------------------------
+# Stores
+# -----------------------------
+class LLMCacheStore:
+    def get(self, cache_key: str, now: float, ttl_s: float) -> Optional[str]:
+        raise NotImplementedError
+
+    def candidates(self, pack_key: str, now: float, ttl_s: float, limit: int) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def touch(self, cache_key: str, now: float) -> None:
+        raise NotImplementedError
+
+    def put(self, row: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def evict(self, now: float, ttl_s: float, max_entries: int) -> int:
+        raise NotImplementedError
+
+
+class SQLiteStore(LLMCacheStore):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._con.execute(
+                """
+                create table if not exists llm_response_cache (
+                    cache_key text primary key,
+                    pack_key text not null,
+                    kind text not null,
+                    question_norm text,
+                    embedding text,
+                    response text not null,
+                    created_at real not null,
+                    last_used_at real not null,
+                    hits integer not null default 0
+                )
+                """
+            )
+            self._con.execute("create index if not exists llm_response_cache_pack on llm_response_cache (pack_key)")
+            self._con.commit()
+
+    def get(self, cache_key: str, now: float, ttl_s: float) -> Optional[str]:
+        with self._lock:
+            row = self._con.execute(
+                "select response from llm_response_cache where cache_key = ? and created_at >= ?",
+                (cache_key, now - ttl_s),
+            ).fetchone()
+        return row[0] if row else None
+
+    def candidates(self, pack_key: str, now: float, ttl_s: float, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._con.execute(
+                """
+                select cache_key, question_norm, embedding, response
+                from llm_response_cache
+                where pack_key = ? and created_at >= ? and embedding is not null
+                order by last_used_at desc
+                limit ?
+                """,
+                (pack_key, now - ttl_s, int(limit)),
+            ).fetchall()
+        return [dict(zip(["cache_key", "question_norm", "embedding", "response"], r)) for r in rows]
+
+    def touch(self, cache_key: str, now: float) -> None:
+        with self._lock:
+            self._con.execute(
+                "update llm_response_cache set last_used_at = ?, hits = hits + 1 where cache_key = ?",
+                (now, cache_key),
+            )
+            self._con.commit()
+
+    def put(self, row: Dict[str, Any]) -> None:
+        with self._lock:
+            self._con.execute(
+                f"insert or replace into llm_response_cache ({', '.join(COLUMNS)}) values ({', '.join(['?'] * len(COLUMNS))})",
+                tuple(row[c] for c in COLUMNS),
+            )
+            self._con.commit()
+
+    def evict(self, now: float, ttl_s: float, max_entries: int) -> int:
+        with self._lock:
+            expired = self._con.execute("delete from llm_response_cache where created_at < ?", (now - ttl_s,)).rowcount
+            lru = self._con.execute(
+                """
+                delete from llm_response_cache
+                where cache_key in (
+                    select cache_key from llm_response_cache
+                    order by last_used_at desc
+                    limit -1 offset ?
+                )
+                """,
+                (int(max_entries),),
+            ).rowcount
+            self._con.commit()
+        return int(expired or 0) + int(lru or 0)
+
+
+class TableStore(LLMCacheStore):
+    # Times are epoch seconds (double) so the same SQL runs on Snowflake and the local backend
+    def __init__(self, backend: QueryBackend, table: str = DEFAULT_TABLE):
+        self.backend = backend
+        self.table = table
+        self.backend.execute(
+            f"""
+            create table if not exists {table} (
+                cache_key varchar not null,
+                pack_key varchar not null,
+                kind varchar not null,
+                question_norm varchar,
+                embedding varchar,
+                response varchar not null,
+                created_at double not null,
+                last_used_at double not null,
+                hits integer not null
+            )
+            """
+        )
+
+    def get(self, cache_key: str, now: float, ttl_s: float) -> Optional[str]:
+        df = self.backend.query(
+            f"select response from {self.table} where cache_key = ? and created_at >= ? limit 1",
+            (cache_key, now - ttl_s),
+        )
+        return None if df is None or df.empty else str(df.iloc[0]["RESPONSE"])
+
+    def candidates(self, pack_key: str, now: float, ttl_s: float, limit: int) -> List[Dict[str, Any]]:
+        df = self.backend.query(
+            f"""
+            select cache_key, question_norm, embedding, response
+            from {self.table}
+            where pack_key = ? and created_at >= ? and embedding is not null
+            order by last_used_at desc
+            limit {int(limit)}
+            """,
+            (pack_key, now - ttl_s),
+        )
+        if df is None or df.empty:
+            return []
+        return [{k.lower(): v for k, v in r.items()} for r in df.to_dict(orient="records")]
+
+    def touch(self, cache_key: str, now: float) -> None:
+        self.backend.execute(
+            f"update {self.table} set last_used_at = ?, hits = hits + 1 where cache_key = ?",
+            (now, cache_key),
+        )
+
+    def put(self, row: Dict[str, Any]) -> None:
+        self.backend.execute(f"delete from {self.table} where cache_key = ?", (row["cache_key"],))
+        self.backend.execute(
+            f"insert into {self.table} ({', '.join(COLUMNS)}) select {', '.join(['?'] * len(COLUMNS))}",
+            tuple(row[c] for c in COLUMNS),
+        )
+
+    def evict(self, now: float, ttl_s: float, max_entries: int) -> int:
+        before = int(self.backend.query(f"select count(*) as n from {self.table}").iloc[0, 0])
+        self.backend.execute(f"delete from {self.table} where created_at < ?", (now - ttl_s,))
+        self.backend.execute(
+            f"""
+            delete from {self.table}
+            where cache_key in (
+                select cache_key
+                from {self.table}
+                qualify row_number() over (order by last_used_at desc) > ?
+            )
+            """,
+            (int(max_entries),),
+        )
+        after = int(self.backend.query(f"select count(*) as n from {self.table}").iloc[0, 0])
+        return max(0, before - after)
+
+
+# -----------------------------
+# Cache
+# -----------------------------
+@dataclass
+class LLMCacheStats:
+    hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    errors: int = 0
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return (self.hits + self.semantic_hits) / lookups if lookups else None
+
+
+@dataclass
+class CacheLookup:
+    kind: str
+    keys: Dict[str, str]
+    created_at: float
+    response: Optional[str] = None
+    embedding: Optional[List[float]] = None
+
+
+class LLMCache:
+    def __init__(
+        self,
+        store: Optional[LLMCacheStore],
+        ttl_s: float = 7 * 24 * 3600,
+        max_entries: int = 5000,
+        float_digits: int = 6,
+        embed_fn: Optional[Callable[[str], Optional[List[float]]]] = None,
+        similarity_threshold: float = 0.95,
+        evict_every: int = 50,
+    ):
+        self.store = store
+        self.ttl_s = float(ttl_s)
+        self.max_entries = int(max_entries)
+        self.float_digits = int(float_digits)
+        self.embed_fn = embed_fn
+        self.similarity_threshold = float(similarity_threshold)
+        self.evict_every = int(evict_every)
+        self.stats = LLMCacheStats()
+        self._lock = threading.Lock()
+
+    def _count(self, field_name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self.stats, field_name, getattr(self.stats, field_name) + n)
+
+    def keys(self, kind: str, model: str, version: str, pack: Any, question: str = "") -> Dict[str, str]:
+        pack_key = pack_fingerprint(kind, model, version, pack, self.float_digits)
+        question_norm = normalize_question(question)
+        return {"pack_key": pack_key, "question_norm": question_norm, "cache_key": _sha(pack_key, question_norm)}
+
+    def lookup(self, kind: str, model: str, version: str, pack: Any, question: str = "") -> CacheLookup:
+        # Exact fingerprint first, then (optionally) the nearest cached question for the same pack
+        look = CacheLookup(kind=kind, keys=self.keys(kind, model, version, pack, question), created_at=time.time())
+        if self.store is None:
+            return look
+        try:
+            cached = self.store.get(look.keys["cache_key"], look.created_at, self.ttl_s)
+            if cached is not None:
+                self.store.touch(look.keys["cache_key"], look.created_at)
+                self._count("hits")
+                look.response = cached
+                return look
+
+            look.embedding = self._embed(look.keys["question_norm"]) if look.keys["question_norm"] else None
+            if look.embedding is not None:
+                hit = self._nearest(look.keys["pack_key"], look.embedding, look.created_at)
+                if hit is not None:
+                    self.store.touch(hit["cache_key"], look.created_at)
+                    self._count("semantic_hits")
+                    look.response = str(hit["response"])
+                    return look
+        except Exception:
+            # A broken cache must never block the completion itself
+            self._count("errors")
+            look.embedding = None
+
+        self._count("misses")
+        return look
+
+    def store_response(self, look: CacheLookup, response: Optional[str]) -> None:
+        # Empty / failed completions are never cached
+        if self.store is None or not response:
+            return
+        try:
+            self.store.put({
+                **look.keys,
+                "kind": look.kind,
+                "embedding": json.dumps(look.embedding) if look.embedding is not None else None,
+                "response": response,
+                "created_at": look.created_at,
+                "last_used_at": look.created_at,
+                "hits": 0,
+            })
+            self._count("stores")
+            if self.evict_every > 0 and self.stats.stores % self.evict_every == 0:
+                self._count("evictions", self.store.evict(look.created_at, self.ttl_s, self.max_entries))
+        except Exception:
+            self._count("errors")
+
+    def get_or_complete(
+        self,
+        kind: str,
+        model: str,
+        version: str,
+        pack: Any,
+        question: str,
+        complete: Callable[[], Optional[str]],
+    ) -> str:
+        # complete() returns None for a failed / empty completion
+        look = self.lookup(kind, model, version, pack, question)
+        if look.response is not None:
+            return look.response
+        response = complete()
+        self.store_response(look, response)
+        return response or ""
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        if self.embed_fn is None:
+            return None
+        try:
+            return self.embed_fn(text)
+        except Exception:
+            self._count("errors")
+            return None
+
+    def _nearest(self, pack_key: str, embedding: List[float], now: float) -> Optional[Dict[str, Any]]:
+        best, best_sim = None, self.similarity_threshold
+        for row in self.store.candidates(pack_key, now, self.ttl_s, limit=200):
+            try:
+                other = json.loads(row["embedding"])
+            except (TypeError, ValueError):
+                continue
+            sim = _cosine(embedding, other)
+            if sim >= best_sim:
+                best, best_sim = row, sim
+        return best
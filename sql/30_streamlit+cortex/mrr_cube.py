@@ -0,0 +1,203 @@
+# mrr_cube.py
+# Purpose: Derive the MRR-based datasets from one filtered account × month frame ("cube").
+#   The app fetches FCT_MRR ⨝ ACCOUNTS (⟕ SALES_REPS) once per filter state; ARR trend,
+#   cohort NRR/GRR, movement summary, top movers, the fallback health score and the
+#   retention data-quality counts are all computed here with vectorized pandas/NumPy.
+#   Each function mirrors the SQL it replaced (same columns, rounding and edge cases).
+#   The cube is the full account × month grid when reading FCT_MRR_COMPLETE (rebuilt over
+#   DIM_DATE, dataset_sql.mrr_cube_sql); over plain FCT_MRR, months an account has no row
+#   for count as zero MRR in the health score and top movers.
+
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+CUBE_COLUMNS = ["ACCOUNT_ID", "MONTH", "TOTAL_MRR", "ACCOUNT_NAME", "SEGMENT", "REGION", "INDUSTRY"]
+ACCOUNT_ATTRS = ["ACCOUNT_NAME", "SEGMENT", "REGION", "INDUSTRY"]
+
+
+def prepare_cube(df: pd.DataFrame) -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame(columns=CUBE_COLUMNS + ["MONTH_IDX"])
+    # MONTH arrives as datetime64 (query_backend.compact_frame); assign() copies lazily
+    cube = df.assign(
+        TOTAL_MRR=pd.to_numeric(df["TOTAL_MRR"], errors="coerce").astype("float64"),
+        # Integer month index makes "month + 1" joins a plain integer shift
+        MONTH_IDX=df["MONTH"].dt.year * 12 + df["MONTH"].dt.month - 1,
+    )
+    return cube.sort_values(["ACCOUNT_ID", "MONTH"], kind="mergesort").reset_index(drop=True)
+
+
+def _month_idx(d: date) -> int:
+    d = pd.Timestamp(d)
+    return d.year * 12 + d.month - 1
+
+
+def _prev_mrr(cube: pd.DataFrame) -> pd.Series:
+    # lag(total_mrr) over (partition by account_id order by month); cube is pre-sorted
+    return cube.groupby("ACCOUNT_ID", sort=False)["TOTAL_MRR"].shift(1)
+
+
+def _next_mrr(cube: pd.DataFrame, rows: pd.DataFrame) -> pd.Series:
+    # total_mrr of the same account in month + 1 (exact calendar month), NaN if absent
+    nxt = cube[["ACCOUNT_ID", "MONTH_IDX", "TOTAL_MRR"]].rename(columns={"TOTAL_MRR": "_NEXT"})
+    nxt = nxt.assign(MONTH_IDX=nxt["MONTH_IDX"] - 1)
+    merged = rows[["ACCOUNT_ID", "MONTH_IDX"]].merge(nxt, on=["ACCOUNT_ID", "MONTH_IDX"], how="left")
+    return pd.Series(merged["_NEXT"].to_numpy(), index=rows.index)
+
+
+def arr_trend(cube: pd.DataFrame) -> pd.DataFrame:
+    if cube.empty:
+        return pd.DataFrame(columns=["MONTH", "TOTAL_ARR"])
+    out = cube.groupby("MONTH", as_index=False)["TOTAL_MRR"].sum()
+    out["TOTAL_ARR"] = (out["TOTAL_MRR"] * 12).round(2)
+    return out[["MONTH", "TOTAL_ARR"]]
+
+
+def retention_trend(cube: pd.DataFrame) -> pd.DataFrame:
+    cols = ["MONTH", "START_MRR", "END_MRR", "RETAINED_MRR", "NRR_PCT", "GRR_PCT"]
+    if cube.empty:
+        return pd.DataFrame(columns=cols)
+
+    cur = cube[(cube["MONTH"] < cube["MONTH"].max()) & (cube["TOTAL_MRR"] > 0)]
+    if cur.empty:
+        return pd.DataFrame(columns=cols)
+
+    nxt = _next_mrr(cube, cur).fillna(0.0)
+    frame = pd.DataFrame({
+        "MONTH": cur["MONTH"],
+        "START": cur["TOTAL_MRR"],
+        "END": nxt,
+        "RETAINED": np.minimum(nxt, cur["TOTAL_MRR"]),
+    })
+    g = frame.groupby("MONTH", as_index=False)[["START", "END", "RETAINED"]].sum()
+    start = g["START"].where(g["START"] != 0)
+    return pd.DataFrame({
+        "MONTH": g["MONTH"],
+        "START_MRR": g["START"].round(2),
+        "END_MRR": g["END"].round(2),
+        "RETAINED_MRR": g["RETAINED"].round(2),
+        "NRR_PCT": (100 * g["END"] / start).round(2),
+        "GRR_PCT": (100 * g["RETAINED"] / start).round(2),
+    })
+
+
+def classify_movement(total: pd.Series, prev: pd.Series) -> np.ndarray:
+    return np.select(
+        [
+            prev.isna() & (total > 0),
+            (prev > 0) & (total == 0),
+            total > prev,
+            total < prev,
+        ],
+        ["New", "Churn", "Expansion", "Contraction"],
+        default="Flat",
+    )
+
+
+def movement_summary(cube: pd.DataFrame) -> pd.DataFrame:
+    cols = ["MOVEMENT_TYPE", "ROWS_COUNT", "NET_MRR_CHANGE"]
+    if cube.empty:
+        return pd.DataFrame(columns=cols)
+    prev = _prev_mrr(cube)
+    frame = pd.DataFrame({
+        "MOVEMENT_TYPE": classify_movement(cube["TOTAL_MRR"], prev),
+        "CHANGE": cube["TOTAL_MRR"] - prev.fillna(0.0),
+    })
+    out = frame.groupby("MOVEMENT_TYPE", as_index=False).agg(ROWS_COUNT=("CHANGE", "size"), NET_MRR_CHANGE=("CHANGE", "sum"))
+    out["NET_MRR_CHANGE"] = out["NET_MRR_CHANGE"].round(2)
+    return out.sort_values("MOVEMENT_TYPE").reset_index(drop=True)[cols]
+
+
+def _account_attrs(cube: pd.DataFrame) -> pd.DataFrame:
+    keep = ["ACCOUNT_ID"] + [c for c in ACCOUNT_ATTRS if c in cube.columns]
+    return cube[keep].drop_duplicates("ACCOUNT_ID")
+
+
+def _mrr_at(cube: pd.DataFrame, idx: int, agg: str = "sum") -> pd.Series:
+    return cube[cube["MONTH_IDX"] == idx].groupby("ACCOUNT_ID")["TOTAL_MRR"].agg(agg)
+
+
+def top_movers(cube: pd.DataFrame, n: int = 10) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    if cube.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    max_idx = cube["MONTH_IDX"].max()
+    accounts = pd.Index(cube["ACCOUNT_ID"].unique(), name="ACCOUNT_ID")
+    curr = _mrr_at(cube, max_idx, "max").reindex(accounts)
+    prev = _mrr_at(cube, max_idx - 1, "max").reindex(accounts)
+
+    scored = pd.DataFrame({"MRR_CURR": curr, "MRR_PREV": prev}).fillna(0.0)
+    scored["MRR_DELTA"] = (scored["MRR_CURR"] - scored["MRR_PREV"]).round(2)
+    scored["MRR_CURR"] = scored["MRR_CURR"].round(2)
+    scored["MRR_PREV"] = scored["MRR_PREV"].round(2)
+    scored = scored.rename_axis("ACCOUNT_ID").reset_index()
+    df = scored.merge(_account_attrs(cube), on="ACCOUNT_ID", how="inner")
+    if df.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    expansions = df.sort_values("MRR_DELTA", ascending=False).head(n)
+    contractions = df.sort_values("MRR_DELTA", ascending=True).head(n)
+    return expansions, contractions
+
+
+def health_snapshot(cube: pd.DataFrame, ticket_counts: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    if cube.empty:
+        return pd.DataFrame()
+
+    # Every account in range is scored at the latest month, by calendar month (not row
+    # position), so accounts without a row there (sparse grid) count as zero MRR
+    max_idx = cube["MONTH_IDX"].max()
+    snap = _account_attrs(cube).reset_index(drop=True)
+    ids = snap["ACCOUNT_ID"]
+    months = [_mrr_at(cube, max_idx - k) for k in range(3)]
+    total = ids.map(months[0]).fillna(0.0)
+    prev_c = ids.map(months[1]).fillna(0.0)
+    window = min(3, int(max_idx - cube["MONTH_IDX"].min()) + 1)
+    avg3 = sum(ids.map(m).fillna(0.0) for m in months[:window]) / window
+
+    snap["TOTAL_MRR"] = total.round(2)
+    snap["PREV_MRR"] = prev_c.round(2)
+    snap["MOM_MRR_PCT"] = ((total - prev_c) / prev_c.where(prev_c != 0)).round(4)
+    snap["MRR_AVG_3M"] = avg3.round(2)
+
+    if ticket_counts is not None and not ticket_counts.empty:
+        tickets = snap[["ACCOUNT_ID"]].merge(ticket_counts[["ACCOUNT_ID", "TICKET_CNT_90D"]], on="ACCOUNT_ID", how="left")
+        snap["TICKET_CNT_90D"] = tickets["TICKET_CNT_90D"].fillna(0).astype("int64").to_numpy()
+    else:
+        snap["TICKET_CNT_90D"] = 0
+
+    t = snap["TOTAL_MRR"]
+    p = snap["PREV_MRR"]
+    k = snap["TICKET_CNT_90D"]
+    score = (
+        70
+        + np.select([t > p, t < p], [15, -15], default=0)
+        + np.where((p > 0) & (t == 0), -50, 0)
+        + np.select([k >= 8, k >= 4], [-20, -10], default=0)
+    )
+    snap["HEALTH_SCORE"] = np.clip(score, 0, 100)
+    snap["HEALTH_STATUS"] = np.select(
+        [(p > 0) & (t == 0), (t == 0) & (p == 0), k >= 8, t < p, t > p],
+        ["Lost", "Stable", "High Risk", "At Risk", "Growing"],
+        default="Stable",
+    )
+    return snap.reset_index(drop=True)
+
+
+def retention_cohort_counts(cube: pd.DataFrame, cohort_month: date) -> Dict[str, Optional[float]]:
+    idx = _month_idx(cohort_month)
+    cohort = cube.loc[(cube["MONTH_IDX"] == idx) & (cube["TOTAL_MRR"] > 0), "ACCOUNT_ID"].nunique()
+    nxt = cube.loc[cube["MONTH_IDX"] == idx + 1, "ACCOUNT_ID"].nunique()
+    cov = round(100 * nxt / cohort, 2) if cohort else None
+    return {"cohort_accounts": int(cohort), "next_month_accounts": int(nxt), "next_month_coverage_pct": cov}
+
+
+def account_month(cube: pd.DataFrame) -> pd.DataFrame:
+    if cube.empty:
+        return pd.DataFrame(columns=["ACCOUNT_ID", "MONTH", "TOTAL_MRR"])
+    out = cube[["ACCOUNT_ID", "MONTH", "TOTAL_MRR"]].assign(TOTAL_MRR=cube["TOTAL_MRR"].round(2))
+    return out.reset_index(drop=True)
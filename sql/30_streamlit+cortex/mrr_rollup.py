@@ -0,0 +1,119 @@
+# mrr_rollup.py
+# Purpose: Answer ARR trend, cohort NRR/GRR and the movement summary from the
+#   MARTS.METRICS_MRR_BY_DIM_MONTH rollup (116_metrics_mrr_by_dim_month.sql).
+#   The app sums the rollup per month for the current slice; these functions turn that
+#   small monthly frame into the same outputs as the account-level path in mrr_cube.py
+#   (retention data-quality counts included).
+
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from query_builder import AccountFilter
+
+
+# Sidebar dimension -> rollup column
+ROLLUP_COLUMNS: Dict[str, str] = {
+    "SEGMENT": "segment",
+    "REGION": "region",
+    "INDUSTRY": "industry",
+    "REP_TEAM": "rep_team",
+    "REP_REGION": "rep_region",
+}
+
+MEASURES = [
+    "account_rows", "total_mrr", "active_accounts", "active_mrr", "next_month_mrr", "retained_mrr",
+    "new_rows", "new_mrr_change", "expansion_rows", "expansion_mrr_change",
+    "contraction_rows", "contraction_mrr_change", "churn_rows", "churn_mrr_change",
+    "flat_rows", "flat_mrr_change",
+]
+
+MOVEMENT_TYPES = ["Churn", "Contraction", "Expansion", "Flat", "New"]
+
+
+def supports(account_filter: AccountFilter) -> bool:
+    return all(dim in ROLLUP_COLUMNS for dim, values in account_filter.dimensions().items() if values)
+
+
+def monthly_sql(rollup_tbl: str, account_filter: AccountFilter) -> Tuple[str, list]:
+    filter_sql, filter_params = account_filter.to_sql_columns(ROLLUP_COLUMNS)
+    sums = ",\n        ".join(f"sum({m}) as {m}" for m in MEASURES)
+    sql = f"""
+    select
+        month,
+        {sums}
+    from {rollup_tbl}
+    where month >= ?
+      and month <= ?
+      and {filter_sql}
+    group by month
+    order by month;
+    """
+    return sql, filter_params
+
+
+def prepare_monthly(df: pd.DataFrame) -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["MONTH"] + [m.upper() for m in MEASURES])
+    out = df.assign(**{m.upper(): pd.to_numeric(df[m.upper()], errors="coerce").astype("float64") for m in MEASURES})
+    return out.sort_values("MONTH").reset_index(drop=True)
+
+
+def arr_trend(monthly: pd.DataFrame) -> pd.DataFrame:
+    if monthly.empty:
+        return pd.DataFrame(columns=["MONTH", "TOTAL_ARR"])
+    return pd.DataFrame({"MONTH": monthly["MONTH"], "TOTAL_ARR": (monthly["TOTAL_MRR"] * 12).round(2)})
+
+
+def retention_trend(monthly: pd.DataFrame) -> pd.DataFrame:
+    cols = ["MONTH", "START_MRR", "END_MRR", "RETAINED_MRR", "NRR_PCT", "GRR_PCT"]
+    if monthly.empty:
+        return pd.DataFrame(columns=cols)
+    cur = monthly[(monthly["MONTH"] < monthly["MONTH"].max()) & (monthly["ACTIVE_ACCOUNTS"] > 0)]
+    start = cur["ACTIVE_MRR"].where(cur["ACTIVE_MRR"] != 0)
+    return pd.DataFrame({
+        "MONTH": cur["MONTH"],
+        "START_MRR": cur["ACTIVE_MRR"].round(2),
+        "END_MRR": cur["NEXT_MONTH_MRR"].round(2),
+        "RETAINED_MRR": cur["RETAINED_MRR"].round(2),
+        "NRR_PCT": (100 * cur["NEXT_MONTH_MRR"] / start).round(2),
+        "GRR_PCT": (100 * cur["RETAINED_MRR"] / start).round(2),
+    }).reset_index(drop=True)
+
+
+def movement_summary(monthly: pd.DataFrame) -> pd.DataFrame:
+    cols = ["MOVEMENT_TYPE", "ROWS_COUNT", "NET_MRR_CHANGE"]
+    if monthly.empty:
+        return pd.DataFrame(columns=cols)
+
+    # The rollup's lag runs over full history; the account-level path lags within the
+    # selected range, so every account's first in-range month has no previous month.
+    # Re-classify that first month: MRR > 0 -> New, otherwise Flat.
+    first = monthly["MONTH"] == monthly["MONTH"].min()
+    later = monthly[~first]
+    head = monthly[first]
+
+    rows = {t: float(later[f"{t.upper()}_ROWS"].sum()) for t in MOVEMENT_TYPES}
+    change = {t: float(later[f"{t.upper()}_MRR_CHANGE"].sum()) for t in MOVEMENT_TYPES}
+    rows["New"] += float(head["ACTIVE_ACCOUNTS"].sum())
+    change["New"] += float(head["ACTIVE_MRR"].sum())
+    rows["Flat"] += float((head["ACCOUNT_ROWS"] - head["ACTIVE_ACCOUNTS"]).sum())
+    change["Flat"] += float((head["TOTAL_MRR"] - head["ACTIVE_MRR"]).sum())
+
+    out = pd.DataFrame({
+        "MOVEMENT_TYPE": MOVEMENT_TYPES,
+        "ROWS_COUNT": [int(rows[t]) for t in MOVEMENT_TYPES],
+        "NET_MRR_CHANGE": [round(change[t], 2) for t in MOVEMENT_TYPES],
+    })
+    return out[out["ROWS_COUNT"] > 0].reset_index(drop=True)[cols]
+
+
+def retention_cohort_counts(monthly: pd.DataFrame, cohort_month: date) -> Dict[str, Optional[float]]:
+    # mrr_cube.retention_cohort_counts from the rollup: accounts with MRR > 0 in the cohort
+    # month, and accounts with a row (any MRR) the month after
+    ts = pd.Timestamp(cohort_month)
+    cohort = monthly.loc[monthly["MONTH"] == ts, "ACTIVE_ACCOUNTS"].sum() if not monthly.empty else 0
+    nxt = monthly.loc[monthly["MONTH"] == ts + pd.DateOffset(months=1), "ACCOUNT_ROWS"].sum() if not monthly.empty else 0
+    cov = round(100 * nxt / cohort, 2) if cohort else None
+    return {"cohort_accounts": int(cohort), "next_month_accounts": int(nxt), "next_month_coverage_pct": cov}
@@ -0,0 +1,170 @@
+# narrative_jobs.py
+# Purpose: Background generation of streamed completions (the executive narrative), started
+#   speculatively as soon as a filter state's KPI context is known.
+#   - jobs are keyed (ctx fingerprint) and shared by every session in the process: the click,
+#     or another user with the same filters, follows the running job or reads its result
+#   - a follower sees chunks as they arrive (Job.follow), so the click still streams
+#   - each session owns its latest key; moving to a new filter state cancels the old job
+#     unless another session still wants it
+#   - finished jobs are kept for ttl_s, at most max_results of them (oldest dropped first);
+#     a failed job blocks resubmission of its key for retry_after_s
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+
+class Job:
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks: List[str] = []
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.cancelled = threading.Event()
+        self.owners: Set[str] = set()
+        self.created_at = time.monotonic()
+        self.future: Optional[Future] = None
+        self._cond = threading.Condition()
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.cancelled.is_set()
+
+    def text(self) -> str:
+        with self._cond:
+            return "".join(self.chunks)
+
+    def _append(self, chunk: str) -> None:
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def _finish(self, error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            self.error = error
+            self.done = True
+            self._cond.notify_all()
+
+    def follow(self, timeout_s: float = 120.0) -> Iterator[str]:
+        # Replays the chunks so far, then yields new ones until the job finishes
+        i = 0
+        deadline = time.monotonic() + timeout_s
+        while True:
+            with self._cond:
+                while i == len(self.chunks) and not self.done:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"background job {self.key[:12]} did not finish in {timeout_s:.0f}s")
+                    self._cond.wait(timeout=min(remaining, 0.5))
+                new = self.chunks[i:]
+                i = len(self.chunks)
+                finished = self.done
+            yield from new
+            if finished:
+                if self.error is not None:
+                    raise self.error
+                if self.cancelled.is_set():
+                    raise RuntimeError("background job was cancelled")
+                return
+
+
+class StreamJobQueue:
+    def __init__(self, max_workers: int = 2, max_results: int = 64, ttl_s: float = 900.0, retry_after_s: float = 60.0):
+        self.max_results = int(max_results)
+        self.ttl_s = float(ttl_s)
+        self.retry_after_s = float(retry_after_s)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gtm-narrative")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._owner_key: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.cancelled = 0
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        for key, job in list(self._jobs.items()):
+            age = now - job.created_at
+            if job.cancelled.is_set() or (job.done and age > (self.ttl_s if job.error is None else self.retry_after_s)):
+                del self._jobs[key]
+        while len(self._jobs) > self.max_results:
+            oldest = next((k for k, j in self._jobs.items() if j.done), None)
+            if oldest is None:
+                break
+            del self._jobs[oldest]
+
+    def get(self, key: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or not job.ok or (job.done and time.monotonic() - job.created_at > self.ttl_s):
+                return None
+            return job
+
+    def submit(
+        self,
+        key: str,
+        owner: str,
+        make_stream: Callable[[], Iterator[str]],
+        thread_init: Optional[Callable[[], None]] = None,
+    ) -> Job:
+        with self._lock:
+            self._purge()
+            self._release(owner, keep=key)
+            job = self._jobs.get(key)
+            if job is None or job.cancelled.is_set():
+                job = Job(key)
+                self._jobs[key] = job
+                job.future = self._pool.submit(self._run, job, make_stream, thread_init)
+                self.submitted += 1
+            job.owners.add(owner)
+            self._owner_key[owner] = key
+            return job
+
+    def _release(self, owner: str, keep: str) -> None:
+        # The owner moved to another key: cancel its old job if nobody else is waiting on it
+        prev_key = self._owner_key.get(owner)
+        if prev_key is None or prev_key == keep:
+            return
+        prev = self._jobs.get(prev_key)
+        if prev is None:
+            return
+        prev.owners.discard(owner)
+        if not prev.owners and not prev.done:
+            prev.cancelled.set()
+            if prev.future is not None:
+                prev.future.cancel()
+            del self._jobs[prev_key]
+            self.cancelled += 1
+
+    def _run(self, job: Job, make_stream: Callable[[], Iterator[str]], thread_init: Optional[Callable[[], None]]) -> None:
+        if job.cancelled.is_set():
+            job._finish()
+            return
+        if thread_init is not None:
+            thread_init()
+        stream = None
+        try:
+            stream = make_stream()
+            for chunk in stream:
+                if job.cancelled.is_set():
+                    break
+                job._append(chunk)
+            job._finish()
+        except BaseException as e:
+            job._finish(e)
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                # A closed generator never reaches its cache write, so cancelled output isn't stored
+                close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            running = sum(1 for j in self._jobs.values() if not j.done)
+            return {
+                "jobs": len(self._jobs),
+                "running": running,
+                "submitted": self.submitted,
+                "cancelled": self.cancelled,
+            }
@@ -0,0 +1,168 @@
+# qa_pack.py
+# Purpose: Compact encoder for the Q&A / agent evidence pack.
+#   The pack is pasted verbatim into every AI_COMPLETE prompt, so its size is input tokens.
+#   - series / tables are columnar: {"columns": [...], "rows": [[...], ...]} (headers once)
+#   - numbers are rounded, month columns are ISO months ("2024-06")
+#   - frames are read directly (no to_json -> json.loads -> json.dumps round trip)
+#   - fit_to_budget() trims the least important sections first (downsample, then drop)
+#     until the estimated token count fits, and records what it trimmed in the pack
+
+import json
+import math
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+
+# Rough chars-per-token for English + JSON punctuation (no tokenizer in the warehouse runtime)
+CHARS_PER_TOKEN = 4.0
+
+# Trim plan, least important first: (path, action, arg)
+#   "tail": keep the last `arg` rows of a columnar table; "head": keep the first `arg` rows
+#   "drop": remove the section
+TRIM_PLAN: List[Tuple[str, str, int]] = [
+    ("pipeline.open_by_stage_top_8", "head", 4),
+    ("mrr_movement.top_expansions", "head", 3),
+    ("mrr_movement.top_contractions", "head", 3),
+    ("series.closed_rev_last_12", "tail", 6),
+    ("series.arr_trend_last_12", "tail", 6),
+    ("series.retention_last_12", "tail", 6),
+    ("pipeline.open_by_stage_top_8", "drop", 0),
+    ("mrr_movement.top_expansions", "drop", 0),
+    ("mrr_movement.top_contractions", "drop", 0),
+    ("series.closed_rev_last_12", "tail", 3),
+    ("series.arr_trend_last_12", "tail", 3),
+    ("series.retention_last_12", "tail", 3),
+    ("pipeline.coverage_row", "drop", 0),
+    ("series.closed_rev_last_12", "drop", 0),
+]
+
+
+@dataclass
+class PackStats:
+    bytes: int
+    est_tokens: int
+    budget_tokens: Optional[int] = None
+    trimmed: List[str] = field(default_factory=list)
+
+
+def estimate_tokens(text: str) -> int:
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def _scalar(v: Any, digits: int, month: bool) -> Any:
+    if v is None:
+        return None
+    if isinstance(v, (pd.Timestamp, datetime, date)):
+        if pd.isna(v):
+            return None
+        return v.strftime("%Y-%m") if month else v.strftime("%Y-%m-%d")
+    if isinstance(v, bool):
+        return v
+    try:
+        if pd.isna(v):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(v, "item"):
+        v = v.item()
+    if isinstance(v, float):
+        r = round(v, digits)
+        return int(r) if r.is_integer() else r
+    return v
+
+
+def columnar(
+    df: Optional[pd.DataFrame],
+    cols: Optional[Sequence[str]] = None,
+    sort_col: Optional[str] = None,
+    ascending: bool = True,
+    head: Optional[int] = None,
+    tail: Optional[int] = None,
+    digits: int = 2,
+    month_cols: Sequence[str] = ("MONTH", "CLOSE_MONTH"),
+) -> Dict[str, Any]:
+    if df is None or df.empty:
+        return {"columns": [], "rows": []}
+    d = df
+    if sort_col and sort_col in d.columns:
+        d = d.sort_values(sort_col, ascending=ascending)
+    if cols:
+        keep = [c for c in cols if c in d.columns]
+        if keep:
+            d = d[keep]
+    if head is not None:
+        d = d.head(head)
+    if tail is not None:
+        d = d.tail(tail)
+    months = [c in month_cols for c in d.columns]
+    rows = [
+        [_scalar(v, digits, m) for v, m in zip(row, months)]
+        for row in d.itertuples(index=False, name=None)
+    ]
+    return {"columns": [str(c) for c in d.columns], "rows": rows}
+
+
+def round_values(value: Any, digits: int = 2) -> Any:
+    if isinstance(value, dict):
+        return {k: round_values(v, digits) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [round_values(v, digits) for v in value]
+    return _scalar(value, digits, month=False)
+
+
+def encode(pack: Dict[str, Any]) -> str:
+    return json.dumps(pack, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _get(pack: Dict[str, Any], path: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    *parents, leaf = path.split(".")
+    node: Any = pack
+    for p in parents:
+        node = node.get(p) if isinstance(node, dict) else None
+    return (node if isinstance(node, dict) and leaf in node else None), leaf
+
+
+def _apply(pack: Dict[str, Any], path: str, action: str, arg: int) -> bool:
+    parent, leaf = _get(pack, path)
+    if parent is None:
+        return False
+    table = parent[leaf]
+    if action == "drop":
+        del parent[leaf]
+        return True
+    if isinstance(table, dict) and len(table.get("rows", [])) > arg:
+        table["rows"] = table["rows"][:arg] if action == "head" else table["rows"][-arg:]
+        return True
+    return False
+
+
+def fit_to_budget(
+    pack: Dict[str, Any],
+    budget_tokens: Optional[int],
+    plan: Sequence[Tuple[str, str, int]] = TRIM_PLAN,
+) -> Tuple[str, PackStats]:
+    # Mutates `pack`; metrics, data_quality, benchmarks and rules are never trimmed
+    trimmed: List[str] = []
+    text = encode(pack)
+    if budget_tokens:
+        for path, action, arg in plan:
+            if estimate_tokens(text) <= budget_tokens:
+                break
+            if _apply(pack, path, action, arg):
+                kept = "dropped" if action == "drop" else f"kept {'first' if action == 'head' else 'last'} {arg} rows"
+                trimmed.append(f"{path}: {kept}")
+                pack["pack_notes"] = {"trimmed_for_token_budget": trimmed}
+                text = encode(pack)
+    return text, PackStats(len(text.encode("utf-8")), estimate_tokens(text), budget_tokens, trimmed)
+
+
+def pack_stats(pack_json: str) -> PackStats:
+    trimmed: List[str] = []
+    try:
+        trimmed = list(json.loads(pack_json).get("pack_notes", {}).get("trimmed_for_token_budget", []))
+    except (ValueError, AttributeError):
+        pass
+    return PackStats(len(pack_json.encode("utf-8")), estimate_tokens(pack_json), None, trimmed)
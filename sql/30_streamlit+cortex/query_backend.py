@@ -0,0 +1,393 @@
+# query_backend.py
+# Purpose: Pluggable query backends for the Streamlit app.
+#   - SnowflakeBackend: the live Snowpark session (default, Streamlit in Snowflake)
+#   - LocalBackend:     embedded DuckDB loaded from Parquet/CSV, with the Snowflake
+#                       dialect we use translated on the fly (offline dev + benchmarks)
+#
+# Select with env vars:
+#   GTM_QUERY_BACKEND=snowflake | local
+#   GTM_LOCAL_DATA_DIR=<dir>        expects <dir>/RAW/ACCOUNTS.parquet, <dir>/MARTS/FCT_MRR.csv, ...
+#   GTM_LOCAL_BUILD_MARTS=1         run sql/10_marts against the loaded RAW tables
+#
+# Result frames are decoded once here (compact_frame): dates -> datetime64, decimals ->
+# float64, low-cardinality dimensions -> category, small integers -> int32. Callers never
+# re-parse dates or copy frames to convert them. GTM_COMPACT_FRAMES=0 skips only the
+# category / int32 narrowing; dates and decimals are always decoded (callers rely on it).
+
+import os
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+DB = "GTM_COPILOT"
+SCHEMAS = ["RAW", "MARTS", "SEMANTIC", "CORTEX", "AGENTS", "UTIL"]
+METADATA_COLUMNS = ["TABLE_SCHEMA", "TABLE_NAME", "ROW_COUNT", "LAST_ALTERED"]
+# Dimension columns returned as pandas categoricals (a handful of distinct values each)
+CATEGORY_COLUMNS = frozenset({
+    "SEGMENT", "REGION", "INDUSTRY", "TEAM", "REP_TEAM", "REP_REGION",
+    "STAGE", "CURRENT_STAGE", "FROM_STAGE", "TO_STAGE", "MOVEMENT_TYPE",
+    "STATUS", "PRIORITY", "CATEGORY", "HEALTH_STATUS",
+})
+COMPACT_FRAMES = os.environ.get("GTM_COMPACT_FRAMES", "1").strip() not in ("0", "false", "no")
+SQL_ROOT = Path(__file__).resolve().parents[1]
+MARTS_SQL_DIR = SQL_ROOT / "10_marts"
+
+
+def _upper_columns(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    if df is None:
+        return pd.DataFrame()
+    df.columns = [str(c).upper() for c in df.columns]
+    return compact_frame(df, narrow=COMPACT_FRAMES)
+
+
+def compact_frame(df: pd.DataFrame, narrow: bool = True) -> pd.DataFrame:
+    # In place; the frame is fresh from the driver. narrow=False decodes dates / decimals only
+    for col in df.columns:
+        s = df[col]
+        if s.dtype == object:
+            sample = s.dropna()
+            if sample.empty:
+                continue
+            v = sample.iloc[0]
+            if isinstance(v, (date, datetime)):
+                df[col] = pd.to_datetime(s)
+            elif isinstance(v, Decimal):
+                df[col] = s.astype("float64")
+            elif narrow and col in CATEGORY_COLUMNS and isinstance(v, str):
+                df[col] = s.astype("category")
+        elif not narrow:
+            continue
+        elif col in CATEGORY_COLUMNS and pd.api.types.is_string_dtype(s):
+            df[col] = s.astype("category")
+        elif s.dtype == np.int64 and len(s) and np.iinfo(np.int32).min <= s.min() and s.max() <= np.iinfo(np.int32).max:
+            df[col] = s.astype(np.int32)
+    return df
+
+
+class QueryBackend:
+    name = "base"
+
+    def query(self, sql: str, params: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def execute(self, sql: str, params: Optional[Sequence[Any]] = None) -> None:
+        self.query(sql, params)
+
+    def table_metadata(self, schemas: Sequence[str]) -> pd.DataFrame:
+        # One row per base table: TABLE_SCHEMA, TABLE_NAME, ROW_COUNT, LAST_ALTERED
+        return self.query(
+            f"""
+            select table_schema, table_name, row_count, last_altered
+            from {DB}.INFORMATION_SCHEMA.TABLES
+            where table_schema in ({", ".join(["?"] * len(schemas))})
+              and table_type = 'BASE TABLE'
+            """,
+            list(schemas),
+        )
+
+    def run_script(self, path: Path) -> List[str]:
+        statements = split_sql_statements(Path(path).read_text())
+        for stmt in statements:
+            self.execute(stmt)
+        return statements
+
+
+# -----------------------------
+# Snowflake (Snowpark session)
+# -----------------------------
+class SnowflakeBackend(QueryBackend):
+    name = "snowflake"
+
+    def __init__(self, session: Any = None):
+        self._session = session
+
+    @property
+    def session(self) -> Any:
+        if self._session is None:
+            from snowflake.snowpark.context import get_active_session
+            self._session = get_active_session()
+        return self._session
+
+    def query(self, sql: str, params: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        # `?` placeholders are bound server-side, so the SQL text stays stable across filter values
+        df = self.session.sql(sql, params=list(params)) if params else self.session.sql(sql)
+        return _upper_columns(df.to_pandas())
+
+    def execute(self, sql: str, params: Optional[Sequence[Any]] = None) -> None:
+        stmt = self.session.sql(sql, params=list(params)) if params else self.session.sql(sql)
+        stmt.collect()
+
+
+# -----------------------------
+# Local embedded engine (DuckDB)
+# -----------------------------
+class LocalBackend(QueryBackend):
+    name = "local"
+
+    def __init__(self, data_dir: Optional[str] = None, build_marts: bool = False):
+        import duckdb
+
+        self.con = duckdb.connect()
+        self.con.execute(f"attach ':memory:' as {DB}")
+        for schema in SCHEMAS:
+            self.con.execute(f"create schema if not exists {DB}.{schema}")
+
+        self.loaded: Dict[str, int] = {}
+        # DuckDB keeps no LAST_ALTERED: tables are stamped when loaded or written through
+        # query() / execute(); marts built from files carry the newest source file's mtime
+        self._altered: Dict[str, datetime] = {}
+        self._building = False
+        if data_dir:
+            self.load_dir(data_dir)
+        if build_marts:
+            self.build_marts()
+
+    def load_dir(self, data_dir: str) -> Dict[str, int]:
+        root = Path(data_dir)
+        for schema in SCHEMAS:
+            folder = root / schema
+            if not folder.is_dir():
+                continue
+            for f in sorted(folder.iterdir()):
+                if f.suffix.lower() not in (".parquet", ".csv"):
+                    continue
+                self.load_file(f"{DB}.{schema}.{f.stem.upper()}", f)
+        return self.loaded
+
+    def load_file(self, fqn: str, path: Path) -> int:
+        path = Path(path)
+        reader = "read_parquet" if path.suffix.lower() == ".parquet" else "read_csv_auto"
+        self.con.execute(f"create or replace table {fqn} as select * from {reader}(?)", [str(path)])
+        n = self.con.execute(f"select count(*) from {fqn}").fetchone()[0]
+        self.loaded[fqn] = int(n)
+        self._altered[fqn.upper()] = datetime.fromtimestamp(path.stat().st_mtime)
+        return int(n)
+
+    def load_frame(self, fqn: str, df: pd.DataFrame) -> int:
+        cur = self.con.cursor()
+        cur.register("_frame", df)
+        cur.execute(f"create or replace table {fqn} as select * from _frame")
+        cur.unregister("_frame")
+        self.loaded[fqn] = len(df)
+        self._altered[fqn.upper()] = datetime.now()
+        return len(df)
+
+    def build_marts(self, sql_dir: Path = MARTS_SQL_DIR) -> List[str]:
+        built: List[str] = []
+        self._building = True
+        try:
+            for f in sorted(Path(sql_dir).glob("*.sql")):
+                self.run_script(f)
+                built.append(f.name)
+        finally:
+            self._building = False
+        return built
+
+    def _stamp(self, sql: str) -> None:
+        m = _WRITE_TARGET.match(sql)
+        if not m or m.group(1).count(".") != 2:
+            return
+        if self._building and self._altered:
+            # Same stamp in every process that builds from the same files (stable cache keys)
+            self._altered[m.group(1).upper()] = max(self._altered.values())
+        else:
+            self._altered[m.group(1).upper()] = datetime.now()
+
+    def table_metadata(self, schemas: Sequence[str]) -> pd.DataFrame:
+        df = self.query(
+            f"""
+            select schema_name as table_schema, table_name, estimated_size as row_count
+            from duckdb_tables()
+            where database_name = '{DB}'
+              and schema_name in ({", ".join(["?"] * len(schemas))})
+            """,
+            list(schemas),
+        )
+        df["LAST_ALTERED"] = [
+            self._altered.get(f"{DB}.{s}.{t}".upper()) for s, t in zip(df["TABLE_SCHEMA"], df["TABLE_NAME"])
+        ]
+        return df[METADATA_COLUMNS]
+
+    def query(self, sql: str, params: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        # One cursor per call so concurrent callers don't share a connection
+        cur = self.con.cursor()
+        try:
+            df = _upper_columns(cur.execute(translate_snowflake_sql(sql), list(params or [])).df())
+        finally:
+            cur.close()
+        self._stamp(sql)
+        return df
+
+    def execute(self, sql: str, params: Optional[Sequence[Any]] = None) -> None:
+        cur = self.con.cursor()
+        try:
+            cur.execute(translate_snowflake_sql(sql), list(params or []))
+        finally:
+            cur.close()
+        self._stamp(sql)
+
+
+def backend_from_env() -> QueryBackend:
+    kind = os.environ.get("GTM_QUERY_BACKEND", "snowflake").strip().lower()
+    if kind == "local":
+        return LocalBackend(
+            data_dir=os.environ.get("GTM_LOCAL_DATA_DIR") or None,
+            build_marts=os.environ.get("GTM_LOCAL_BUILD_MARTS", "").strip() in ("1", "true", "yes"),
+        )
+    if kind == "snowflake":
+        return SnowflakeBackend()
+    raise ValueError(f"Unknown GTM_QUERY_BACKEND: {kind!r} (expected 'snowflake' or 'local')")
+
+
+# -----------------------------
+# Snowflake -> DuckDB dialect translation
+# -----------------------------
+_WRITE_TARGET = re.compile(
+    r"\s*(?:create\s+(?:or\s+replace\s+)?table\s+(?:if\s+not\s+exists\s+)?|insert\s+(?:overwrite\s+)?into\s+"
+    r"|merge\s+into\s+|delete\s+from\s+|update\s+|truncate\s+(?:table\s+)?)([A-Za-z0-9_.]+)",
+    re.IGNORECASE,
+)
+_IDENT_CALL = re.compile(r"[A-Za-z_][A-Za-z0-9_]*\s*\(")
+_REWRITTEN_CALLS = {"dateadd", "datediff", "date_trunc", "to_date", "least", "greatest"}
+
+
+def _skip_literal(sql: str, i: int) -> int:
+    # Returns the index just past a string literal / comment starting at i, or i if none starts there
+    if sql.startswith("$$", i):
+        end = sql.find("$$", i + 2)
+        return len(sql) if end < 0 else end + 2
+    if sql[i] == "'":
+        j = i + 1
+        while j < len(sql):
+            if sql[j] == "'":
+                if j + 1 < len(sql) and sql[j + 1] == "'":
+                    j += 2
+                    continue
+                return j + 1
+            j += 1
+        return len(sql)
+    if sql.startswith("--", i):
+        end = sql.find("\n", i)
+        return len(sql) if end < 0 else end
+    return i
+
+
+def _split_args(body: str) -> List[str]:
+    args: List[str] = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(body):
+        j = _skip_literal(body, i)
+        if j != i:
+            i = j
+            continue
+        ch = body[i]
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append(body[start:i].strip())
+            start = i + 1
+        i += 1
+    args.append(body[start:].strip())
+    return args
+
+
+def _find_close(sql: str, open_idx: int) -> int:
+    depth = 0
+    i = open_idx
+    while i < len(sql):
+        j = _skip_literal(sql, i)
+        if j != i:
+            i = j
+            continue
+        if sql[i] == "(":
+            depth += 1
+        elif sql[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise ValueError("Unbalanced parentheses in SQL")
+
+
+def _date_part(part: str) -> str:
+    return part.strip().strip("'\"").lower()
+
+
+def _rewrite_call(name: str, args: List[str]) -> Optional[str]:
+    n = name.lower()
+    if n == "dateadd" and len(args) == 3:
+        return f"cast(({args[2]}) + ({args[1]}) * interval 1 {_date_part(args[0])} as date)"
+    if n == "datediff" and len(args) == 3:
+        return f"datediff('{_date_part(args[0])}', {args[1]}, {args[2]})"
+    if n == "date_trunc" and len(args) == 2:
+        return f"cast(date_trunc('{_date_part(args[0])}', {args[1]}) as date)"
+    if n == "to_date" and len(args) == 1:
+        return f"cast({args[0]} as date)"
+    if n in ("least", "greatest") and len(args) >= 2:
+        # Snowflake returns NULL if any argument is NULL; DuckDB skips NULLs
+        null_check = " or ".join(f"({a}) is null" for a in args)
+        return f"(case when {null_check} then null else {n}({', '.join(args)}) end)"
+    return None
+
+
+def translate_snowflake_sql(sql: str) -> str:
+    out: List[str] = []
+    i = 0
+    while i < len(sql):
+        j = _skip_literal(sql, i)
+        if j != i:
+            out.append(sql[i:j])
+            i = j
+            continue
+
+        m = _IDENT_CALL.match(sql, i)
+        if m and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] in "_.")):
+            name = m.group(0)[:-1].strip()
+            if name.lower() not in _REWRITTEN_CALLS:
+                out.append(m.group(0))
+                i = m.end()
+                continue
+            open_idx = m.end() - 1
+            close_idx = _find_close(sql, open_idx)
+            args = [translate_snowflake_sql(a) for a in _split_args(sql[open_idx + 1:close_idx])]
+            rewritten = _rewrite_call(name, args)
+            out.append(rewritten if rewritten is not None else f"{name}({', '.join(args)})")
+            i = close_idx + 1
+            continue
+
+        out.append(sql[i])
+        i += 1
+    return "".join(out)
+
+
+def split_sql_statements(script: str) -> List[str]:
+    statements: List[str] = []
+    start = 0
+    i = 0
+    while i < len(script):
+        j = _skip_literal(script, i)
+        if j != i:
+            i = j
+            continue
+        if script[i] == ";":
+            statements.append(script[start:i])
+            start = i + 1
+        i += 1
+    statements.append(script[start:])
+
+    cleaned: List[str] = []
+    for stmt in statements:
+        body = "\n".join(line for line in stmt.splitlines() if not line.strip().startswith("--")).strip()
+        if body:
+            cleaned.append(body)
+    return cleaned
@@ -0,0 +1,119 @@
+# query_builder.py
+# Purpose: Canonical account filter + bind-parameter SQL fragments.
+#   Sidebar selections become a frozen, sorted AccountFilter. It is the st.cache_data key
+#   (same logical filter -> same key, regardless of click order) and renders to a SQL
+#   template with `?` placeholders, so filter values never get spliced into the SQL text.
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def _canon(values: Optional[Iterable[Any]]) -> Tuple[str, ...]:
+    if not values:
+        return ()
+    return tuple(sorted({str(v) for v in values if v is not None}))
+
+
+def placeholders(n: int) -> str:
+    return ", ".join(["?"] * n)
+
+
+LIKE_ESCAPE = "!"  # same meaning in Snowflake and DuckDB string literals (unlike backslash)
+
+
+def like_escape(term: str) -> str:
+    return term.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace("%", LIKE_ESCAPE + "%").replace("_", LIKE_ESCAPE + "_")
+
+
+def normalize_search_term(term: Optional[str]) -> str:
+    # ILIKE is case-insensitive, so case/whitespace variants share one cache entry
+    return " ".join((term or "").split()).lower()
+
+
+@dataclass(frozen=True)
+class AccountFilter:
+    segments: Tuple[str, ...] = ()
+    regions: Tuple[str, ...] = ()
+    industries: Tuple[str, ...] = ()
+    rep_teams: Tuple[str, ...] = ()
+    rep_regions: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_selections(
+        cls,
+        segments: Optional[Iterable[str]] = None,
+        regions: Optional[Iterable[str]] = None,
+        industries: Optional[Iterable[str]] = None,
+        rep_teams: Optional[Iterable[str]] = None,
+        rep_regions: Optional[Iterable[str]] = None,
+    ) -> "AccountFilter":
+        return cls(
+            segments=_canon(segments),
+            regions=_canon(regions),
+            industries=_canon(industries),
+            rep_teams=_canon(rep_teams),
+            rep_regions=_canon(rep_regions),
+        )
+
+    def dimensions(self) -> Dict[str, Tuple[str, ...]]:
+        return {
+            "SEGMENT": self.segments,
+            "REGION": self.regions,
+            "INDUSTRY": self.industries,
+            "REP_TEAM": self.rep_teams,
+            "REP_REGION": self.rep_regions,
+        }
+
+    def cache_key(self) -> str:
+        parts = [f"{k}={'|'.join(v)}" for k, v in self.dimensions().items() if v]
+        return ";".join(parts) or "ALL"
+
+    def to_sql(self, a_alias: str = "a", r_alias: Optional[str] = "r") -> Tuple[str, List[Any]]:
+        # r_alias=None when SALES_REPS is not available (rep filters are then ignored)
+        columns = {
+            "SEGMENT": f"{a_alias}.segment",
+            "REGION": f"{a_alias}.region",
+            "INDUSTRY": f"{a_alias}.industry",
+        }
+        if r_alias:
+            columns["REP_TEAM"] = f"{r_alias}.team"
+            columns["REP_REGION"] = f"{r_alias}.region"
+        return self.to_sql_columns(columns)
+
+    def to_sql_columns(self, columns: Dict[str, str]) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        for dim, values in self.dimensions().items():
+            if not values or dim not in columns:
+                continue
+            clauses.append(f"{columns[dim]} in ({placeholders(len(values))})")
+            params.extend(values)
+        return (" and ".join(clauses) if clauses else "1=1"), params
+
+
+def account_search_sql(accounts_tbl: str, term: str, limit: int) -> Tuple[str, List[Any]]:
+    # Top-N name / ID matches, prefix matches first; callers only ever receive `limit` rows
+    prefix = like_escape(term) + "%"
+    contains = "%" + like_escape(term) + "%"
+    sql = f"""
+    select
+        account_id,
+        account_name,
+        segment,
+        region,
+        industry,
+        owner_rep_id,
+        website
+    from {accounts_tbl}
+    where account_name ilike ? escape '{LIKE_ESCAPE}'
+       or account_id ilike ? escape '{LIKE_ESCAPE}'
+    order by
+        case
+            when account_name ilike ? escape '{LIKE_ESCAPE}' or account_id ilike ? escape '{LIKE_ESCAPE}' then 0
+            else 1
+        end,
+        account_name,
+        account_id
+    limit {int(limit)};
+    """
+    return sql, [contains, contains, prefix, prefix]
@@ -0,0 +1,397 @@
+# result_cache.py
+# Purpose: Second-level, cross-session cache for query results behind run_sql.
+#   st.cache_data lives in one process: a container restart or a new replica starts cold and
+#   re-runs every mart query. This tier persists result frames so a warm start reads them
+#   back instead of hitting the warehouse.
+#     - key: fingerprint of the SQL text (whitespace collapsed) + bind params + data version;
+#       a new data version (e.g. a mart refresh) simply stops matching the old entries
+#     - value: the frame serialized as Parquet (Arrow), stored as bytes
+#     - entries expire after ttl_s; past max_bytes the least recently used are evicted;
+#       frames above max_entry_bytes are not stored
+#     - get_or_query writes a miss's result on one background thread (Parquet encode + the
+#       store's delete / insert), so a miss costs the lookup plus the query; when more than
+#       max_pending_writes are queued, further results are not stored
+#   Stores:
+#     - TableResultStore: GTM_COPILOT.UTIL.QUERY_RESULT_CACHE through the query backend
+#                         (payload base64 text), shared by every replica
+#     - DiskResultStore:  a local SQLite file (offline dev / a single container's disk)
+#   result_cache_from_env picks the store (GTM_RESULT_CACHE / GTM_RESULT_CACHE_PATH) for the
+#   app and the warm-up job (sql/40_jobs/warm_cache.py), so both read and fill the same one.
+#   Cortex responses have their own persistent cache (llm_cache.py).
+
+import base64
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from query_backend import QueryBackend
+
+
+DEFAULT_TABLE = "GTM_COPILOT.UTIL.QUERY_RESULT_CACHE"
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "gtm_result_cache.sqlite")
+COLUMNS = ["cache_key", "data_version", "row_count", "bytes", "payload", "created_at", "last_used_at", "hits"]
+
+_WS = re.compile(r"\s+")
+
+
+def sql_fingerprint(sql: str, params: Optional[Sequence[Any]], data_version: str) -> str:
+    h = hashlib.sha256()
+    for part in (_WS.sub(" ", sql).strip(), json.dumps(list(params or []), default=str), str(data_version)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def frame_to_bytes(df: pd.DataFrame) -> bytes:
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False)
+    return buf.getvalue()
+
+
+def bytes_to_frame(data: bytes) -> pd.DataFrame:
+    return pd.read_parquet(io.BytesIO(data))
+
+
+# -----------------------------
+# Stores
+# -----------------------------
+class ResultCacheStore:
+    def get(self, cache_key: str, now: float, ttl_s: float) -> Optional[Tuple[bytes, float]]:
+        # (payload, last_used_at)
+        raise NotImplementedError
+
+    def touch(self, cache_key: str, now: float) -> None:
+        raise NotImplementedError
+
+    def put(self, row: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def evict(self, now: float, ttl_s: float, max_bytes: int) -> int:
+        raise NotImplementedError
+
+    def usage(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+class DiskResultStore(ResultCacheStore):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._con.execute(
+                """
+                create table if not exists query_result_cache (
+                    cache_key text primary key,
+                    data_version text not null,
+                    row_count integer not null,
+                    bytes integer not null,
+                    payload blob not null,
+                    created_at real not null,
+                    last_used_at real not null,
+                    hits integer not null default 0
+                )
+                """
+            )
+            self._con.commit()
+
+    def get(self, cache_key: str, now: float, ttl_s: float) -> Optional[Tuple[bytes, float]]:
+        with self._lock:
+            row = self._con.execute(
+                "select payload, last_used_at from query_result_cache where cache_key = ? and created_at >= ?",
+                (cache_key, now - ttl_s),
+            ).fetchone()
+        return (bytes(row[0]), float(row[1])) if row else None
+
+    def touch(self, cache_key: str, now: float) -> None:
+        with self._lock:
+            self._con.execute(
+                "update query_result_cache set last_used_at = ?, hits = hits + 1 where cache_key = ?",
+                (now, cache_key),
+            )
+            self._con.commit()
+
+    def put(self, row: Dict[str, Any]) -> None:
+        with self._lock:
+            self._con.execute(
+                f"insert or replace into query_result_cache ({', '.join(COLUMNS)}) values ({', '.join(['?'] * len(COLUMNS))})",
+                tuple(sqlite3.Binary(row[c]) if c == "payload" else row[c] for c in COLUMNS),
+            )
+            self._con.commit()
+
+    def evict(self, now: float, ttl_s: float, max_bytes: int) -> int:
+        with self._lock:
+            expired = self._con.execute("delete from query_result_cache where created_at < ?", (now - ttl_s,)).rowcount
+            lru = self._con.execute(
+                """
+                delete from query_result_cache
+                where cache_key in (
+                    select cache_key from (
+                        select
+                            cache_key,
+                            sum(bytes) over (
+                                order by last_used_at desc, cache_key
+                                rows between unbounded preceding and current row
+                            ) as running_bytes
+                        from query_result_cache
+                    )
+                    where running_bytes > ?
+                )
+                """,
+                (int(max_bytes),),
+            ).rowcount
+            self._con.commit()
+        return int(expired or 0) + int(lru or 0)
+
+    def usage(self) -> Dict[str, int]:
+        with self._lock:
+            n, total = self._con.execute("select count(*), coalesce(sum(bytes), 0) from query_result_cache").fetchone()
+        return {"entries": int(n), "bytes": int(total)}
+
+
+class TableResultStore(ResultCacheStore):
+    # Times are epoch seconds (double) so the same SQL runs on Snowflake and the local backend
+    def __init__(self, backend: QueryBackend, table: str = DEFAULT_TABLE):
+        self.backend = backend
+        self.table = table
+        self.backend.execute(
+            f"""
+            create table if not exists {table} (
+                cache_key varchar not null,
+                data_version varchar not null,
+                row_count integer not null,
+                bytes integer not null,
+                payload varchar not null,
+                created_at double not null,
+                last_used_at double not null,
+                hits integer not null
+            )
+            """
+        )
+
+    def get(self, cache_key: str, now: float, ttl_s: float) -> Optional[Tuple[bytes, float]]:
+        df = self.backend.query(
+            f"select payload, last_used_at from {self.table} where cache_key = ? and created_at >= ? limit 1",
+            (cache_key, now - ttl_s),
+        )
+        if df is None or df.empty:
+            return None
+        return base64.b64decode(df.iloc[0]["PAYLOAD"]), float(df.iloc[0]["LAST_USED_AT"])
+
+    def touch(self, cache_key: str, now: float) -> None:
+        self.backend.execute(
+            f"update {self.table} set last_used_at = ?, hits = hits + 1 where cache_key = ?",
+            (now, cache_key),
+        )
+
+    def put(self, row: Dict[str, Any]) -> None:
+        values = {**row, "payload": base64.b64encode(row["payload"]).decode("ascii")}
+        self.backend.execute(f"delete from {self.table} where cache_key = ?", (row["cache_key"],))
+        self.backend.execute(
+            f"insert into {self.table} ({', '.join(COLUMNS)}) select {', '.join(['?'] * len(COLUMNS))}",
+            tuple(values[c] for c in COLUMNS),
+        )
+
+    def evict(self, now: float, ttl_s: float, max_bytes: int) -> int:
+        before = self.usage()["entries"]
+        self.backend.execute(f"delete from {self.table} where created_at < ?", (now - ttl_s,))
+        self.backend.execute(
+            f"""
+            delete from {self.table}
+            where cache_key in (
+                select cache_key
+                from {self.table}
+                qualify sum(bytes) over (
+                    order by last_used_at desc, cache_key
+                    rows between unbounded preceding and current row
+                ) > ?
+            )
+            """,
+            (int(max_bytes),),
+        )
+        return max(0, before - self.usage()["entries"])
+
+    def usage(self) -> Dict[str, int]:
+        df = self.backend.query(f"select count(*) as n, coalesce(sum(bytes), 0) as total from {self.table}")
+        return {"entries": int(df.iloc[0]["N"]), "bytes": int(df.iloc[0]["TOTAL"])}
+
+
+# -----------------------------
+# Cache
+# -----------------------------
+@dataclass
+class ResultCacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    skipped: int = 0  # too large / not serializable
+    evictions: int = 0
+    errors: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+
+class SharedResultCache:
+    def __init__(
+        self,
+        store: Optional[ResultCacheStore],
+        ttl_s: float = 24 * 3600,
+        max_bytes: int = 512 * 1024 * 1024,
+        max_entry_bytes: int = 8 * 1024 * 1024,
+        touch_after_s: float = 60.0,
+        evict_every: int = 50,
+        max_pending_writes: int = 16,
+    ):
+        self.store = store
+        self.ttl_s = float(ttl_s)
+        self.max_bytes = int(max_bytes)
+        self.max_entry_bytes = int(max_entry_bytes)
+        self.touch_after_s = float(touch_after_s)
+        self.evict_every = int(evict_every)
+        self.max_pending_writes = int(max_pending_writes)
+        self.stats = ResultCacheStats()
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def _count(self, field_name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self.stats, field_name, getattr(self.stats, field_name) + n)
+
+    def get(self, cache_key: str) -> Optional[pd.DataFrame]:
+        if self.store is None:
+            return None
+        now = time.time()
+        try:
+            found = self.store.get(cache_key, now, self.ttl_s)
+            if found is None:
+                self._count("misses")
+                return None
+            payload, last_used_at = found
+            df = bytes_to_frame(payload)
+            # LRU recency is coarse: one write per entry per touch_after_s, not one per read
+            if now - last_used_at >= self.touch_after_s:
+                self.store.touch(cache_key, now)
+            self._count("hits")
+            self._count("bytes_read", len(payload))
+            return df
+        except Exception:
+            # A broken cache must never block the query itself
+            self._count("errors")
+            return None
+
+    def put(self, cache_key: str, data_version: str, df: pd.DataFrame) -> None:
+        if self.store is None or df is None:
+            return
+        try:
+            payload = frame_to_bytes(df)
+        except Exception:
+            self._count("skipped")
+            return
+        if len(payload) > self.max_entry_bytes:
+            self._count("skipped")
+            return
+        now = time.time()
+        try:
+            self.store.put({
+                "cache_key": cache_key,
+                "data_version": str(data_version),
+                "row_count": len(df),
+                "bytes": len(payload),
+                "payload": payload,
+                "created_at": now,
+                "last_used_at": now,
+                "hits": 0,
+            })
+            self._count("stores")
+            self._count("bytes_written", len(payload))
+            if self.evict_every > 0 and self.stats.stores % self.evict_every == 0:
+                self._count("evictions", self.store.evict(now, self.ttl_s, self.max_bytes))
+        except Exception:
+            self._count("errors")
+
+    def put_async(self, cache_key: str, data_version: str, df: pd.DataFrame) -> None:
+        # Request path: hand the write to the background writer, or drop it when backed up
+        if self.store is None or df is None:
+            return
+        with self._lock:
+            if self._pending_writes >= self.max_pending_writes:
+                self.stats.skipped += 1
+                return
+            self._pending_writes += 1
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gtm-result-cache")
+            writer = self._writer
+        writer.submit(self._write, cache_key, data_version, df)
+
+    def _write(self, cache_key: str, data_version: str, df: pd.DataFrame) -> None:
+        try:
+            self.put(cache_key, data_version, df)
+        finally:
+            with self._lock:
+                self._pending_writes -= 1
+
+    def flush(self, timeout_s: float = 30.0) -> bool:
+        # Wait for queued background writes (jobs / benchmarks before reading the store back)
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self._pending_writes == 0:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def get_or_query(
+        self,
+        sql: str,
+        params: Optional[Sequence[Any]],
+        data_version: str,
+        query: Callable[[], pd.DataFrame],
+    ) -> pd.DataFrame:
+        cache_key = sql_fingerprint(sql, params, data_version)
+        df = self.get(cache_key)
+        if df is not None:
+            return df
+        df = query()
+        self.put_async(cache_key, data_version, df)
+        return df
+
+    def usage(self) -> Dict[str, int]:
+        if self.store is None:
+            return {"entries": 0, "bytes": 0}
+        try:
+            return self.store.usage()
+        except Exception:
+            self._count("errors")
+            return {"entries": 0, "bytes": 0}
+
+
+def result_cache_from_env(backend: QueryBackend, **kwargs: Any) -> SharedResultCache:
+    # GTM_RESULT_CACHE=table (UTIL.QUERY_RESULT_CACHE) | disk (GTM_RESULT_CACHE_PATH) | off
+    default_kind = "table" if backend.name == "snowflake" else "disk"
+    kind = os.environ.get("GTM_RESULT_CACHE", default_kind).strip().lower()
+    store: Optional[ResultCacheStore] = None
+    try:
+        if kind == "table":
+            store = TableResultStore(backend)
+        elif kind == "disk":
+            store = DiskResultStore(os.environ.get("GTM_RESULT_CACHE_PATH") or DEFAULT_PATH)
+    except Exception:
+        store = None
+    return SharedResultCache(store, **kwargs)
@@ -0,0 +1,151 @@
+# startup.py
+# Purpose: Keep the app's cold start off the critical path.
+#   - optional_import: chart libraries load on first use, so a rerun that draws no chart (or
+#     only one kind) never pays for plotly / altair
+#   - StartupSnapshot: resolved tables, filter domains and MRR date bounds from the last run,
+#     kept in process memory and a JSON file (GTM_STARTUP_SNAPSHOT_PATH). The shell and the
+#     sidebar paint from it; the warehouse check runs after and reruns if anything changed
+#   - StartupProfiler: GTM_STARTUP_PROFILE=1 prints an import-time and first-render
+#     breakdown per rerun to stdout
+
+import importlib
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple
+
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(tempfile.gettempdir(), "gtm_startup_snapshot.json")
+SNAPSHOT_VERSION = 1
+
+_imports: Dict[str, Optional[ModuleType]] = {}
+_import_s: Dict[str, Tuple[float, float]] = {}  # name -> (started at, seconds)
+_import_lock = threading.Lock()
+
+
+def optional_import(name: str) -> Optional[ModuleType]:
+    # None when the library isn't installed; either outcome is remembered for the process
+    with _import_lock:
+        if name in _imports:
+            return _imports[name]
+        t0 = time.perf_counter()
+        try:
+            module: Optional[ModuleType] = importlib.import_module(name)
+        except Exception:
+            module = None
+        _import_s[name] = (t0, time.perf_counter() - t0)
+        _imports[name] = module
+        return module
+
+
+def lazy_import_timings(since: float = 0.0) -> Dict[str, float]:
+    # Imports started at or after `since` (a perf_counter value)
+    with _import_lock:
+        return {name: s for name, (at, s) in _import_s.items() if at >= since}
+
+
+# -----------------------------
+# Sidebar snapshot
+# -----------------------------
+@dataclass(frozen=True)
+class StartupSnapshot:
+    tables: Dict[str, Optional[str]]
+    domains: Dict[str, List[str]]
+    min_month: date
+    max_month: date
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "version": SNAPSHOT_VERSION,
+            "tables": self.tables,
+            "domains": self.domains,
+            "min_month": self.min_month.isoformat(),
+            "max_month": self.max_month.isoformat(),
+        }, sort_keys=True)
+
+    @classmethod
+    def from_json(cls, text: str) -> Optional["StartupSnapshot"]:
+        data = json.loads(text)
+        if data.get("version") != SNAPSHOT_VERSION:
+            return None
+        return cls(
+            tables=dict(data["tables"]),
+            domains={k: list(v) for k, v in data["domains"].items()},
+            min_month=date.fromisoformat(data["min_month"]),
+            max_month=date.fromisoformat(data["max_month"]),
+        )
+
+
+class SnapshotStore:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._snapshot: Optional[StartupSnapshot] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[StartupSnapshot]:
+        with self._lock:
+            if self._snapshot is None and self.path:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._snapshot = StartupSnapshot.from_json(f.read())
+                except Exception:
+                    self._snapshot = None
+            return self._snapshot
+
+    def save(self, snapshot: StartupSnapshot) -> None:
+        with self._lock:
+            self._snapshot = snapshot
+            if not self.path:
+                return
+            try:
+                # Write-then-rename: another process never reads a half-written file
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(snapshot.to_json())
+                os.replace(tmp, self.path)
+            except Exception:
+                pass
+
+
+def snapshot_store_from_env() -> SnapshotStore:
+    # GTM_STARTUP_SNAPSHOT_PATH=<file> | off (process memory only)
+    path = os.environ.get("GTM_STARTUP_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH).strip()
+    return SnapshotStore(None if path.lower() == "off" else path)
+
+
+# -----------------------------
+# Profiler
+# -----------------------------
+@dataclass
+class StartupProfiler:
+    t0: float
+    enabled: bool = False
+    marks: List[Tuple[str, float]] = field(default_factory=list)
+    _last: Optional[float] = None
+
+    def mark(self, label: str) -> None:
+        # Time since the previous mark (or t0), attributed to `label`
+        now = time.perf_counter()
+        self.marks.append((label, now - (self._last if self._last is not None else self.t0)))
+        self._last = now
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = [{"PHASE": label, "SECONDS": round(s, 4)} for label, s in self.marks]
+        rows += [{"PHASE": f"lazy import {name}", "SECONDS": round(s, 4)} for name, s in lazy_import_timings(self.t0).items()]
+        return rows
+
+    def report(self, title: str) -> None:
+        if not self.enabled:
+            return
+        # Lazy imports are per process: listed only on the rerun that first drew that chart kind
+        rows = self.breakdown()
+        total = (self._last or self.t0) - self.t0
+        width = max([len(r["PHASE"]) for r in rows] + [5])
+        lines = [f"[startup] {title}: {total:.3f}s"]
+        lines += [f"  {r['PHASE']:<{width}}  {r['SECONDS']:8.4f}s" for r in rows]
+        print("\n".join(lines), flush=True)
@@ -1,77 +1,101 @@
+import time
+
+# Start of this rerun (first-paint timing for the active view, startup profile)
+_RUN_T0 = time.perf_counter()
+
 import streamlit as st
-from snowflake.snowpark.context import get_active_session
 import pandas as pd
 from datetime import date
-from typing import List, Optional, Dict, Tuple, Any
+from typing import List, Optional, Dict, Tuple, Any, Callable, Iterator
 import re
 import html
 import json
+import os
+import tempfile
+import threading
+
+from query_backend import QueryBackend, backend_from_env
+from query_executor import FanOutReport, run_concurrent
+import dataset_sql
+import qa_pack
+from exec_narrative import (
+    CORTEX_MODEL,
+    LLM_PROMPT_VERSION,
+    NARRATIVES_TABLE,
+    exec_narrative_prompt,
+    latest_narrative_sql,
+    narrative_ctx_key,
+    slice_for_filter,
+    slice_label,
+)
+from filter_usage import FilterUsageLog
+from formatting import fmt_currency, fmt_number, fmt_pct, fmt_x
+from gtm_metrics import DataQualityCheck, MetricsEngine
+from kpis import KpiResult, compute_kpis
+from llm_cache import LLMCache, SQLiteStore, TableStore, pack_fingerprint
+from narrative_jobs import StreamJobQueue
+from result_cache import SharedResultCache, result_cache_from_env
+from table_versions import ANY_TABLE, TRACKED_SCHEMAS, TableVersionTracker, tables_in_sql
+from dataset_sql import REQUIRED_TABLES, TABLE_CANDIDATES, DatasetTables
+from cortex_stream import BlockingStreamer, CompletionStreamer, MockStreamer, SnowflakeStreamer
+from account_cache import AccountBundle, AccountBundleCache, batch_summary, bundles_to_zip, split_by_account
+from query_builder import AccountFilter, account_search_sql, normalize_search_term, placeholders
+from startup import SnapshotStore, StartupProfiler, StartupSnapshot, optional_import, snapshot_store_from_env
+from view_router import ViewRouter, prefetch
+
+# GTM_STARTUP_PROFILE=1 prints an import-time / first-render breakdown per rerun (startup.py)
+PROFILE = StartupProfiler(_RUN_T0, enabled=os.environ.get("GTM_STARTUP_PROFILE", "").strip() in ("1", "true", "yes"))
+PROFILE.mark("imports")
+
 
 # -----------------------------
-# Optional chart libraries (graceful fallback)
+# Optional chart libraries (imported on first use; graceful fallback)
 # -----------------------------
-PLOTLY_OK = False
-ALTAIR_OK = False
+def plotly_express():
+    return optional_import("plotly.express")
 
-try:
-    import plotly.express as px
-    import plotly.graph_objects as go
-    PLOTLY_OK = True
-except Exception:
-    PLOTLY_OK = False
 
-try:
-    import altair as alt
-    ALTAIR_OK = True
-except Exception:
-    ALTAIR_OK = False
+def altair():
+    return optional_import("altair")
 
 
 # -----------------------------
 # App Config
 # -----------------------------
 APP_TITLE = "Revenue Intelligence System"
-DB = "GTM_COPILOT"
-RAW = f"{DB}.RAW"
-MARTS = f"{DB}.MARTS"
-
-# Candidate tables (auto-resolve first existing)
-TABLE_CANDIDATES = {
-    "ACCOUNTS": [
-        f"{RAW}.ACCOUNTS",
-        f"{DB}.RAW.ACCOUNTS",
-    ],
-    "SALES_REPS": [
-        f"{RAW}.SALES_REPS",
-        f"{DB}.RAW.SALES_REPS",
-    ],
-    "FCT_MRR": [
-        f"{MARTS}.FCT_MRR_COMPLETE",
-        f"{MARTS}.FCT_MRR",
-    ],
-    "FCT_PIPELINE": [
-        f"{MARTS}.FCT_PIPELINE",
-    ],
-    "STAGE_HISTORY": [
-        f"{RAW}.OPPORTUNITY_STAGE_HISTORY",
-        f"{MARTS}.OPPORTUNITY_STAGE_HISTORY",
-    ],
-    "SUPPORT_TICKETS": [
-        f"{RAW}.SUPPORT_TICKETS",
-    ],
-    "HEALTH_SNAPSHOT": [
-        f"{MARTS}.ACCOUNT_HEALTH",
-        f"{MARTS}.METRICS_ACCOUNT_HEALTH",
-        f"{MARTS}.FCT_ACCOUNT_HEALTH",
-    ],
-}
-
 # Thresholds for executive alerts
 NRR_ALERT_BELOW = 90.0
 GRR_ALERT_BELOW = 90.0
 PIPELINE_COVERAGE_ALERT_BELOW = 3.0  # common heuristic (3x). Your dataset may be higher.
 ARR_NEGATIVE_TREND_LOOKBACK = 3       # months
 
+# Account Explorer typeahead: matches returned per search
+ACCOUNT_SEARCH_LIMIT = 50
+# Account Explorer drill-down: recently viewed accounts kept in memory
+ACCOUNT_BUNDLE_CACHE_SIZE = 64
+# Batched drill-down (Customer Health): accounts per batch, account ids per `in (...)` query
+ACCOUNT_BATCH_MAX = 50
+ACCOUNT_BATCH_CHUNK = 500
+
+# Cortex completions (model + prompt version: exec_narrative.py)
+LLM_CACHE_TTL_S = 7 * 24 * 3600
+LLM_CACHE_MAX_ENTRIES = 5000
+# Start the executive narrative in the background when a new filter state's KPIs are known
+EXEC_NARRATIVE_PREFETCH = os.environ.get("GTM_NARRATIVE_PREFETCH", "1").strip() in ("1", "true", "yes")
+QA_PACK_TOKEN_BUDGET = 1500  # estimated input tokens for the evidence pack (None = no trimming)
+
+# Shared result cache: persistent tier behind run_sql (survives restarts, shared by replicas)
+RESULT_CACHE_TTL_S = 24 * 3600
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Record segment / region selections in UTIL.FILTER_USAGE (the warm-up job pre-fills the top ones)
+FILTER_USAGE_LOG = os.environ.get("GTM_FILTER_USAGE", "1").strip() in ("1", "true", "yes")
+
+# Cached data lives until a table it reads changes (table_versions.py); the max age is a backstop
+CACHE_MAX_AGE_S = 24 * 3600
+RUN_SQL_MAX_ENTRIES = 2000
+DATA_VERSION_CHECK_S = 5       # at most one metadata query per interval, shared by all sessions
+DATA_VERSION_FALLBACK_S = 900  # fixed TTL when the metadata query is unavailable
+
 
 # -----------------------------
 # Streamlit Page Setup
@@ -235,6 +259,7 @@ div[data-testid="stChatMessageContent"] {
 """,
     unsafe_allow_html=True,
 )
+PROFILE.mark("page config + CSS")
 
 
 # -----------------------------
@@ -251,31 +276,172 @@ def _norm_text(s: Any) -> str:
     return s
 
 
-def sql_quote_list(values: List[str]) -> str:
-    escaped = [v.replace("'", "''") for v in values]
-    return ", ".join([f"'{v}'" for v in escaped])
+@st.cache_resource(show_spinner=False)
+def get_backend() -> QueryBackend:
+    # Snowflake session by default; GTM_QUERY_BACKEND=local runs against DuckDB stand-ins
+    return backend_from_env()
 
 
-@st.cache_data(ttl=900, show_spinner=False)
-def run_sql(sql: str) -> pd.DataFrame:
-    session = get_active_session()
-    df = session.sql(sql).to_pandas()
-    if df is None:
-        return pd.DataFrame()
-    df.columns = [c.upper() for c in df.columns]
-    return df
+@st.cache_resource(show_spinner=False)
+def get_result_cache() -> SharedResultCache:
+    return result_cache_from_env(get_backend(), ttl_s=RESULT_CACHE_TTL_S, max_bytes=RESULT_CACHE_MAX_BYTES)
+
+
+@st.cache_resource(show_spinner=False)
+def get_version_tracker() -> TableVersionTracker:
+    return TableVersionTracker(min_interval_s=DATA_VERSION_CHECK_S, fallback_ttl_s=DATA_VERSION_FALLBACK_S)
+
+
+def check_data_versions(force: bool = False) -> List[str]:
+    # One INFORMATION_SCHEMA query per rerun (throttled); clears the getters whose tables changed
+    return get_version_tracker().check(lambda: get_backend().table_metadata(TRACKED_SCHEMAS), force=force)
+
+
+def invalidated_by(*datasets: str) -> Callable:
+    # Above @st.cache_data: the getter is cleared when any table it reads changes.
+    # Datasets are TABLE_CANDIDATES keys (every candidate counts) or fully qualified names
+    tables: List[str] = []
+    for d in datasets:
+        tables += TABLE_CANDIDATES.get(d, [d])
+
+    def register(fn: Callable) -> Callable:
+        get_version_tracker().register(fn.__name__, tables, fn.clear)
+        return fn
+
+    return register
+
+
+def data_version(sql: str) -> str:
+    # Version of the tables this statement reads (part of both cache keys)
+    return get_version_tracker().version_of(tables_in_sql(sql))
+
+
+@st.cache_data(ttl=CACHE_MAX_AGE_S, max_entries=RUN_SQL_MAX_ENTRIES, show_spinner=False)
+def _run_sql(sql: str, params: Optional[Tuple[Any, ...]], version: str) -> pd.DataFrame:
+    # A miss in this process checks the shared result cache before the warehouse
+    return get_result_cache().get_or_query(sql, params, version, lambda: get_backend().query(sql, params))
+
+
+def run_sql(sql: str, params: Optional[Tuple[Any, ...]] = None) -> pd.DataFrame:
+    # Values travel as bind parameters; the SQL text is a stable template per query shape.
+    # A changed table changes the version, so its queries miss both caches
+    return _run_sql(sql, params, data_version(sql))
+
+
+def embed_question(text: str) -> Optional[List[float]]:
+    df = get_backend().query(
+        "select SNOWFLAKE.CORTEX.EMBED_TEXT_768('snowflake-arctic-embed-m-v1.5', ?)::array as EMBEDDING",
+        (text,),
+    )
+    if df is None or df.empty:
+        return None
+    v = df.iloc[0]["EMBEDDING"]
+    if isinstance(v, str):
+        v = json.loads(v)
+    return [float(x) for x in v]
+
+
+@st.cache_resource(show_spinner=False)
+def get_llm_cache() -> LLMCache:
+    # GTM_LLM_CACHE=table (CORTEX.LLM_RESPONSE_CACHE) | sqlite (GTM_LLM_CACHE_PATH) | off
+    backend = get_backend()
+    default_kind = "table" if backend.name == "snowflake" else "sqlite"
+    kind = os.environ.get("GTM_LLM_CACHE", default_kind).strip().lower()
+    store = None
+    try:
+        if kind == "table":
+            store = TableStore(backend)
+        elif kind == "sqlite":
+            store = SQLiteStore(
+                os.environ.get("GTM_LLM_CACHE_PATH") or os.path.join(tempfile.gettempdir(), "gtm_llm_cache.sqlite")
+            )
+    except Exception:
+        store = None
+    semantic = os.environ.get("GTM_LLM_CACHE_SEMANTIC", "").strip() in ("1", "true", "yes")
+    return LLMCache(
+        store,
+        ttl_s=LLM_CACHE_TTL_S,
+        max_entries=LLM_CACHE_MAX_ENTRIES,
+        embed_fn=embed_question if semantic and backend.name == "snowflake" else None,
+    )
+
+
+def ai_complete(prompt: str) -> Optional[str]:
+    df = get_backend().query(f"select AI_COMPLETE('{CORTEX_MODEL}', $$ {prompt} $$) as RESPONSE;")
+    if df is None or df.empty:
+        return None
+    return _norm_text(df.iloc[0]["RESPONSE"]) or None
+
+
+def cached_completion(kind: str, prompt: str, pack: Any, question: str = "") -> Optional[str]:
+    # Cache key: normalized question + canonical pack (not the raw prompt text)
+    return get_llm_cache().get_or_complete(
+        kind, CORTEX_MODEL, LLM_PROMPT_VERSION, pack, question, lambda: ai_complete(prompt)
+    ) or None
+
+
+@st.cache_resource(show_spinner=False)
+def get_streamer() -> CompletionStreamer:
+    # GTM_CORTEX_MOCK=1: canned, chunked responses (the local backend has no Cortex)
+    if os.environ.get("GTM_CORTEX_MOCK", "").strip() in ("1", "true", "yes"):
+        return MockStreamer()
+    backend = get_backend()
+    if backend.name == "snowflake":
+        return SnowflakeStreamer(backend.session, lambda model, prompt: ai_complete(prompt))
+    return BlockingStreamer(lambda model, prompt: ai_complete(prompt))
+
+
+def stream_completion(
+    kind: str,
+    prompt: str,
+    pack: Any,
+    question: str,
+    fallback: Optional[Callable[[Optional[Exception]], str]],
+) -> Iterator[str]:
+    # Cached responses arrive as one chunk; a miss streams from Cortex and is cached once complete.
+    # fallback=None re-raises errors (background jobs record them instead of caching a fallback)
+    cache = get_llm_cache()
+    look = cache.lookup(kind, CORTEX_MODEL, LLM_PROMPT_VERSION, pack, question)
+    if look.response is not None:
+        yield look.response
+        return
+
+    parts: List[str] = []
+    try:
+        for chunk in get_streamer().stream(CORTEX_MODEL, prompt):
+            parts.append(chunk)
+            yield chunk
+    except Exception as e:
+        if fallback is None:
+            raise
+        yield ("\n\n" if parts else "") + fallback(e)
+        return
+
+    text = _norm_text("".join(parts))
+    if not text:
+        if fallback is None:
+            raise RuntimeError("Cortex returned an empty completion")
+        yield fallback(None)
+        return
+    if get_streamer().name != "mock":
+        cache.store_response(look, text)
 
 
 def table_exists(fqn: str) -> bool:
     try:
-        _ = run_sql(f"select 1 as ok from {fqn} limit 1")
+        _ = run_sql(dataset_sql.table_probe_sql(fqn))
         return True
     except Exception:
         return False
 
 
-@st.cache_data(ttl=3600, show_spinner=False)
+@invalidated_by(ANY_TABLE)
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
 def resolve_tables() -> Dict[str, Optional[str]]:
+    # Matched against the version check's INFORMATION_SCHEMA listing (no extra round-trip)
+    known = get_version_tracker().known_tables()
+    if known:
+        return dataset_sql.resolve_from_metadata(known)
     resolved: Dict[str, Optional[str]] = {}
     for key, candidates in TABLE_CANDIDATES.items():
         found = None
@@ -290,45 +456,6 @@ def resolve_tables() -> Dict[str, Optional[str]]:
     return resolved
 
 
-def fmt_currency(x: Optional[float]) -> str:
-    if x is None or pd.isna(x):
-        return "—"
-    sign = "-" if x < 0 else ""
-    x = abs(float(x))
-    if x >= 1_000_000_000:
-        return f"{sign}${x/1_000_000_000:,.2f}B"
-    if x >= 1_000_000:
-        return f"{sign}${x/1_000_000:,.2f}M"
-    if x >= 1_000:
-        return f"{sign}${x:,.0f}"
-    return f"{sign}${x:,.2f}"
-
-
-def fmt_number(x: Optional[float]) -> str:
-    if x is None or pd.isna(x):
-        return "—"
-    x = float(x)
-    if abs(x) >= 1_000_000_000:
-        return f"{x/1_000_000_000:,.2f}B"
-    if abs(x) >= 1_000_000:
-        return f"{x/1_000_000:,.2f}M"
-    if abs(x) >= 1_000:
-        return f"{x:,.0f}"
-    return f"{x:,.2f}"
-
-
-def fmt_pct(x: Optional[float]) -> str:
-    if x is None or pd.isna(x):
-        return "—"
-    return f"{float(x):.2f}%"
-
-
-def fmt_x(x: Optional[float]) -> str:
-    if x is None or pd.isna(x):
-        return "—"
-    return f"{float(x):.2f}x"
-
-
 def kpi_card(label: str, value: str, delta: Optional[float] = None, delta_fmt: str = "number"):
     if delta is None or pd.isna(delta):
         delta_html = '<div class="kpi-delta-neutral">Δ —</div>'
@@ -363,14 +490,16 @@ def chart_line(df: pd.DataFrame, x_col: str, y_col: str, title: str, height: int
         st.info("No data for current filters.")
         return
 
-    if PLOTLY_OK:
+    px = plotly_express()
+    if px is not None:
         fig = px.line(df, x=x_col, y=y_col)
         fig.update_layout(template="plotly_white", height=height, margin=dict(l=0, r=0, t=45, b=0))
         fig.update_traces(line=dict(width=3))
         st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False}, key=f"line_{x_col}_{y_col}_{title}")
         return
 
-    if ALTAIR_OK:
+    alt = altair()
+    if alt is not None:
         c = (
             alt.Chart(df)
             .mark_line(strokeWidth=3)
@@ -392,10 +521,10 @@ def chart_multi_line(df: pd.DataFrame, x_col: str, y_cols: List[str], title: str
         st.info("No data for current filters.")
         return
 
-    dfl = df[[x_col] + y_cols].copy()
-    dfl = dfl.melt(id_vars=[x_col], var_name="SERIES", value_name="VALUE")
+    dfl = df[[x_col] + y_cols].melt(id_vars=[x_col], var_name="SERIES", value_name="VALUE")
 
-    if PLOTLY_OK:
+    px = plotly_express()
+    if px is not None:
         fig = px.line(dfl, x=x_col, y="VALUE", color="SERIES")
         fig.update_layout(template="plotly_white", height=height, margin=dict(l=0, r=0, t=45, b=0))
         fig.update_traces(line=dict(width=3))
@@ -403,7 +532,8 @@ def chart_multi_line(df: pd.DataFrame, x_col: str, y_cols: List[str], title: str
                         key=f"multiline_{x_col}_{'_'.join(y_cols)}_{title}")
         return
 
-    if ALTAIR_OK:
+    alt = altair()
+    if alt is not None:
         c = (
             alt.Chart(dfl)
             .mark_line(strokeWidth=3)
@@ -426,13 +556,15 @@ def chart_bar(df: pd.DataFrame, x_col: str, y_col: str, title: str, height: int
         st.info("No data for current filters.")
         return
 
-    if PLOTLY_OK:
+    px = plotly_express()
+    if px is not None:
         fig = px.bar(df, x=x_col, y=y_col)
         fig.update_layout(template="plotly_white", height=height, margin=dict(l=0, r=0, t=45, b=0))
         st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False}, key=f"bar_{x_col}_{y_col}_{title}")
         return
 
-    if ALTAIR_OK:
+    alt = altair()
+    if alt is not None:
         c = (
             alt.Chart(df)
             .mark_bar()
@@ -452,32 +584,31 @@ def chart_bar(df: pd.DataFrame, x_col: str, y_col: str, title: str, height: int
 # -----------------------------
 # Cortex Executive Narrative
 # -----------------------------
-def _metric_for_llm(v: Any, label: str, kind: str) -> str:
-    if v is None or (isinstance(v, float) and pd.isna(v)):
-        return f"{label} data not available for selected period"
-    try:
-        x = float(v)
-        if kind == "currency":
-            return fmt_currency(x)
-        if kind == "pct":
-            return fmt_pct(x)
-        if kind == "x":
-            return fmt_x(x)
-        return str(v)
-    except Exception:
-        s = str(v).strip()
-        return s if s else f"{label} data not available for selected period"
+EXEC_SECTIONS = ["Headline", "Executive Summary", "Key Risks", "Recommended Actions"]
+
+
+def _drop_partial_header(text: str) -> str:
+    # While streaming, the last line may be the start of the next header ("Key Ri")
+    if not text or text.endswith("\n"):
+        return text
+    head, _, last = text.rpartition("\n")
+    stub = last.strip().rstrip(":").lower()
+    if stub and any(h.lower().startswith(stub) for h in EXEC_SECTIONS):
+        return head
+    return text
 
 
 def parse_exec_narrative(text: str) -> Dict[str, Any]:
-    text = _norm_text(text)
-    pattern = re.compile(r"(?im)^\s*(Headline|Executive Summary|Key Risks|Recommended Actions)\s*:\s*$")
+    # Tolerates partial (streaming) output: headers with inline content, missing sections,
+    # an unfinished trailing header line
+    text = _drop_partial_header(_norm_text(text))
+    pattern = re.compile(r"(?im)^[ \t]*(Headline|Executive Summary|Key Risks|Recommended Actions)[ \t]*:[ \t]*")
     parts = pattern.split(text)
 
     out: Dict[str, Any] = {"Headline": "", "Executive Summary": "", "Key Risks": "", "Recommended Actions": ""}
     if len(parts) >= 3:
         for i in range(1, len(parts), 2):
-            section = parts[i].strip()
+            section = next((h for h in EXEC_SECTIONS if h.lower() == parts[i].strip().lower()), parts[i].strip())
             content = parts[i + 1].strip() if i + 1 < len(parts) else ""
             out[section] = content
     else:
@@ -486,7 +617,7 @@ def parse_exec_narrative(text: str) -> Dict[str, Any]:
     def extract_numbered_list(block: str) -> List[str]:
         items: List[str] = []
         for line in block.splitlines():
-            m = re.match(r"^\s*\d+\.\s*(.+)$", line.strip())
+            m = re.match(r"^\s*\d+[.)]\s*(.+)$", line.strip())
             if m:
                 items.append(m.group(1).strip())
         return items
@@ -496,7 +627,7 @@ def parse_exec_narrative(text: str) -> Dict[str, Any]:
     return out
 
 
-def render_exec_narrative(narrative_text: str, filters_text: str = ""):
+def render_exec_narrative(narrative_text: str, filters_text: str = "", target: Any = None):
     d = parse_exec_narrative(narrative_text)
 
     headline = html.escape(d.get("Headline", "")).strip() or "Executive Narrative"
@@ -510,7 +641,7 @@ def render_exec_narrative(narrative_text: str, filters_text: str = ""):
 
     meta = html.escape(filters_text).strip()
 
-    st.markdown(
+    (target or st).markdown(
         f"""
 <div class="exec-card">
   <div class="exec-headline">{headline}</div>
@@ -535,113 +666,77 @@ def render_exec_narrative(narrative_text: str, filters_text: str = ""):
     )
 
 
-@st.cache_data(ttl=900, show_spinner=False)
-def generate_exec_narrative(ctx: Dict) -> str:
-    session = get_active_session()
-
-    arr = _metric_for_llm(ctx.get("arr_latest"), "ARR", "currency")
-    nrr = _metric_for_llm(ctx.get("nrr_latest"), "NRR", "pct")
-    grr = _metric_for_llm(ctx.get("grr_latest"), "GRR", "pct")
-    win = _metric_for_llm(ctx.get("win_latest"), "Win Rate", "pct")
-    coverage = _metric_for_llm(ctx.get("coverage_ratio"), "Pipeline Coverage", "x")
-
-    retention_interpretable = bool(ctx.get("retention_interpretable", False))
-    retention_note = str(ctx.get("retention_note") or "Retention interpretability not provided; treat as NOT fully loaded.")
-
-    prompt = f"""
-You are a Chief Revenue Officer writing a board-level executive update.
-
-IMPORTANT:
-- Do NOT use markdown symbols like ### or ##
-- Do NOT include quotation marks
-- Do NOT repeat the prompt
-- Write in clean executive prose
-- Be concise, structured, and confident
+def exec_narrative_fallback(error: Optional[Exception] = None) -> str:
+    summary = f"Error generating narrative: {str(error)}" if error is not None else "No response returned."
+    return _norm_text(
+        "Headline:\nExecutive narrative unavailable for selected period.\n\n"
+        f"Executive Summary:\n{summary}\n\n"
+        "Key Risks:\n1. Not available\n2. Not available\n3. Not available\n\n"
+        "Recommended Actions:\n1. Not available\n2. Not available\n3. Not available"
+    )
 
-STRICT DATA INTERPRETATION RULES (NON-NEGOTIABLE):
-- Retention interpretability flag: {retention_interpretable}
-- Retention note: {retention_note}
 
-- If retention_interpretable is FALSE:
-  You MUST NOT interpret NRR/GRR as churn or deterioration.
-  You MUST say retention is not fully loaded/complete for the selected period.
+def stream_exec_narrative(ctx: Dict, raise_errors: bool = False) -> Iterator[str]:
+    fallback = None if raise_errors else exec_narrative_fallback
+    return stream_completion("exec_narrative", exec_narrative_prompt(ctx), ctx, "", fallback)
 
-- If NRR or GRR equals 0.00% AND retention_interpretable is FALSE:
-  DO NOT interpret this as churn. Call it a data completeness/boundary issue.
 
-- Only discuss churn if explicitly supported by confirmed retention data (retention_interpretable = TRUE).
+@st.cache_resource(show_spinner=False)
+def get_narrative_jobs() -> StreamJobQueue:
+    # Shared by every session in this server process
+    return StreamJobQueue(max_workers=2, max_results=64, ttl_s=900)
 
-Time Window:
-{ctx.get('filters_text')}
 
-Key Metrics:
-ARR: {arr}
-NRR: {nrr}
-GRR: {grr}
-Win Rate: {win}
-Pipeline Coverage: {coverage}
+def exec_narrative_key(ctx: Dict) -> str:
+    return pack_fingerprint("exec_narrative", CORTEX_MODEL, LLM_PROMPT_VERSION, ctx)
 
-Structure your response EXACTLY as:
 
-Headline:
-<1 strong executive sentence>
+def session_key() -> str:
+    if "_session_key" not in st.session_state:
+        st.session_state["_session_key"] = f"s{id(st.session_state)}-{time.time_ns()}"
+    return st.session_state["_session_key"]
 
-Executive Summary:
-<3–5 sentences explaining overall performance>
 
-Key Risks:
-1. ...
-2. ...
-3. ...
-
-Recommended Actions:
-1. ...
-2. ...
-3. ...
-"""
+def exec_narrative_chunks(ctx: Dict) -> Iterator[str]:
+    # Follow the background job for this filter state when there is one, else stream directly
+    job = get_narrative_jobs().get(exec_narrative_key(ctx))
+    if job is None:
+        yield from stream_exec_narrative(ctx)
+        return
+    try:
+        yield from job.follow()
+    except Exception as e:
+        yield exec_narrative_fallback(e)
 
-    sql = f"""
-    select AI_COMPLETE(
-        'mistral-large2',
-        $$ {prompt} $$
-    ) as RESPONSE;
-    """
 
+@invalidated_by(NARRATIVES_TABLE)
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_precomputed_narrative(
+    slice_dim: str, slice_value: str, start_d: date, end_d: date, ctx_key: str
+) -> Optional[Dict[str, Any]]:
+    # Written by sql/40_jobs/generate_slice_narratives.py; only a row generated from the same
+    # KPI values (ctx_key) for the same window matches
     try:
-        df = session.sql(sql).to_pandas()
-        if df is None or df.empty:
-            return _norm_text(
-                "Headline:\nExecutive narrative unavailable for selected period.\n\n"
-                "Executive Summary:\nNo response returned.\n\n"
-                "Key Risks:\n1. Not available\n2. Not available\n3. Not available\n\n"
-                "Recommended Actions:\n1. Not available\n2. Not available\n3. Not available"
-            )
-        return _norm_text(df.iloc[0]["RESPONSE"])
-    except Exception as e:
-        return _norm_text(
-            "Headline:\nExecutive narrative unavailable for selected period.\n\n"
-            f"Executive Summary:\nError generating narrative: {str(e)}\n\n"
-            "Key Risks:\n1. Not available\n2. Not available\n3. Not available\n\n"
-            "Recommended Actions:\n1. Not available\n2. Not available\n3. Not available"
+        df = run_sql(
+            latest_narrative_sql(),
+            (slice_dim, slice_value, start_d, end_d, CORTEX_MODEL, LLM_PROMPT_VERSION, ctx_key),
         )
+    except Exception:
+        return None
+    if df is None or df.empty:
+        return None
+    row = df.iloc[0]
+    return {
+        "narrative": _norm_text(row["NARRATIVE"]),
+        "filters_text": str(row["FILTERS_TEXT"] or ""),
+        "generated_at": row["GENERATED_AT"],
+        "label": slice_label(slice_dim, slice_value),
+    }
 
 
 # -----------------------------
 # Q&A pack + strict retention logic
 # -----------------------------
-def _df_tail_records(df: pd.DataFrame, n: int, sort_col: str, cols: Optional[List[str]] = None) -> List[Dict[str, Any]]:
-    if df is None or df.empty:
-        return []
-    d = df.copy()
-    if sort_col in d.columns:
-        d = d.sort_values(sort_col)
-    if cols:
-        keep = [c for c in cols if c in d.columns]
-        if keep:
-            d = d[keep]
-    return json.loads(d.tail(n).to_json(orient="records", date_format="iso"))
-
-
 def assess_pipeline_coverage(ratio: Optional[float], target_x: float = 3.0) -> str:
     if ratio is None or (isinstance(ratio, float) and pd.isna(ratio)):
         return "unknown"
@@ -655,111 +750,27 @@ def assess_pipeline_coverage(ratio: Optional[float], target_x: float = 3.0) -> s
     return "very high (validate denominator)"
 
 
-@st.cache_data(ttl=900, show_spinner=False)
+@invalidated_by("FCT_MRR", "ACCOUNTS", "SALES_REPS")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
 def retention_data_quality(
     start_date: date,
     end_date: date,
-    account_filter: str,
+    account_filter: AccountFilter,
     cohort_month: Optional[date],
     coverage_threshold_pct: float = 90.0,
 ) -> Dict[str, Any]:
-    if cohort_month is None:
-        return {
-            "cohort_accounts": None,
-            "next_month_accounts": None,
-            "next_month_coverage_pct": None,
-            "retention_interpretable": False,
-            "coverage_threshold_pct": float(coverage_threshold_pct),
-            "retention_note": "Retention cohort month not available for selected filters.",
-        }
-
-    cohort_month_str = str(cohort_month)
-
-    sql = f"""
-    with base as (
-        select
-            m.account_id,
-            m.month,
-            m.total_mrr
-        from {FCT_MRR_TBL} m
-        join {ACCOUNTS_TBL} a on a.account_id = m.account_id
-        {"left join " + REPS_TBL + " r on r.rep_id = a.owner_rep_id" if REPS_TBL else ""}
-        where m.month >= '{start_date}'
-          and m.month <= '{end_date}'
-          and {account_filter}
-    ),
-    cohort as (
-        select distinct account_id
-        from base
-        where month = to_date('{cohort_month_str}')
-          and total_mrr > 0
-    ),
-    nxt as (
-        select distinct account_id
-        from base
-        where month = dateadd(month, 1, to_date('{cohort_month_str}'))
-    )
-    select
-      (select count(*) from cohort) as cohort_accounts,
-      (select count(*) from nxt) as next_month_accounts,
-      round(100 * (select count(*) from nxt) / nullif((select count(*) from cohort), 0), 2) as next_month_coverage_pct
-    ;
-    """
-
-    try:
-        session = get_active_session()
-        df = session.sql(sql).to_pandas()
-        if df is None or df.empty:
-            raise RuntimeError("No rows returned from retention data-quality query.")
-
-        cohort_accounts = df.loc[0, "COHORT_ACCOUNTS"]
-        next_month_accounts = df.loc[0, "NEXT_MONTH_ACCOUNTS"]
-        cov = df.loc[0, "NEXT_MONTH_COVERAGE_PCT"]
-
-        interpretable = (cov is not None) and float(cov) >= float(coverage_threshold_pct)
-
-        note = (
-            "Retention is interpretable (next-month MRR coverage is high)."
-            if interpretable
-            else "Retention is NOT interpretable: next-month MRR appears incomplete/not loaded for the selected period."
-        )
-
-        return {
-            "cohort_accounts": int(cohort_accounts) if cohort_accounts is not None else None,
-            "next_month_accounts": int(next_month_accounts) if next_month_accounts is not None else None,
-            "next_month_coverage_pct": float(cov) if cov is not None else None,
-            "retention_interpretable": bool(interpretable),
-            "coverage_threshold_pct": float(coverage_threshold_pct),
-            "retention_note": note,
-        }
-
-    except Exception as e:
-        return {
-            "cohort_accounts": None,
-            "next_month_accounts": None,
-            "next_month_coverage_pct": None,
-            "retention_interpretable": False,
-            "coverage_threshold_pct": float(coverage_threshold_pct),
-            "retention_note": f"Retention data-quality check failed: {str(e)}",
-        }
+    return ENGINE.retention_data_quality(start_date, end_date, account_filter, cohort_month, coverage_threshold_pct)
 
 
-@st.cache_data(ttl=300, show_spinner=False)
+@invalidated_by(*TABLE_CANDIDATES)
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
 def build_qa_pack_json(
     start_d: date,
     end_d: date,
-    account_filter: str,
-    arr_latest: Optional[float],
-    nrr_latest: Optional[float],
-    grr_latest: Optional[float],
-    win_latest: Optional[float],
-    coverage_ratio: Optional[float],
-    arr_delta: Optional[float] = None,
-    win_delta: Optional[float] = None,
-    coverage_open: Optional[float] = None,
-    coverage_avg3: Optional[float] = None,
-    latest_ret_month: Optional[date] = None,
+    account_filter: AccountFilter,
+    kpis: KpiResult,
     pipeline_coverage_target_x: float = 3.0,
+    token_budget: Optional[int] = QA_PACK_TOKEN_BUDGET,
 ) -> str:
     arr_df_local = get_arr_trend(start_d, end_d, account_filter)
     ret_df_local = get_retention_trend(start_d, end_d, account_filter)
@@ -769,84 +780,58 @@ def build_qa_pack_json(
     move_df_local = get_mrr_movement_summary(start_d, end_d, account_filter)
     exp_df_local, con_df_local = get_top_mrr_movers(start_d, end_d, account_filter)
 
-    inferred_ret_month: Optional[date] = None
-    try:
-        if latest_ret_month is not None:
-            inferred_ret_month = latest_ret_month
-        elif ret_df_local is not None and not ret_df_local.empty and "MONTH" in ret_df_local.columns and "START_MRR" in ret_df_local.columns:
-            tmp = ret_df_local.copy()
-            tmp["MONTH"] = pd.to_datetime(tmp["MONTH"])
-            valid = tmp[tmp["START_MRR"] > 0]
-            if not valid.empty:
-                inferred_ret_month = pd.to_datetime(valid["MONTH"].max()).date()
-    except Exception:
-        inferred_ret_month = latest_ret_month
-
-    dq = retention_data_quality(start_d, end_d, account_filter, inferred_ret_month)
-
-    if coverage_open is None:
-        try:
-            coverage_open = float(coverage_df_local.iloc[0]["TOTAL_OPEN_PIPELINE"]) if (coverage_df_local is not None and not coverage_df_local.empty) else None
-        except Exception:
-            coverage_open = None
-
-    if coverage_avg3 is None:
-        try:
-            coverage_avg3 = float(coverage_df_local.iloc[0]["AVG_3M_CLOSED_REVENUE"]) if (coverage_df_local is not None and not coverage_df_local.empty) else None
-        except Exception:
-            coverage_avg3 = None
+    dq = retention_data_quality(start_d, end_d, account_filter, kpis.ret_month)
 
     pack: Dict[str, Any] = {
         "time_window": f"{start_d} to {end_d}",
         "filters": {
             "start_date": str(start_d),
             "end_date": str(end_d),
-            "retention_cohort_month": str(inferred_ret_month) if inferred_ret_month else None,
+            "retention_cohort_month": str(kpis.ret_month) if kpis.ret_month else None,
         },
         "benchmarks": {
             "pipeline_coverage_target_x": float(pipeline_coverage_target_x),
         },
-        "metrics": {
-            "arr_latest": arr_latest,
-            "arr_delta_mom": arr_delta,
-            "nrr_pct": nrr_latest,
-            "grr_pct": grr_latest,
-            "win_rate_pct": win_latest,
-            "win_rate_delta_mom": win_delta,
-            "pipeline_coverage_ratio_x": coverage_ratio,
-            "pipeline_coverage_assessment": assess_pipeline_coverage(coverage_ratio, pipeline_coverage_target_x),
-            "total_open_pipeline": coverage_open,
-            "avg_3m_closed_revenue": coverage_avg3,
-        },
-        "data_quality": dq,
+        "metrics": qa_pack.round_values({
+            "arr_latest": kpis.arr.latest,
+            "arr_delta_mom": kpis.arr.delta,
+            "nrr_pct": kpis.nrr.latest,
+            "grr_pct": kpis.grr.latest,
+            "win_rate_pct": kpis.win_rate.latest,
+            "win_rate_delta_mom": kpis.win_rate.delta,
+            "pipeline_coverage_ratio_x": kpis.coverage_ratio,
+            "pipeline_coverage_assessment": assess_pipeline_coverage(kpis.coverage_ratio, pipeline_coverage_target_x),
+            "total_open_pipeline": kpis.coverage_open,
+            "avg_3m_closed_revenue": kpis.coverage_avg3,
+        }),
+        "data_quality": qa_pack.round_values(dq),
         "series": {
-            "arr_trend_last_12": _df_tail_records(arr_df_local, 12, "MONTH", ["MONTH", "TOTAL_ARR"]),
-            "retention_last_12": _df_tail_records(ret_df_local, 12, "MONTH", ["MONTH", "START_MRR", "END_MRR", "NRR_PCT", "GRR_PCT"]),
-            "closed_rev_last_12": _df_tail_records(closed_df_local, 12, "CLOSE_MONTH", ["CLOSE_MONTH", "TOTAL_CLOSED_REVENUE", "WIN_RATE_PCT", "AVG_SALES_CYCLE_DAYS"]),
+            "arr_trend_last_12": qa_pack.columnar(arr_df_local, ["MONTH", "TOTAL_ARR"], "MONTH", tail=12),
+            "retention_last_12": qa_pack.columnar(
+                ret_df_local, ["MONTH", "START_MRR", "END_MRR", "NRR_PCT", "GRR_PCT"], "MONTH", tail=12
+            ),
+            "closed_rev_last_12": qa_pack.columnar(
+                closed_df_local,
+                ["CLOSE_MONTH", "TOTAL_CLOSED_REVENUE", "WIN_RATE_PCT", "AVG_SALES_CYCLE_DAYS"],
+                "CLOSE_MONTH",
+                tail=12,
+            ),
         },
         "pipeline": {
-            "coverage_row": json.loads(coverage_df_local.to_json(orient="records"))[:1] if coverage_df_local is not None and not coverage_df_local.empty else [],
-            "open_by_stage_top_8": (
-                json.loads(stage_df_local.sort_values("OPEN_PIPELINE", ascending=False).head(8).to_json(orient="records"))
-                if stage_df_local is not None and not stage_df_local.empty
-                else []
-            ),
+            "coverage_row": qa_pack.columnar(coverage_df_local, head=1),
+            "open_by_stage_top_8": qa_pack.columnar(stage_df_local, sort_col="OPEN_PIPELINE", ascending=False, head=8),
         },
         "mrr_movement": {
-            "movement_summary": json.loads(move_df_local.to_json(orient="records")) if move_df_local is not None and not move_df_local.empty else [],
-            "top_expansions": (
-                json.loads(exp_df_local.sort_values("MRR_DELTA", ascending=False).head(5).to_json(orient="records"))
-                if exp_df_local is not None and not exp_df_local.empty
-                else []
-            ),
-            "top_contractions": (
-                json.loads(con_df_local.sort_values("MRR_DELTA", ascending=True).head(5).to_json(orient="records"))
-                if con_df_local is not None and not con_df_local.empty
-                else []
-            ),
+            "movement_summary": qa_pack.columnar(move_df_local),
+            "top_expansions": qa_pack.columnar(exp_df_local, sort_col="MRR_DELTA", ascending=False, head=5),
+            "top_contractions": qa_pack.columnar(con_df_local, sort_col="MRR_DELTA", ascending=True, head=5),
         },
         "rules": {
             "grounding_rule": "Use ONLY fields in this JSON. If missing/null, say data not available.",
+            "format_rule": (
+                "Tables are {columns, rows}: each row lists values in column order. "
+                "Months are YYYY-MM. pack_notes lists sections trimmed to fit the prompt."
+            ),
             "retention_rule": (
                 "If data_quality.retention_interpretable is false, DO NOT interpret NRR/GRR as churn. "
                 "Say retention is not fully loaded/complete for the selected period."
@@ -858,13 +843,11 @@ def build_qa_pack_json(
         },
     }
 
-    return json.dumps(pack, default=str)
+    pack_json, _ = qa_pack.fit_to_budget(pack, token_budget)
+    return pack_json
 
 
-@st.cache_data(ttl=900, show_spinner=False)
-def cortex_analyst_answer(question: str, pack_json: str) -> str:
-    session = get_active_session()
-
+def analyst_prompt(question: str, pack_json: str) -> str:
     prompt = f"""
 You are a senior GTM analytics leader answering board-level questions.
 
@@ -915,37 +898,31 @@ JSON PACK:
 Question:
 {question}
 """
+    return prompt
 
-    sql = f"""
-    select AI_COMPLETE(
-        'mistral-large2',
-        $$ {prompt} $$
-    ) as RESPONSE;
-    """
 
-    try:
-        df = session.sql(sql).to_pandas()
-        if df is None or df.empty:
-            return (
-                "Answer:\nData not available for the selected period.\n\n"
-                "Evidence:\n- No response returned.\n- —\n- —\n\n"
-                "What I would check next:\n- Confirm Cortex is enabled and AI_COMPLETE returns output\n- Validate the data pack is non-empty\n- Retry with a narrower question\n\n"
-                "Confidence Level:\nLow — no response returned."
-            )
-        return _norm_text(df.iloc[0]["RESPONSE"])
-    except Exception as e:
+def analyst_fallback(error: Optional[Exception] = None) -> str:
+    if error is None:
         return (
-            "Answer:\nExecutive Q&A response unavailable.\n\n"
-            f"Evidence:\n- Error: {str(e)}\n- —\n- —\n\n"
-            "What I would check next:\n- Validate data pack integrity\n- Confirm retention data-quality query executes\n- Retry Cortex call\n\n"
-            "Confidence Level:\nLow — execution error."
+            "Answer:\nData not available for the selected period.\n\n"
+            "Evidence:\n- No response returned.\n- —\n- —\n\n"
+            "What I would check next:\n- Confirm Cortex is enabled and AI_COMPLETE returns output\n- Validate the data pack is non-empty\n- Retry with a narrower question\n\n"
+            "Confidence Level:\nLow — no response returned."
         )
+    return (
+        "Answer:\nExecutive Q&A response unavailable.\n\n"
+        f"Evidence:\n- Error: {str(error)}\n- —\n- —\n\n"
+        "What I would check next:\n- Validate data pack integrity\n- Confirm retention data-quality query executes\n- Retry Cortex call\n\n"
+        "Confidence Level:\nLow — execution error."
+    )
+
+
+def stream_analyst_answer(question: str, pack_json: str) -> Iterator[str]:
+    return stream_completion("analyst_qa", analyst_prompt(question, pack_json), pack_json, question, analyst_fallback)
 
 
 @st.cache_data(ttl=900, show_spinner=False)
 def cortex_agent_run(goal: str, pack_json: str) -> str:
-    session = get_active_session()
-
     prompt = f"""
 You are a GTM Analytics Agent. You will solve the user's goal using ONLY the JSON pack.
 
@@ -986,13 +963,9 @@ User goal:
 {goal}
 """
 
-    sql = f"""
-    select AI_COMPLETE('mistral-large2', $$ {prompt} $$) as RESPONSE;
-    """
-
     try:
-        df = session.sql(sql).to_pandas()
-        if df is None or df.empty:
+        text = cached_completion("agent", prompt, pack_json, goal)
+        if not text:
             return (
                 "Plan:\n1. —\n2. —\n3. —\n\n"
                 "Reasoning Chain:\nStep 1: —\nStep 2: —\nStep 3: —\n\n"
@@ -1000,7 +973,7 @@ User goal:
                 "Evidence:\n- —\n- —\n- —\n\n"
                 "Confidence Level:\nLow — no response returned."
             )
-        return _norm_text(df.iloc[0]["RESPONSE"])
+        return text
     except Exception as e:
         return (
             "Plan:\n1. —\n2. —\n3. —\n\n"
@@ -1012,69 +985,58 @@ User goal:
 
 
 # -----------------------------
-# Resolve tables
+# Header (the shell paints before any warehouse call)
 # -----------------------------
-tables = resolve_tables()
-
-missing_critical = [k for k in ["ACCOUNTS", "FCT_MRR", "FCT_PIPELINE"] if not tables.get(k)]
-if missing_critical:
-    st.error(
-        "Missing required tables to run this app. "
-        f"Could not find: {', '.join(missing_critical)}."
-    )
-    st.stop()
-
-ACCOUNTS_TBL = tables["ACCOUNTS"]
-REPS_TBL = tables.get("SALES_REPS")  # optional
-FCT_MRR_TBL = tables["FCT_MRR"]
-FCT_PIPELINE_TBL = tables["FCT_PIPELINE"]
-STAGE_HIST_TBL = tables.get("STAGE_HISTORY")  # optional
-SUPPORT_TICKETS_TBL = tables.get("SUPPORT_TICKETS")  # optional
-HEALTH_TBL = tables.get("HEALTH_SNAPSHOT")  # optional
+st.title(APP_TITLE)
+st.caption("Revenue, retention, pipeline, and customer health — powered by your Snowflake marts.")
 
 
 # -----------------------------
-# Load filter domains
+# Resolve tables + load filter domains
 # -----------------------------
-@st.cache_data(ttl=1800, show_spinner=False)
-def get_filter_domains() -> Dict[str, List[str]]:
-    df = run_sql(
-        f"""
-        select
-            distinct
-            segment,
-            region,
-            industry
-        from {ACCOUNTS_TBL}
-        """
-    )
-    domains = {
-        "SEGMENT": sorted([x for x in df["SEGMENT"].dropna().unique().tolist()]) if "SEGMENT" in df.columns else [],
-        "REGION": sorted([x for x in df["REGION"].dropna().unique().tolist()]) if "REGION" in df.columns else [],
-        "INDUSTRY": sorted([x for x in df["INDUSTRY"].dropna().unique().tolist()]) if "INDUSTRY" in df.columns else [],
-    }
+@st.cache_resource(show_spinner=False)
+def get_snapshot_store() -> SnapshotStore:
+    return snapshot_store_from_env()
 
-    if REPS_TBL:
-        r = run_sql(f"select distinct team, region as rep_region from {REPS_TBL}")
-        domains["REP_TEAM"] = sorted([x for x in r["TEAM"].dropna().unique().tolist()]) if "TEAM" in r.columns else []
-        domains["REP_REGION"] = sorted([x for x in r["REP_REGION"].dropna().unique().tolist()]) if "REP_REGION" in r.columns else []
-    else:
-        domains["REP_TEAM"] = []
-        domains["REP_REGION"] = []
 
-    return domains
+@invalidated_by("ACCOUNTS", "SALES_REPS")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_filter_domains(t: DatasetTables) -> Dict[str, List[str]]:
+    return MetricsEngine(run_sql, t).filter_domains()
 
 
-@st.cache_data(ttl=900, show_spinner=False)
-def get_mrr_date_bounds() -> Tuple[date, date]:
-    df = run_sql(f"select min(month) as min_month, max(month) as max_month from {FCT_MRR_TBL}")
-    if df.empty or pd.isna(df.loc[0, "MIN_MONTH"]) or pd.isna(df.loc[0, "MAX_MONTH"]):
-        return date(2023, 1, 1), date.today()
-    return pd.to_datetime(df.loc[0, "MIN_MONTH"]).date(), pd.to_datetime(df.loc[0, "MAX_MONTH"]).date()
+@invalidated_by("FCT_MRR")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_mrr_date_bounds(t: DatasetTables) -> Tuple[date, date]:
+    return MetricsEngine(run_sql, t).date_bounds()
+
 
+def load_startup_snapshot() -> StartupSnapshot:
+    # Tables, filter domains and date bounds from the warehouse (through the cached getters)
+    check_data_versions()
+    resolved = resolve_tables()
+    missing_critical = [k for k in REQUIRED_TABLES if not resolved.get(k)]
+    if missing_critical:
+        st.error(
+            "Missing required tables to run this app. "
+            f"Could not find: {', '.join(missing_critical)}."
+        )
+        st.stop()
+    t = DatasetTables.from_resolved(resolved)
+    lo, hi = get_mrr_date_bounds(t)
+    return StartupSnapshot(tables=resolved, domains=get_filter_domains(t), min_month=lo, max_month=hi)
 
-domains = get_filter_domains()
-min_month, max_month = get_mrr_date_bounds()
+
+# The sidebar paints from the last run's snapshot; it is checked against the warehouse below
+startup_snapshot = get_snapshot_store().load()
+snapshot_checked = startup_snapshot is None
+if startup_snapshot is None:
+    startup_snapshot = load_startup_snapshot()
+    get_snapshot_store().save(startup_snapshot)
+PROFILE.mark("shell + startup snapshot")
+
+domains = startup_snapshot.domains
+min_month, max_month = startup_snapshot.min_month, startup_snapshot.max_month
 
 
 # -----------------------------
@@ -1116,564 +1078,314 @@ st.sidebar.markdown(
     help="All metrics run on Snowflake tables you already built.",
 )
 
+if not snapshot_checked:
+    # Same cached getters as a cold start; a changed table / domain repaints with fresh defaults
+    current_snapshot = load_startup_snapshot()
+    if current_snapshot != startup_snapshot:
+        get_snapshot_store().save(current_snapshot)
+        st.rerun()
+PROFILE.mark("table metadata + filter domains")
+
+tables = startup_snapshot.tables
+ACCOUNTS_TBL = tables["ACCOUNTS"]
+REPS_TBL = tables.get("SALES_REPS")  # optional
+FCT_MRR_TBL = tables["FCT_MRR"]
+FCT_PIPELINE_TBL = tables["FCT_PIPELINE"]
+STAGE_HIST_TBL = tables.get("STAGE_HISTORY")  # optional
+SUPPORT_TICKETS_TBL = tables.get("SUPPORT_TICKETS")  # optional
+HEALTH_TBL = tables.get("HEALTH_SNAPSHOT")  # optional
+MRR_ROLLUP_TBL = tables.get("MRR_DIM_ROLLUP")  # optional (built from FCT_MRR_COMPLETE)
+DATASET_TABLES = DatasetTables.from_resolved(tables)
+
 
 # -----------------------------
-# Build a shared filter clause
+# Build a shared filter (canonical cache key + bind-parameter SQL)
 # -----------------------------
-def build_account_filter_sql(a_alias: str = "a", r_alias: str = "r") -> str:
-    clauses = []
+ACCOUNT_FILTER = AccountFilter.from_selections(
+    segments=segments,
+    regions=regions,
+    industries=industries,
+    rep_teams=rep_teams if REPS_TBL else None,
+    rep_regions=rep_regions if REPS_TBL else None,
+)
 
-    if segments:
-        clauses.append(f"{a_alias}.segment in ({sql_quote_list(segments)})")
-    if regions:
-        clauses.append(f"{a_alias}.region in ({sql_quote_list(regions)})")
-    if industries:
-        clauses.append(f"{a_alias}.industry in ({sql_quote_list(industries)})")
 
-    if REPS_TBL:
-        if rep_teams:
-            clauses.append(f"{r_alias}.team in ({sql_quote_list(rep_teams)})")
-        if rep_regions:
-            clauses.append(f"{r_alias}.region in ({sql_quote_list(rep_regions)})")
+@st.cache_resource(show_spinner=False)
+def get_filter_usage_log() -> Optional[FilterUsageLog]:
+    if not FILTER_USAGE_LOG:
+        return None
+    try:
+        return FilterUsageLog(get_backend())
+    except Exception:
+        return None
 
-    return " and ".join(clauses) if clauses else "1=1"
 
+def record_filter_usage(account_filter: AccountFilter) -> None:
+    # Once per new segment / region selection per session, off the render path
+    key = json.dumps([account_filter.segments, account_filter.regions])
+    if st.session_state.get("filter_usage_key") == key:
+        return
+    st.session_state["filter_usage_key"] = key
+    log = get_filter_usage_log()
+    if log is None:
+        return
 
-ACCOUNT_FILTER = build_account_filter_sql()
+    def _record():
+        try:
+            log.record(account_filter)
+        except Exception:
+            pass
+
+    threading.Thread(target=_record, name="gtm-filter-usage", daemon=True).start()
+
+
+record_filter_usage(ACCOUNT_FILTER)
 
 
 # -----------------------------
-# Core Metric Queries
+# Core Metric Queries (gtm_metrics engine; the getters add st.cache_data + invalidation)
 # -----------------------------
-@st.cache_data(ttl=600, show_spinner=False)
-def get_arr_trend(start_d: date, end_d: date, account_filter: str) -> pd.DataFrame:
-    sql = f"""
-    with base as (
-        select
-            m.account_id,
-            m.month,
-            m.total_mrr
-        from {FCT_MRR_TBL} m
-        join {ACCOUNTS_TBL} a
-            on a.account_id = m.account_id
-        {"left join " + REPS_TBL + " r on r.rep_id = a.owner_rep_id" if REPS_TBL else ""}
-        where m.month >= '{start_d}'
-          and m.month <= '{end_d}'
-          and {account_filter}
-    )
-    select
-        month,
-        round(sum(total_mrr) * 12, 2) as total_arr
-    from base
-    group by month
-    order by month;
-    """
-    return run_sql(sql)
+class AppMetricsEngine(MetricsEngine):
+    # Derived datasets share the cached cube / rollup frames across getters and reruns
+    def mrr_cube(self, start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+        return get_mrr_cube(start_d, end_d, account_filter)
 
+    def mrr_rollup_monthly(self, start_d: date, end_d: date, account_filter: AccountFilter) -> Optional[pd.DataFrame]:
+        return get_mrr_rollup_monthly(start_d, end_d, account_filter)
 
-@st.cache_data(ttl=600, show_spinner=False)
-def get_retention_trend(start_d: date, end_d: date, account_filter: str) -> pd.DataFrame:
-    sql = f"""
-    with base as (
-        select
-            m.account_id,
-            m.month,
-            m.total_mrr
-        from {FCT_MRR_TBL} m
-        join {ACCOUNTS_TBL} a
-            on a.account_id = m.account_id
-        {"left join " + REPS_TBL + " r on r.rep_id = a.owner_rep_id" if REPS_TBL else ""}
-        where m.month >= '{start_d}'
-          and m.month <= '{end_d}'
-          and {account_filter}
-    ),
-    maxm as (
-        select max(month) as max_month from base
-    ),
-    cur as (
-        select b.*
-        from base b
-        cross join maxm
-        where b.month < maxm.max_month
-          and b.total_mrr > 0
-    ),
-    nxt as (
-        select account_id, month, total_mrr from base
-    )
-    select
-        cur.month as month,
-        round(sum(cur.total_mrr), 2) as start_mrr,
-        round(sum(coalesce(nxt.total_mrr, 0)), 2) as end_mrr,
-        round(sum(least(coalesce(nxt.total_mrr, 0), cur.total_mrr)), 2) as retained_mrr,
-        round(100 * sum(coalesce(nxt.total_mrr, 0)) / nullif(sum(cur.total_mrr), 0), 2) as nrr_pct,
-        round(100 * sum(least(coalesce(nxt.total_mrr, 0), cur.total_mrr)) / nullif(sum(cur.total_mrr), 0), 2) as grr_pct
-    from cur
-    left join nxt
-        on nxt.account_id = cur.account_id
-       and nxt.month = dateadd(month, 1, cur.month)
-    group by cur.month
-    order by cur.month;
-    """
-    return run_sql(sql)
 
+ENGINE = AppMetricsEngine(run_sql, DATASET_TABLES)
 
-@st.cache_data(ttl=600, show_spinner=False)
-def get_closed_revenue_monthly(start_d: date, end_d: date, account_filter: str) -> pd.DataFrame:
-    sql = f"""
-    with base as (
-        select
-            p.*,
-            date_trunc('month', p.close_date) as close_month
-        from {FCT_PIPELINE_TBL} p
-        join {ACCOUNTS_TBL} a
-            on a.account_id = p.account_id
-        {"left join " + REPS_TBL + " r on r.rep_id = p.rep_id" if REPS_TBL else ""}
-        where p.is_closed = true
-          and p.close_date is not null
-          and date_trunc('month', p.close_date) >= '{start_d}'
-          and date_trunc('month', p.close_date) <= '{end_d}'
-          and {account_filter}
-    )
-    select
-        close_month,
-        round(sum(amount), 2) as total_closed_revenue,
-        round(sum(case when is_won then amount else 0 end), 2) as total_won_revenue,
-        round(100 * sum(case when is_won then 1 else 0 end) / nullif(count(*), 0), 2) as win_rate_pct,
-        round(avg(datediff(day, created_date, close_date)), 2) as avg_sales_cycle_days
-    from base
-    group by close_month
-    order by close_month;
-    """
-    return run_sql(sql)
 
+@invalidated_by("FCT_MRR", "ACCOUNTS", "SALES_REPS")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_mrr_cube(start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+    return ENGINE.query_mrr_cube(start_d, end_d, account_filter)
 
-@st.cache_data(ttl=600, show_spinner=False)
-def get_pipeline_coverage(start_d: date, end_d: date, account_filter: str) -> pd.DataFrame:
-    sql = f"""
-    with open_pipe as (
-        select
-            round(sum(p.amount), 2) as total_open_pipeline
-        from {FCT_PIPELINE_TBL} p
-        join {ACCOUNTS_TBL} a
-            on a.account_id = p.account_id
-        {"left join " + REPS_TBL + " r on r.rep_id = p.rep_id" if REPS_TBL else ""}
-        where p.is_closed = false
-          and {account_filter}
-    ),
-    closed as (
-        select
-            date_trunc('month', p.close_date) as close_month,
-            round(sum(p.amount), 2) as total_closed_revenue
-        from {FCT_PIPELINE_TBL} p
-        join {ACCOUNTS_TBL} a
-            on a.account_id = p.account_id
-        {"left join " + REPS_TBL + " r on r.rep_id = p.rep_id" if REPS_TBL else ""}
-        where p.is_closed = true
-          and p.close_date is not null
-          and date_trunc('month', p.close_date) >= '{start_d}'
-          and date_trunc('month', p.close_date) <= '{end_d}'
-          and {account_filter}
-        group by 1
-    ),
-    last3 as (
-        select *
-        from closed
-        order by close_month desc
-        limit 3
-    ),
-    avg3 as (
-        select avg(total_closed_revenue) as avg_3m_closed_revenue from last3
-    )
-    select
-        o.total_open_pipeline,
-        a.avg_3m_closed_revenue,
-        round(o.total_open_pipeline / nullif(a.avg_3m_closed_revenue, 0), 2) as pipeline_coverage_ratio
-    from open_pipe o
-    cross join avg3 a;
-    """
-    return run_sql(sql)
-
-
-@st.cache_data(ttl=600, show_spinner=False)
-def get_open_pipeline_by_stage(account_filter: str) -> pd.DataFrame:
-    sql = f"""
-    select
-        current_stage,
-        round(sum(amount), 2) as open_pipeline,
-        round(sum(amount * probability), 2) as weighted_pipeline,
-        count(*) as opp_count
-    from {FCT_PIPELINE_TBL} p
-    join {ACCOUNTS_TBL} a on a.account_id = p.account_id
-    {"left join " + REPS_TBL + " r on r.rep_id = p.rep_id" if REPS_TBL else ""}
-    where p.is_closed = false
-      and {account_filter}
-    group by current_stage
-    order by open_pipeline desc;
-    """
-    return run_sql(sql)
-
-
-@st.cache_data(ttl=600, show_spinner=False)
-def get_mrr_account_month(start_d: date, end_d: date, account_filter: str) -> pd.DataFrame:
-    sql = f"""
-    select
-        m.account_id,
-        m.month,
-        round(m.total_mrr, 2) as total_mrr
-    from {FCT_MRR_TBL} m
-    join {ACCOUNTS_TBL} a on a.account_id = m.account_id
-    {"left join " + REPS_TBL + " r on r.rep_id = a.owner_rep_id" if REPS_TBL else ""}
-    where m.month >= '{start_d}'
-      and m.month <= '{end_d}'
-      and {account_filter}
-    order by m.account_id, m.month;
-    """
-    return run_sql(sql)
 
+@invalidated_by("MRR_DIM_ROLLUP")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_mrr_rollup_monthly(start_d: date, end_d: date, account_filter: AccountFilter) -> Optional[pd.DataFrame]:
+    return ENGINE.query_mrr_rollup_monthly(start_d, end_d, account_filter)
 
-@st.cache_data(ttl=600, show_spinner=False)
-def get_mrr_movement_summary(start_d: date, end_d: date, account_filter: str) -> pd.DataFrame:
-    sql = f"""
-    with base as (
-        select
-            m.account_id,
-            m.month,
-            m.total_mrr
-        from {FCT_MRR_TBL} m
-        join {ACCOUNTS_TBL} a on a.account_id = m.account_id
-        {"left join " + REPS_TBL + " r on r.rep_id = a.owner_rep_id" if REPS_TBL else ""}
-        where m.month >= '{start_d}'
-          and m.month <= '{end_d}'
-          and {account_filter}
-    ),
-    lagged as (
-        select
-            account_id,
-            month,
-            total_mrr,
-            lag(total_mrr) over (partition by account_id order by month) as prev_mrr
-        from base
-    ),
-    labeled as (
-        select
-            *,
-            case
-                when prev_mrr is null and total_mrr > 0 then 'New'
-                when prev_mrr > 0 and total_mrr = 0 then 'Churn'
-                when total_mrr > prev_mrr then 'Expansion'
-                when total_mrr < prev_mrr then 'Contraction'
-                else 'Flat'
-            end as movement_type
-        from lagged
-    )
-    select
-        movement_type,
-        count(*) as rows_count,
-        round(sum(total_mrr - coalesce(prev_mrr, 0)), 2) as net_mrr_change
-    from labeled
-    group by movement_type
-    order by movement_type;
-    """
-    return run_sql(sql)
 
+@invalidated_by("FCT_MRR", "ACCOUNTS", "SALES_REPS", "MRR_DIM_ROLLUP")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_arr_trend(start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+    return ENGINE.arr_trend(start_d, end_d, account_filter)
 
-@st.cache_data(ttl=600, show_spinner=False)
-def get_top_mrr_movers(start_d: date, end_d: date, account_filter: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    sql = f"""
-    with base as (
-        select
-            m.account_id,
-            m.month,
-            m.total_mrr
-        from {FCT_MRR_TBL} m
-        join {ACCOUNTS_TBL} a on a.account_id = m.account_id
-        {"left join " + REPS_TBL + " r on r.rep_id = a.owner_rep_id" if REPS_TBL else ""}
-        where m.month >= '{start_d}'
-          and m.month <= '{end_d}'
-          and {account_filter}
-    ),
-    maxm as (select max(month) as max_month from base),
-    prevm as (select dateadd(month, -1, max_month) as prev_month from maxm),
-    last2 as (
-        select b.*
-        from base b
-        join maxm on b.month in (maxm.max_month, dateadd(month, -1, maxm.max_month))
-    ),
-    pivoted as (
-        select
-            account_id,
-            max(case when month = (select max_month from maxm) then total_mrr end) as mrr_curr,
-            max(case when month = (select prev_month from prevm) then total_mrr end) as mrr_prev
-        from last2
-        group by account_id
-    ),
-    scored as (
-        select
-            p.account_id,
-            round(coalesce(p.mrr_curr,0),2) as mrr_curr,
-            round(coalesce(p.mrr_prev,0),2) as mrr_prev,
-            round(coalesce(p.mrr_curr,0) - coalesce(p.mrr_prev,0),2) as mrr_delta
-        from pivoted p
-    ),
-    enriched as (
-        select
-            s.*,
-            a.account_name,
-            a.segment,
-            a.region,
-            a.industry
-        from scored s
-        join {ACCOUNTS_TBL} a on a.account_id = s.account_id
-    )
-    select * from enriched;
-    """
-    df = run_sql(sql)
-    if df.empty:
-        return pd.DataFrame(), pd.DataFrame()
 
-    expansions = df.sort_values("MRR_DELTA", ascending=False).head(10)
-    contractions = df.sort_values("MRR_DELTA", ascending=True).head(10)
-    return expansions, contractions
+@invalidated_by("FCT_MRR", "ACCOUNTS", "SALES_REPS", "MRR_DIM_ROLLUP")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_retention_trend(start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+    return ENGINE.retention_trend(start_d, end_d, account_filter)
+
+
+@invalidated_by("FCT_PIPELINE", "ACCOUNTS", "SALES_REPS")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_closed_revenue_monthly(start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+    return ENGINE.closed_revenue_monthly(start_d, end_d, account_filter)
+
+
+@invalidated_by("FCT_PIPELINE", "FCT_MRR", "ACCOUNTS", "SALES_REPS", "MRR_DIM_ROLLUP")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_pipeline_coverage(start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+    return ENGINE.pipeline_coverage(start_d, end_d, account_filter)
+
+
+@invalidated_by("FCT_PIPELINE", "ACCOUNTS", "SALES_REPS")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_open_pipeline_by_stage(account_filter: AccountFilter) -> pd.DataFrame:
+    return ENGINE.open_pipeline_by_stage(account_filter)
+
+
+@invalidated_by("FCT_MRR", "MRR_DIM_ROLLUP", "ACCOUNTS", "SALES_REPS")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_mrr_movement_summary(start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+    return ENGINE.mrr_movement_summary(start_d, end_d, account_filter)
+
+
+@invalidated_by("FCT_MRR", "ACCOUNTS", "SALES_REPS")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_top_mrr_movers(start_d: date, end_d: date, account_filter: AccountFilter) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    return ENGINE.top_mrr_movers(start_d, end_d, account_filter)
 
 
 # -----------------------------
 # Health (use existing table if present, else compute fallback)
 # -----------------------------
-@st.cache_data(ttl=600, show_spinner=False)
-def get_health_snapshot(start_d: date, end_d: date, account_filter: str) -> pd.DataFrame:
-    if HEALTH_TBL:
-        try:
-            sql = f"""
-            with h as (
-                select *
-                from {HEALTH_TBL}
-            ),
-            scoped as (
-                select *
-                from h
-                where month >= '{start_d}' and month <= '{end_d}'
-            ),
-            maxm as (select max(month) as max_month from scoped)
-            select
-                s.*
-            from scoped s
-            join maxm on s.month = maxm.max_month;
-            """
-            df = run_sql(sql)
-            if not df.empty:
-                return df
-        except Exception:
-            pass
+@invalidated_by("HEALTH_SNAPSHOT", "FCT_MRR", "SUPPORT_TICKETS", "ACCOUNTS", "SALES_REPS")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_health_snapshot(start_d: date, end_d: date, account_filter: AccountFilter) -> pd.DataFrame:
+    return ENGINE.health_snapshot(start_d, end_d, account_filter)
+
+
+# -----------------------------
+# Stage dynamics (Pipeline view)
+# -----------------------------
+@invalidated_by("STAGE_HISTORY", "FCT_PIPELINE", "ACCOUNTS", "SALES_REPS")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_stage_durations(account_filter: AccountFilter) -> pd.DataFrame:
+    return ENGINE.stage_durations(account_filter)
+
+
+@invalidated_by("STAGE_HISTORY", "FCT_PIPELINE", "ACCOUNTS", "SALES_REPS")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_stage_conversion(account_filter: AccountFilter) -> pd.DataFrame:
+    return ENGINE.stage_conversion(account_filter)
 
-    ticket_join = ""
-    ticket_cols = "0 as ticket_cnt_90d"
-    ticket_ref = "0"
-    if SUPPORT_TICKETS_TBL:
-        ticket_join = f"""
-        left join (
+
+# -----------------------------
+# Account search (Account Explorer view)
+# -----------------------------
+@invalidated_by("ACCOUNTS")
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def search_accounts(term: str, limit: int = ACCOUNT_SEARCH_LIMIT) -> pd.DataFrame:
+    sql, params = account_search_sql(ACCOUNTS_TBL, term, limit)
+    return run_sql(sql, tuple(params))
+
+
+# -----------------------------
+# Account drill-down (Account Explorer view)
+# -----------------------------
+@st.cache_resource(show_spinner=False)
+def get_account_bundle_cache() -> AccountBundleCache:
+    # One LRU per server process; the bundles are warehouse data, not per-user state.
+    # Emptied when a table behind the bundles changes; the TTL is a backstop
+    cache = AccountBundleCache(capacity=ACCOUNT_BUNDLE_CACHE_SIZE, ttl_s=CACHE_MAX_AGE_S)
+    tables = [t for d in ("FCT_MRR", "FCT_PIPELINE", "SUPPORT_TICKETS") for t in TABLE_CANDIDATES[d]]
+    get_version_tracker().register("account_bundles", tables, cache.clear)
+    return cache
+
+
+def fetch_account_bundles(account_ids: List[str]) -> Dict[str, AccountBundle]:
+    # One `account_id in (...)` query per dataset for the whole batch (fanned out together),
+    # split per account client-side. Opportunities / tickets keep the newest 200 per account.
+    out: Dict[str, AccountBundle] = {}
+    for i in range(0, len(account_ids), ACCOUNT_BATCH_CHUNK):
+        chunk = tuple(sorted(set(account_ids[i:i + ACCOUNT_BATCH_CHUNK])))
+        in_list = placeholders(len(chunk))
+        mrr_sql = f"""
+        select account_id, month, total_mrr
+        from {FCT_MRR_TBL}
+        where account_id in ({in_list})
+        order by account_id, month;
+        """
+        opp_sql = f"""
+        select
+            account_id,
+            opp_id,
+            created_date,
+            close_date,
+            current_stage,
+            probability,
+            amount,
+            is_closed,
+            is_won
+        from {FCT_PIPELINE_TBL}
+        where account_id in ({in_list})
+        qualify row_number() over (partition by account_id order by created_date desc) <= 200
+        order by account_id, created_date desc;
+        """
+        tasks = {
+            "mrr": lambda: run_sql(mrr_sql, chunk),
+            "opportunities": lambda: run_sql(opp_sql, chunk),
+        }
+        if SUPPORT_TICKETS_TBL:
+            t_sql = f"""
             select
                 account_id,
-                count(*) as ticket_cnt_90d
+                ticket_id,
+                created_date,
+                status,
+                priority,
+                category,
+                subject
             from {SUPPORT_TICKETS_TBL}
-            where created_date >= dateadd(day, -90, (select max(month) from base))
-            group by account_id
-        ) t on t.account_id = b.account_id
-        """
-        ticket_cols = "coalesce(t.ticket_cnt_90d,0) as ticket_cnt_90d"
-        ticket_ref = "coalesce(t.ticket_cnt_90d,0)"
+            where account_id in ({in_list})
+            qualify row_number() over (partition by account_id order by created_date desc) <= 200
+            order by account_id, created_date desc;
+            """
+            tasks["tickets"] = lambda: run_sql(t_sql, chunk)
+        results, _ = run_concurrent(tasks, thread_init=_script_ctx_initializer())
+
+        mrr = results["mrr"]
+        if mrr is not None and not mrr.empty:
+            mrr["TOTAL_MRR"] = pd.to_numeric(mrr["TOTAL_MRR"], errors="coerce").fillna(0.0).round(2)
+        mrr_by = split_by_account(mrr, chunk)
+        opps_by = split_by_account(results["opportunities"], chunk)
+        tickets_by = split_by_account(results.get("tickets"), chunk)
+        for account_id in chunk:
+            out[account_id] = AccountBundle(account_id, mrr_by[account_id], opps_by[account_id], tickets_by[account_id])
+    return out
 
-    sql = f"""
-    with base as (
-        select
-            m.account_id,
-            m.month,
-            m.total_mrr
-        from {FCT_MRR_TBL} m
-        join {ACCOUNTS_TBL} a on a.account_id = m.account_id
-        {"left join " + REPS_TBL + " r on r.rep_id = a.owner_rep_id" if REPS_TBL else ""}
-        where m.month >= '{start_d}'
-          and m.month <= '{end_d}'
-          and {account_filter}
-    ),
-    maxm as (select max(month) as max_month from base),
-    latest as (
-        select
-            b.account_id,
-            b.month,
-            b.total_mrr,
-            lag(b.total_mrr) over (partition by b.account_id order by b.month) as prev_mrr,
-            avg(b.total_mrr) over (partition by b.account_id order by b.month rows between 2 preceding and current row) as mrr_avg_3m
-        from base b
-    ),
-    snap as (
-        select *
-        from latest
-        join maxm on latest.month = maxm.max_month
-    ),
-    enriched as (
-        select
-            b.account_id,
-            a.account_name,
-            a.segment,
-            a.region,
-            a.industry,
-            round(b.total_mrr,2) as total_mrr,
-            round(coalesce(b.prev_mrr,0),2) as prev_mrr,
-            round((b.total_mrr - coalesce(b.prev_mrr,0)) / nullif(coalesce(b.prev_mrr,0),0), 4) as mom_mrr_pct,
-            round(b.mrr_avg_3m,2) as mrr_avg_3m
-        from snap b
-        join {ACCOUNTS_TBL} a on a.account_id = b.account_id
-    )
-    select
-        e.*,
-        {ticket_cols},
-        greatest(0, least(100,
-            70
-            + case when e.total_mrr > e.prev_mrr then 15 when e.total_mrr < e.prev_mrr then -15 else 0 end
-            + case when e.prev_mrr > 0 and e.total_mrr = 0 then -50 else 0 end
-            + case when {ticket_ref} >= 8 then -20
-                   when {ticket_ref} >= 4 then -10
-                   else 0 end
-        )) as health_score,
-        case
-            when e.prev_mrr > 0 and e.total_mrr = 0 then 'Lost'
-            when e.total_mrr = 0 and e.prev_mrr = 0 then 'Stable'
-            when {ticket_ref} >= 8 then 'High Risk'
-            when e.total_mrr < e.prev_mrr then 'At Risk'
-            when e.total_mrr > e.prev_mrr then 'Growing'
-            else 'Stable'
-        end as health_status
-    from enriched e
-    {ticket_join}
-    ;
-    """
-    return run_sql(sql)
 
+def get_account_bundles(account_ids: List[str]) -> Dict[str, AccountBundle]:
+    return get_account_bundle_cache().get_or_fetch_many(account_ids, fetch_account_bundles)
 
-# -----------------------------
-# Header
-# -----------------------------
-st.title(APP_TITLE)
-st.caption("Revenue, retention, pipeline, and customer health — powered by your Snowflake marts.")
 
+def get_account_bundle(account_id: str) -> AccountBundle:
+    return get_account_bundles([account_id])[account_id]
 
-# Pull datasets (single source of truth per tab)
-arr_df = get_arr_trend(start_date, end_date, ACCOUNT_FILTER)
-ret_df = get_retention_trend(start_date, end_date, ACCOUNT_FILTER)
-closed_df = get_closed_revenue_monthly(start_date, end_date, ACCOUNT_FILTER)
-coverage_df = get_pipeline_coverage(start_date, end_date, ACCOUNT_FILTER)
-open_stage_df = get_open_pipeline_by_stage(ACCOUNT_FILTER)
 
+def prefetch_account_explorer(term: str) -> None:
+    # Warm the search results and the drill-down of the account the selectbox opens on
+    matches = search_accounts(term)
+    if matches is not None and not matches.empty:
+        get_account_bundle(str(matches["ACCOUNT_ID"].iloc[0]))
 
-# Professional month selection logic (latest valid data)
-if not arr_df.empty and "TOTAL_ARR" in arr_df.columns and "MONTH" in arr_df.columns:
-    arr_valid = arr_df[arr_df["TOTAL_ARR"] > 0]
-    latest_arr_month = pd.to_datetime(arr_valid["MONTH"].max()).date() if not arr_valid.empty else None
-else:
-    latest_arr_month = None
 
-if not ret_df.empty and "START_MRR" in ret_df.columns and "MONTH" in ret_df.columns:
-    ret_valid = ret_df[ret_df["START_MRR"] > 0]
-    latest_ret_month = pd.to_datetime(ret_valid["MONTH"].max()).date() if not ret_valid.empty else None
-else:
-    latest_ret_month = None
+# -----------------------------
+# Data quality checks (Data Quality view)
+# -----------------------------
+@invalidated_by(*TABLE_CANDIDATES)
+@st.cache_data(ttl=CACHE_MAX_AGE_S, show_spinner=False)
+def get_data_quality_checks() -> List[DataQualityCheck]:
+    return ENGINE.data_quality_checks()
 
-if not closed_df.empty and "TOTAL_CLOSED_REVENUE" in closed_df.columns and "CLOSE_MONTH" in closed_df.columns:
-    close_valid = closed_df[closed_df["TOTAL_CLOSED_REVENUE"] > 0]
-    latest_close_month = pd.to_datetime(close_valid["CLOSE_MONTH"].max()).date() if not close_valid.empty else None
-else:
-    latest_close_month = None
-
-
-# ARR latest/prev/delta
-arr_latest = None
-arr_prev = None
-arr_delta = None
-
-if arr_df is not None and not arr_df.empty and "MONTH" in arr_df.columns and "TOTAL_ARR" in arr_df.columns:
-    arr_tmp = arr_df.copy()
-    arr_tmp["MONTH"] = pd.to_datetime(arr_tmp["MONTH"])
-    arr_valid = arr_tmp[arr_tmp["TOTAL_ARR"] > 0]
-    if not arr_valid.empty:
-        arr_valid = arr_valid.sort_values("MONTH")
-        latest_arr_ts = arr_valid["MONTH"].max()
-        arr_latest = float(arr_valid[arr_valid["MONTH"] == latest_arr_ts]["TOTAL_ARR"].iloc[0])
-        if len(arr_valid) >= 2:
-            arr_prev = float(arr_valid.iloc[-2]["TOTAL_ARR"])
-            arr_delta = arr_latest - arr_prev
-
-
-# Retention latest/prev/delta (+ latest_start_mrr)
-latest_start_mrr = None
-if not ret_df.empty and "MONTH" in ret_df.columns and "START_MRR" in ret_df.columns and "NRR_PCT" in ret_df.columns and "GRR_PCT" in ret_df.columns:
-    tmp = ret_df.copy()
-    tmp["MONTH"] = pd.to_datetime(tmp["MONTH"])
-    ret_valid = tmp[tmp["START_MRR"] > 0]
-    if not ret_valid.empty:
-        latest_ret_ts = ret_valid["MONTH"].max()
-        ret_slice = ret_valid[ret_valid["MONTH"] == latest_ret_ts]
-        nrr_latest = float(ret_slice.iloc[0]["NRR_PCT"])
-        grr_latest = float(ret_slice.iloc[0]["GRR_PCT"])
-        latest_start_mrr = float(ret_slice.iloc[0]["START_MRR"])
-
-        ret_history = ret_valid[ret_valid["MONTH"] <= latest_ret_ts].sort_values("MONTH")
-        if len(ret_history) >= 2:
-            nrr_prev = float(ret_history.iloc[-2]["NRR_PCT"])
-            grr_prev = float(ret_history.iloc[-2]["GRR_PCT"])
-        else:
-            nrr_prev = None
-            grr_prev = None
-    else:
-        nrr_latest = None
-        nrr_prev = None
-        grr_latest = None
-        grr_prev = None
-else:
-    nrr_latest = None
-    nrr_prev = None
-    grr_latest = None
-    grr_prev = None
 
+def _script_ctx_initializer():
+    # Worker threads need the script run context so st.cache_data works off the main thread
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    except Exception:
+        return None
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+
+    def _init():
+        import threading
+        add_script_run_ctx(threading.current_thread(), ctx)
 
-# Win rate latest/prev/delta
-win_latest = None
-win_prev = None
-win_delta = None
+    return _init
 
-if closed_df is not None and not closed_df.empty and "CLOSE_MONTH" in closed_df.columns and "TOTAL_CLOSED_REVENUE" in closed_df.columns and "WIN_RATE_PCT" in closed_df.columns:
-    close_tmp = closed_df.copy()
-    close_tmp["CLOSE_MONTH"] = pd.to_datetime(close_tmp["CLOSE_MONTH"])
-    close_valid = close_tmp[close_tmp["TOTAL_CLOSED_REVENUE"] > 0]
-    if not close_valid.empty:
-        close_valid = close_valid.sort_values("CLOSE_MONTH")
-        latest_close_ts = close_valid["CLOSE_MONTH"].max()
-        latest_close_month = latest_close_ts.date()
-        latest_row = close_valid[close_valid["CLOSE_MONTH"] == latest_close_ts].iloc[0]
-        win_latest = float(latest_row["WIN_RATE_PCT"])
-        if len(close_valid) >= 2:
-            win_prev = float(close_valid.iloc[-2]["WIN_RATE_PCT"])
-            win_delta = win_latest - win_prev
 
+def fetch_datasets_concurrently(tasks: Dict[str, Any]) -> Tuple[Dict[str, Any], FanOutReport]:
+    return run_concurrent(tasks, thread_init=_script_ctx_initializer())
 
-coverage_ratio = float(coverage_df.iloc[0]["PIPELINE_COVERAGE_RATIO"]) if (coverage_df is not None and not coverage_df.empty and "PIPELINE_COVERAGE_RATIO" in coverage_df.columns) else None
-coverage_open = float(coverage_df.iloc[0]["TOTAL_OPEN_PIPELINE"]) if (coverage_df is not None and not coverage_df.empty and "TOTAL_OPEN_PIPELINE" in coverage_df.columns) else None
-coverage_avg3 = float(coverage_df.iloc[0]["AVG_3M_CLOSED_REVENUE"]) if (coverage_df is not None and not coverage_df.empty and "AVG_3M_CLOSED_REVENUE" in coverage_df.columns) else None
 
+# Pull datasets (single source of truth per tab) — independent queries fan out concurrently
+datasets, fanout_report = fetch_datasets_concurrently({
+    "get_arr_trend": lambda: get_arr_trend(start_date, end_date, ACCOUNT_FILTER),
+    "get_retention_trend": lambda: get_retention_trend(start_date, end_date, ACCOUNT_FILTER),
+    "get_closed_revenue_monthly": lambda: get_closed_revenue_monthly(start_date, end_date, ACCOUNT_FILTER),
+    "get_pipeline_coverage": lambda: get_pipeline_coverage(start_date, end_date, ACCOUNT_FILTER),
+    "get_open_pipeline_by_stage": lambda: get_open_pipeline_by_stage(ACCOUNT_FILTER),
+})
+arr_df = datasets["get_arr_trend"]
+ret_df = datasets["get_retention_trend"]
+closed_df = datasets["get_closed_revenue_monthly"]
+coverage_df = datasets["get_pipeline_coverage"]
+open_stage_df = datasets["get_open_pipeline_by_stage"]
+PROFILE.mark("KPI datasets")
 
-# Smart alert banner
-alerts = []
-if nrr_latest is not None and nrr_latest < NRR_ALERT_BELOW:
-    alerts.append(f"Net Revenue Retention below {NRR_ALERT_BELOW:.0f}% (NRR={nrr_latest:.2f}%).")
-if grr_latest is not None and grr_latest < GRR_ALERT_BELOW:
-    alerts.append(f"Gross Revenue Retention below {GRR_ALERT_BELOW:.0f}% (GRR={grr_latest:.2f}%).")
-if coverage_ratio is not None and coverage_ratio < PIPELINE_COVERAGE_ALERT_BELOW:
-    alerts.append(f"Pipeline coverage below {PIPELINE_COVERAGE_ALERT_BELOW:.1f}x (Coverage={coverage_ratio:.2f}x).")
-
-if arr_df is not None and not arr_df.empty and "MONTH" in arr_df.columns and "TOTAL_ARR" in arr_df.columns and len(arr_df) >= ARR_NEGATIVE_TREND_LOOKBACK:
-    tail = arr_df.sort_values("MONTH").tail(ARR_NEGATIVE_TREND_LOOKBACK)["TOTAL_ARR"].values
-    if len(tail) >= 3 and tail[-1] < tail[0]:
-        alerts.append("ARR trending down over recent months.")
 
+# Headline KPIs: one pass over each series, shared by the cards, alerts, narrative ctx and Q&A pack
+kpis = compute_kpis(arr_df, ret_df, closed_df, coverage_df, arr_trend_lookback=ARR_NEGATIVE_TREND_LOOKBACK)
+
+# Smart alert banner
+alerts = kpis.alerts(NRR_ALERT_BELOW, GRR_ALERT_BELOW, PIPELINE_COVERAGE_ALERT_BELOW)
 if alerts:
     st.warning("  •  " + "  •  ".join(alerts))
 
@@ -1688,85 +1400,125 @@ def display_retention_value(value, start_mrr):
     return fmt_pct(value)
 
 
-nrr_delta = (nrr_latest - nrr_prev) if (nrr_latest is not None and nrr_prev is not None) else None
-grr_delta = (grr_latest - grr_prev) if (grr_latest is not None and grr_prev is not None) else None
-
 # KPI row
 k1, k2, k3, k4, k5 = st.columns([1, 1, 1, 1, 1])
 with k1:
-    kpi_card("ARR (latest)", fmt_currency(arr_latest), arr_delta, delta_fmt="currency")
+    kpi_card("ARR (latest)", fmt_currency(kpis.arr.latest), kpis.arr.delta, delta_fmt="currency")
 with k2:
-    kpi_card("NRR (latest complete)", display_retention_value(nrr_latest, latest_start_mrr), nrr_delta, delta_fmt="pct")
+    kpi_card("NRR (latest complete)", display_retention_value(kpis.nrr.latest, kpis.start_mrr), kpis.nrr.delta, delta_fmt="pct")
 with k3:
-    kpi_card("GRR (latest complete)", display_retention_value(grr_latest, latest_start_mrr), grr_delta, delta_fmt="pct")
+    kpi_card("GRR (latest complete)", display_retention_value(kpis.grr.latest, kpis.start_mrr), kpis.grr.delta, delta_fmt="pct")
 with k4:
-    kpi_card("Win Rate (latest close month)", fmt_pct(win_latest), win_delta, delta_fmt="pct")
+    kpi_card("Win Rate (latest close month)", fmt_pct(kpis.win_rate.latest), kpis.win_rate.delta, delta_fmt="pct")
 with k5:
-    kpi_card("Pipeline Coverage", fmt_x(coverage_ratio), None, delta_fmt="x")
+    kpi_card("Pipeline Coverage", fmt_x(kpis.coverage_ratio), None, delta_fmt="x")
 
 
 with st.expander("Executive context (auto-generated)", expanded=False):
     st.write(
         f"""
 **Latest months**
-- ARR month: **{latest_arr_month}**
-- Retention month (complete): **{latest_ret_month}**
-- Pipeline close month: **{latest_close_month}**
+- ARR month: **{kpis.arr.month}**
+- Retention month (complete): **{kpis.ret_month}**
+- Pipeline close month: **{kpis.close_month}**
 
 **Pipeline coverage definition**
-- Open pipeline: **{fmt_currency(coverage_open)}**
-- Avg closed revenue (last 3 close months in filter): **{fmt_currency(coverage_avg3)}**
-- Coverage ratio: **{fmt_x(coverage_ratio)}**
+- Open pipeline: **{fmt_currency(kpis.coverage_open)}**
+- Avg closed revenue (last 3 close months in filter): **{fmt_currency(kpis.coverage_avg3)}**
+- Coverage ratio: **{fmt_x(kpis.coverage_ratio)}**
 """
     )
 
 
 # -----------------------------
-# Tabs
+# Views (lazy: only the active view runs; the likely next view is prefetched)
 # -----------------------------
-tab_overview, tab_qa, tab_retention, tab_pipeline, tab_health, tab_accounts, tab_quality, tab_about = st.tabs(
-    ["Overview", "Analyst Q&A", "Retention", "Pipeline", "Customer Health", "Account Explorer", "Data Quality", "About"]
-)
+VIEWS = ["Overview", "Analyst Q&A", "Retention", "Pipeline", "Customer Health", "Account Explorer", "Data Quality", "About"]
+DEFAULT_NEXT_VIEW = {
+    "Overview": "Retention",
+    "Analyst Q&A": "Overview",
+    "Retention": "Pipeline",
+    "Pipeline": "Customer Health",
+    "Customer Health": "Account Explorer",
+    "Account Explorer": "Customer Health",
+    "Data Quality": "Overview",
+    "About": "Overview",
+}
+router = ViewRouter(VIEWS, DEFAULT_NEXT_VIEW, st.session_state)
+active_view = st.radio("View", VIEWS, horizontal=True, key="active_view", label_visibility="collapsed")
 
 
-# -----------------------------
-# Overview
-# -----------------------------
-with tab_overview:
-    st.markdown('<div class="section-title">Executive Narrative</div>', unsafe_allow_html=True)
+def current_qa_pack_json() -> str:
+    return build_qa_pack_json(
+        start_d=start_date,
+        end_d=end_date,
+        account_filter=ACCOUNT_FILTER,
+        kpis=kpis,
+        pipeline_coverage_target_x=PIPELINE_COVERAGE_ALERT_BELOW,
+    )
 
-    # Optional: feed interpretability signals if available
-    dq_for_exec = retention_data_quality(start_date, end_date, ACCOUNT_FILTER, latest_ret_month)
 
-    ctx = {
+def exec_narrative_ctx() -> Dict[str, Any]:
+    # Optional: feed interpretability signals if available
+    dq_for_exec = retention_data_quality(start_date, end_date, ACCOUNT_FILTER, kpis.ret_month)
+    return {
         "filters_text": f"{start_date} to {end_date}",
-        "arr_latest": arr_latest,
-        "nrr_latest": nrr_latest,
-        "grr_latest": grr_latest,
-        "win_latest": win_latest,
-        "coverage_ratio": coverage_ratio,
+        **kpis.ctx_values(),
         "retention_interpretable": bool(dq_for_exec.get("retention_interpretable", False)),
         "retention_note": str(dq_for_exec.get("retention_note", "")),
     }
 
+
+def precomputed_exec_narrative(ctx: Dict) -> Optional[Dict[str, Any]]:
+    # Batch-generated narrative for this sidebar slice, when the filters match one
+    current_slice = slice_for_filter(ACCOUNT_FILTER, domains)
+    if current_slice is None:
+        return None
+    return get_precomputed_narrative(*current_slice, start_date, end_date, narrative_ctx_key(ctx))
+
+
+# -----------------------------
+# Overview
+# -----------------------------
+def render_overview() -> None:
+    st.markdown('<div class="section-title">Executive Narrative</div>', unsafe_allow_html=True)
+
+    ctx = exec_narrative_ctx()
+    precomputed = precomputed_exec_narrative(ctx)
+
     col_a, col_b = st.columns([0.82, 0.18])
     with col_b:
-        if st.button("Generate / Refresh", use_container_width=True):
-            with st.spinner("Generating executive narrative..."):
-                st.session_state["exec_narrative"] = generate_exec_narrative(ctx)
+        generate = st.button("Generate / Refresh", use_container_width=True)
+    with col_a:
+        job = get_narrative_jobs().get(exec_narrative_key(ctx))
+        if precomputed is not None and "exec_narrative" not in st.session_state:
+            st.caption(f"Precomputed narrative for {precomputed['label']} (generated {precomputed['generated_at']}).")
+        elif job is not None and "exec_narrative" not in st.session_state:
+            st.caption("Narrative ready for these filters." if job.done else "Generating the narrative for these filters in the background…")
+
+    card = st.empty()
+    if generate:
+        # Re-render the card as sections arrive (at most ~10 paints/s)
+        text, last_paint = "", 0.0
+        for chunk in exec_narrative_chunks(ctx):
+            text += chunk
+            if time.perf_counter() - last_paint >= 0.1:
+                render_exec_narrative(text, filters_text=ctx["filters_text"], target=card)
+                last_paint = time.perf_counter()
+        st.session_state["exec_narrative"] = _norm_text(text)
 
     if "exec_narrative" in st.session_state:
-        render_exec_narrative(st.session_state["exec_narrative"], filters_text=ctx["filters_text"])
+        render_exec_narrative(st.session_state["exec_narrative"], filters_text=ctx["filters_text"], target=card)
+    elif precomputed is not None:
+        render_exec_narrative(precomputed["narrative"], filters_text=precomputed["filters_text"], target=card)
     else:
-        st.info("Click **Generate / Refresh** to generate a board-ready narrative for the selected filters.")
+        card.info("Click **Generate / Refresh** to generate a board-ready narrative for the selected filters.")
 
     st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
 
     st.markdown('<div class="section-title">ARR Trend</div>', unsafe_allow_html=True)
     if arr_df is not None and not arr_df.empty and "MONTH" in arr_df.columns and "TOTAL_ARR" in arr_df.columns:
-        df = arr_df[arr_df["TOTAL_ARR"] > 0].copy()
-        df["MONTH"] = pd.to_datetime(df["MONTH"])
-        chart_line(df, "MONTH", "TOTAL_ARR", "ARR Trend")
+        chart_line(arr_df[arr_df["TOTAL_ARR"] > 0], "MONTH", "TOTAL_ARR", "ARR Trend")
 
     st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
 
@@ -1774,26 +1526,22 @@ with tab_overview:
     with c1:
         st.markdown('<div class="section-title">Retention Performance</div>', unsafe_allow_html=True)
         if ret_df is not None and not ret_df.empty and "MONTH" in ret_df.columns:
-            df = ret_df.copy()
-            df["MONTH"] = pd.to_datetime(df["MONTH"])
-            cols = [c for c in ["NRR_PCT", "GRR_PCT"] if c in df.columns]
+            cols = [c for c in ["NRR_PCT", "GRR_PCT"] if c in ret_df.columns]
             if cols:
-                chart_multi_line(df, "MONTH", cols, "NRR vs GRR (%)")
+                chart_multi_line(ret_df, "MONTH", cols, "NRR vs GRR (%)")
             else:
                 st.info("Retention metrics not available for current filters.")
     with c2:
         st.markdown('<div class="section-title">Pipeline Strength</div>', unsafe_allow_html=True)
         st.write("**Coverage Ratio**")
-        st.markdown(f"### {fmt_x(coverage_ratio)}")
+        st.markdown(f"### {fmt_x(kpis.coverage_ratio)}")
         st.caption("Open pipeline ÷ average closed revenue (last 3 close months in filter).")
 
     st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
 
     st.markdown('<div class="section-title">Closed Revenue by Month</div>', unsafe_allow_html=True)
     if closed_df is not None and not closed_df.empty and "CLOSE_MONTH" in closed_df.columns and "TOTAL_CLOSED_REVENUE" in closed_df.columns:
-        df = closed_df.copy()
-        df["CLOSE_MONTH"] = pd.to_datetime(df["CLOSE_MONTH"])
-        chart_bar(df, "CLOSE_MONTH", "TOTAL_CLOSED_REVENUE", "Closed Revenue by Month")
+        chart_bar(closed_df, "CLOSE_MONTH", "TOTAL_CLOSED_REVENUE", "Closed Revenue by Month")
 
     st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
 
@@ -1811,26 +1559,23 @@ with tab_overview:
 # -----------------------------
 # Q&A Tab ✅ (ONE input + click-to-fill + strict)
 # -----------------------------
-with tab_qa:
+def render_qa() -> None:
     st.markdown('<div class="section-title">Cortex Analyst Q&A</div>', unsafe_allow_html=True)
     st.caption("Ask questions about the current filters. Answers are grounded ONLY in metrics computed in this app.")
 
-    pack_json = build_qa_pack_json(
-        start_d=start_date,
-        end_d=end_date,
-        account_filter=ACCOUNT_FILTER,
-        arr_latest=arr_latest,
-        nrr_latest=nrr_latest,
-        grr_latest=grr_latest,
-        win_latest=win_latest,
-        coverage_ratio=coverage_ratio,
-        arr_delta=arr_delta,
-        win_delta=win_delta,
-        coverage_open=coverage_open,
-        coverage_avg3=coverage_avg3,
-        latest_ret_month=latest_ret_month,
-        pipeline_coverage_target_x=PIPELINE_COVERAGE_ALERT_BELOW,
+    pack_json = current_qa_pack_json()
+    ps = qa_pack.pack_stats(pack_json)
+    st.caption(
+        f"Evidence pack: {ps.bytes / 1024:.1f} KB, ~{ps.est_tokens:,} tokens per request"
+        + (f" (budget {QA_PACK_TOKEN_BUDGET:,}; trimmed {len(ps.trimmed)} section(s))" if ps.trimmed else "")
+        + "."
     )
+    llm_stats = get_llm_cache().stats
+    if llm_stats.hit_rate is not None:
+        st.caption(
+            f"Response cache: {llm_stats.hits} exact + {llm_stats.semantic_hits} similar hits, "
+            f"{llm_stats.misses} Cortex calls ({100 * llm_stats.hit_rate:.0f}% hit rate)."
+        )
 
     if "qa_messages" not in st.session_state:
         st.session_state.qa_messages = []
@@ -1852,8 +1597,8 @@ with tab_qa:
         if not q:
             return
         st.session_state.qa_messages.append({"role": "user", "content": q})
-        ans = cortex_analyst_answer(q, pack_json)
-        st.session_state.qa_messages.append({"role": "assistant", "content": ans})
+        # Answered below, streamed into the chat, on this same rerun
+        st.session_state.qa_pending = q
         st.session_state.qa_question = ""
 
     st.write("**Suggested questions**")
@@ -1884,6 +1629,12 @@ with tab_qa:
         with st.chat_message(m["role"]):
             st.write(m["content"])
 
+    pending = st.session_state.pop("qa_pending", None)
+    if pending:
+        with st.chat_message("assistant"):
+            ans = st.write_stream(stream_analyst_answer(pending, pack_json))
+        st.session_state.qa_messages.append({"role": "assistant", "content": _norm_text(ans)})
+
     with st.form("qa_form", clear_on_submit=False):
         st.text_input(
             "Ask a question...",
@@ -1896,14 +1647,12 @@ with tab_qa:
 # -----------------------------
 # Retention Tab
 # -----------------------------
-with tab_retention:
+def render_retention() -> None:
     st.markdown('<div class="section-title">Retention Time Series</div>', unsafe_allow_html=True)
     if ret_df is not None and not ret_df.empty and "MONTH" in ret_df.columns:
-        df = ret_df.copy()
-        df["MONTH"] = pd.to_datetime(df["MONTH"])
-        cols = [c for c in ["NRR_PCT", "GRR_PCT"] if c in df.columns]
+        cols = [c for c in ["NRR_PCT", "GRR_PCT"] if c in ret_df.columns]
         if cols:
-            chart_multi_line(df, "MONTH", cols, "NRR vs GRR (Cohort-Based)")
+            chart_multi_line(ret_df, "MONTH", cols, "NRR vs GRR (Cohort-Based)")
         st.caption(
             "NRR/GRR are computed using existing-customer cohorts: "
             "accounts with MRR>0 in Month T, compared to the same accounts in Month T+1. "
@@ -1939,16 +1688,13 @@ with tab_retention:
 # -----------------------------
 # Pipeline Tab
 # -----------------------------
-with tab_pipeline:
+def render_pipeline() -> None:
     st.markdown('<div class="section-title">Pipeline Performance (Monthly)</div>', unsafe_allow_html=True)
     if closed_df is not None and not closed_df.empty:
-        df = closed_df.copy()
-        if "CLOSE_MONTH" in df.columns:
-            df["CLOSE_MONTH"] = pd.to_datetime(df["CLOSE_MONTH"])
-        st.dataframe(df, use_container_width=True, hide_index=True)
+        st.dataframe(closed_df, use_container_width=True, hide_index=True)
         st.download_button(
             "Download pipeline monthly metrics (CSV)",
-            data=df.to_csv(index=False),
+            data=closed_df.to_csv(index=False),
             file_name="pipeline_monthly_metrics.csv",
             mime="text/csv",
         )
@@ -1959,8 +1705,9 @@ with tab_pipeline:
 
     st.markdown('<div class="section-title">Open Pipeline (Stage Funnel)</div>', unsafe_allow_html=True)
     if open_stage_df is not None and not open_stage_df.empty:
-        df = open_stage_df.copy()
-        if ALTAIR_OK and all(c in df.columns for c in ["CURRENT_STAGE", "OPEN_PIPELINE", "WEIGHTED_PIPELINE", "OPP_COUNT"]):
+        df = open_stage_df
+        alt = altair()
+        if alt is not None and all(c in df.columns for c in ["CURRENT_STAGE", "OPEN_PIPELINE", "WEIGHTED_PIPELINE", "OPP_COUNT"]):
             c = (
                 alt.Chart(df)
                 .mark_bar()
@@ -1979,30 +1726,7 @@ with tab_pipeline:
 
     if STAGE_HIST_TBL:
         st.markdown('<div class="section-title">Stage Dynamics</div>', unsafe_allow_html=True)
-
-        stage_duration_sql = f"""
-        with sh as (
-            select
-                sh.opp_id,
-                sh.account_id,
-                sh.stage,
-                sh.stage_start_date,
-                sh.stage_end_date
-            from {STAGE_HIST_TBL} sh
-            join {ACCOUNTS_TBL} a on a.account_id = sh.account_id
-            {"left join " + REPS_TBL + " r on r.rep_id = a.owner_rep_id" if REPS_TBL else ""}
-            where {ACCOUNT_FILTER}
-        )
-        select
-            stage,
-            count(distinct opp_id) as deals_reached_stage,
-            round(avg(datediff(day, stage_start_date, stage_end_date)), 2) as avg_stage_duration_days
-        from sh
-        where stage_end_date is not null
-        group by stage
-        order by deals_reached_stage desc;
-        """
-        stage_duration_df = run_sql(stage_duration_sql)
+        stage_duration_df = get_stage_durations(ACCOUNT_FILTER)
 
         c1, c2 = st.columns(2)
         with c1:
@@ -2013,52 +1737,7 @@ with tab_pipeline:
                 st.info("No stage duration data available.")
         with c2:
             st.write("**Stage Conversion (From → To)**")
-            stage_conv_sql = f"""
-            with sh as (
-                select
-                    sh.opp_id,
-                    sh.account_id,
-                    sh.stage,
-                    sh.stage_start_date
-                from {STAGE_HIST_TBL} sh
-                join {ACCOUNTS_TBL} a on a.account_id = sh.account_id
-                {"left join " + REPS_TBL + " r on r.rep_id = a.owner_rep_id" if REPS_TBL else ""}
-                where {ACCOUNT_FILTER}
-            ),
-            ordered as (
-                select
-                    opp_id,
-                    stage as from_stage,
-                    lead(stage) over (partition by opp_id order by stage_start_date) as to_stage
-                from sh
-            ),
-            trans as (
-                select
-                    from_stage,
-                    to_stage,
-                    count(*) as deals_progressed
-                from ordered
-                where to_stage is not null
-                group by from_stage, to_stage
-            ),
-            in_stage as (
-                select
-                    stage as from_stage,
-                    count(distinct opp_id) as deals_in_stage
-                from sh
-                group by stage
-            )
-            select
-                t.from_stage,
-                t.to_stage,
-                t.deals_progressed,
-                i.deals_in_stage,
-                round(100 * t.deals_progressed / nullif(i.deals_in_stage, 0), 2) as conversion_rate_pct
-            from trans t
-            join in_stage i using(from_stage)
-            order by conversion_rate_pct desc;
-            """
-            stage_conv_df = run_sql(stage_conv_sql)
+            stage_conv_df = get_stage_conversion(ACCOUNT_FILTER)
 
             if stage_conv_df is not None and not stage_conv_df.empty:
                 st.dataframe(stage_conv_df, use_container_width=True, hide_index=True)
@@ -2071,7 +1750,7 @@ with tab_pipeline:
 # -----------------------------
 # Health Tab
 # -----------------------------
-with tab_health:
+def render_health() -> None:
     st.markdown('<div class="section-title">Customer Health Snapshot</div>', unsafe_allow_html=True)
     health_df = get_health_snapshot(start_date, end_date, ACCOUNT_FILTER)
 
@@ -2085,7 +1764,8 @@ with tab_health:
         if status_col:
             dist = health_df.groupby(status_col).size().reset_index(name="COUNT")
             st.write("**Health distribution**")
-            if PLOTLY_OK:
+            px = plotly_express()
+            if px is not None:
                 fig = px.bar(dist, x=status_col, y="COUNT")
                 fig.update_layout(template="plotly_white", height=320, margin=dict(l=0, r=0, t=40, b=0))
                 st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
@@ -2110,22 +1790,70 @@ with tab_health:
             mime="text/csv",
         )
 
+        if "ACCOUNT_ID" in view.columns:
+            st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
+            st.write("**Batch drill-down (opportunities, tickets, MRR)**")
+            at_risk = view.head(ACCOUNT_BATCH_MAX)
+            ids = at_risk["ACCOUNT_ID"].astype(str).tolist()
+            names = (
+                dict(zip(ids, at_risk["ACCOUNT_NAME"].fillna("").astype(str)))
+                if "ACCOUNT_NAME" in at_risk.columns else {}
+            )
+            picked = st.multiselect(
+                "At-risk accounts",
+                options=ids,
+                key="health_batch_accounts",
+                format_func=lambda a: f"{names[a]} ({a})" if names.get(a) else a,
+                max_selections=ACCOUNT_BATCH_MAX,
+                placeholder="Pick accounts from the at-risk list",
+            )
+            if picked:
+                bundles = get_account_bundles(picked)
+                summary = batch_summary(bundles, start_date, end_date)
+                if names:
+                    summary.insert(1, "ACCOUNT_NAME", summary["ACCOUNT_ID"].map(names))
+                st.dataframe(summary, use_container_width=True, hide_index=True)
+                st.download_button(
+                    "Download drill-down (ZIP: mrr / opportunities / tickets CSV)",
+                    data=bundles_to_zip(bundles),
+                    file_name="account_drilldown.zip",
+                    mime="application/zip",
+                )
+                for account_id, bundle in bundles.items():
+                    with st.expander(f"{names.get(account_id) or account_id} ({account_id})", expanded=False):
+                        if bundle.opportunities is not None and not bundle.opportunities.empty:
+                            st.dataframe(bundle.opportunities, use_container_width=True, hide_index=True)
+                        else:
+                            st.info("No opportunities found for this account.")
+                        if bundle.tickets is not None:
+                            if not bundle.tickets.empty:
+                                st.dataframe(bundle.tickets, use_container_width=True, hide_index=True)
+                            else:
+                                st.info("No support tickets found for this account.")
+
 
 # -----------------------------
 # Account Explorer Tab
 # -----------------------------
-with tab_accounts:
+def render_accounts() -> None:
     st.markdown('<div class="section-title">Account Explorer</div>', unsafe_allow_html=True)
 
-    accounts_df = run_sql(f"select account_id, account_name, segment, region, industry, owner_rep_id, website from {ACCOUNTS_TBL}")
+    search_term = st.text_input(
+        "Search accounts",
+        key="account_search",
+        placeholder="Account name or ID (prefix or substring)",
+    )
+    accounts_df = search_accounts(normalize_search_term(search_term))
     if accounts_df is None or accounts_df.empty:
-        st.info("No accounts available.")
+        st.info("No accounts match this search." if search_term.strip() else "No accounts available.")
     else:
         accounts_df["ACCOUNT_ID"] = accounts_df["ACCOUNT_ID"].astype(str)
         accounts_df["ACCOUNT_NAME"] = accounts_df["ACCOUNT_NAME"].fillna("").astype(str)
         accounts_df["LABEL"] = accounts_df["ACCOUNT_NAME"] + " (" + accounts_df["ACCOUNT_ID"] + ")"
 
         selected = st.selectbox("Select an account", options=accounts_df["LABEL"].tolist())
+        if len(accounts_df) >= ACCOUNT_SEARCH_LIMIT:
+            st.caption(f"Showing the first {ACCOUNT_SEARCH_LIMIT} matches — refine the search to narrow the list.")
         sel_id = selected.split("(")[-1].replace(")", "").strip()
 
         acct_rows = accounts_df[accounts_df["ACCOUNT_ID"] == sel_id]
@@ -2143,37 +1871,18 @@ with tab_accounts:
             st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
             st.markdown('<div class="section-title">MRR Trend</div>', unsafe_allow_html=True)
 
-            mrr_df = get_mrr_account_month(start_date, end_date, "1=1")
-            if mrr_df is not None and not mrr_df.empty:
-                df = mrr_df[mrr_df["ACCOUNT_ID"].astype(str) == sel_id].copy()
-                if not df.empty:
-                    df["MONTH"] = pd.to_datetime(df["MONTH"])
-                    chart_line(df, "MONTH", "TOTAL_MRR", "MRR by Month", height=300)
-                    st.caption("MRR values come from your MARTS.FCT_MRR table.")
-                else:
-                    st.info("No MRR rows found for this account within the selected range.")
+            bundle = get_account_bundle(sel_id)
+            df = bundle.mrr_between(start_date, end_date)
+            if not df.empty:
+                chart_line(df, "MONTH", "TOTAL_MRR", "MRR by Month", height=300)
+                st.caption("MRR values come from your MARTS.FCT_MRR table.")
             else:
-                st.info("MRR dataset unavailable.")
+                st.info("No MRR rows found for this account within the selected range.")
 
             st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
             st.markdown('<div class="section-title">Opportunities</div>', unsafe_allow_html=True)
 
-            opp_sql = f"""
-            select
-                opp_id,
-                created_date,
-                close_date,
-                current_stage,
-                probability,
-                amount,
-                is_closed,
-                is_won
-            from {FCT_PIPELINE_TBL}
-            where account_id = '{sel_id}'
-            order by created_date desc
-            limit 200;
-            """
-            opp_df = run_sql(opp_sql)
+            opp_df = bundle.opportunities
             if opp_df is not None and not opp_df.empty:
                 st.dataframe(opp_df, use_container_width=True, hide_index=True)
             else:
@@ -2183,20 +1892,7 @@ with tab_accounts:
                 st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
                 st.markdown('<div class="section-title">Support Tickets</div>', unsafe_allow_html=True)
 
-                t_sql = f"""
-                select
-                    ticket_id,
-                    created_date,
-                    status,
-                    priority,
-                    category,
-                    subject
-                from {SUPPORT_TICKETS_TBL}
-                where account_id = '{sel_id}'
-                order by created_date desc
-                limit 200;
-                """
-                t_df = run_sql(t_sql)
+                t_df = bundle.tickets
                 if t_df is not None and not t_df.empty:
                     st.dataframe(t_df, use_container_width=True, hide_index=True)
                 else:
@@ -2206,39 +1902,107 @@ with tab_accounts:
 # -----------------------------
 # Data Quality Tab
 # -----------------------------
-with tab_quality:
+def render_data_quality() -> None:
     st.markdown('<div class="section-title">Data Quality & Sanity Checks</div>', unsafe_allow_html=True)
     
-    checks = []
-    checks.append(("MRR date bounds", f"select min(month) as min_month, max(month) as max_month from {FCT_MRR_TBL}"))
-    checks.append(("Pipeline close bounds", f"select min(close_date) as min_close, max(close_date) as max_close from {FCT_PIPELINE_TBL}"))
-    checks.append(("Row count — Accounts", f"select count(*) as row_count from {ACCOUNTS_TBL}"))
-    checks.append(("Row count — FCT_MRR", f"select count(*) as row_count from {FCT_MRR_TBL}"))
-    checks.append(("Row count — FCT_PIPELINE", f"select count(*) as row_count from {FCT_PIPELINE_TBL}"))
-
-    if STAGE_HIST_TBL:
-        checks.append(("Row count — Stage History", f"select count(*) as row_count from {STAGE_HIST_TBL}"))
-    if SUPPORT_TICKETS_TBL:
-        checks.append(("Row count — Support Tickets", f"select count(*) as row_count from {SUPPORT_TICKETS_TBL}"))
-
-    for title, q in checks:
+    for title, df, err in get_data_quality_checks():
         with st.expander(title, expanded=False):
-            try:
-                df = run_sql(q)
+            if err is None:
                 st.dataframe(df, use_container_width=True, hide_index=True)
-            except Exception as e:
-                st.error(f"Check failed: {e}")
+            else:
+                st.error(f"Check failed: {err}")
+
+    st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
+    st.write("**Top-level dataset queries (last rerun)**")
+    speedup = fanout_report.speedup
+    st.caption(
+        f"Wall-clock {fanout_report.wall_s:.2f}s vs summed query time {fanout_report.summed_s:.2f}s"
+        + (f" ({speedup:.1f}x from concurrent fan-out)." if speedup else ".")
+    )
+    st.dataframe(fanout_report.to_frame(), use_container_width=True, hide_index=True)
+
+    paint = router.paint_timings()
+    if paint:
+        st.write("**First paint by view (this session, latest render)**")
+        st.caption("Seconds from the start of the rerun until the view finished rendering. Only the active view runs.")
+        st.dataframe(
+            pd.DataFrame([{"VIEW": v, "SECONDS": sec} for v, sec in paint.items()]),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+    st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
+    st.write("**Shared caches (this server process since start)**")
+    result_cache = get_result_cache()
+    llm_cache = get_llm_cache()
+    usage = result_cache.usage()
+    rs, ls = result_cache.stats, llm_cache.stats
+    st.caption(
+        f"Query results live for {RESULT_CACHE_TTL_S // 3600}h or until a table they read changes; "
+        f"the store is capped at {RESULT_CACHE_MAX_BYTES // (1024 * 1024)} MB."
+    )
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "CACHE": "Query results",
+                "STORE": type(result_cache.store).__name__ if result_cache.store is not None else "off",
+                "ENTRIES": usage["entries"],
+                "SIZE_MB": round(usage["bytes"] / (1024 * 1024), 2),
+                "HITS": rs.hits,
+                "MISSES": rs.misses,
+                "HIT_RATE_PCT": round(100 * rs.hit_rate, 1) if rs.hit_rate is not None else None,
+                "MB_READ": round(rs.bytes_read / (1024 * 1024), 2),
+                "ERRORS": rs.errors + rs.skipped,
+            },
+            {
+                "CACHE": "Cortex responses",
+                "STORE": type(llm_cache.store).__name__ if llm_cache.store is not None else "off",
+                "ENTRIES": None,
+                "SIZE_MB": None,
+                "HITS": ls.hits + ls.semantic_hits,
+                "MISSES": ls.misses,
+                "HIT_RATE_PCT": round(100 * ls.hit_rate, 1) if ls.hit_rate is not None else None,
+                "MB_READ": None,
+                "ERRORS": ls.errors,
+            },
+        ]),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
+    st.write("**Table versions (cache invalidation)**")
+    tracker = get_version_tracker()
+    vs = tracker.stats
+    if tracker.tracking:
+        st.caption(
+            f"Checked at most every {DATA_VERSION_CHECK_S}s ({vs.checks} metadata queries, last "
+            f"{(vs.last_check_s or 0):.3f}s). {vs.changed_tables} table changes cleared {vs.cleared} cached getters."
+            + (f" Last changed: {', '.join(tracker.last_changed)}." if tracker.last_changed else "")
+        )
+        st.dataframe(tracker.to_frame(), use_container_width=True, hide_index=True)
+    else:
+        st.caption(f"Table metadata unavailable; cached data expires every {DATA_VERSION_FALLBACK_S // 60} min instead.")
 
     st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
     st.write("**Resolved tables used by this app**")
-    resolved_df = pd.DataFrame([{"DATASET": k, "TABLE": v or "NOT FOUND"} for k, v in tables.items()])
+    known = tracker.known_tables()
+    resolved_df = pd.DataFrame([
+        {
+            "DATASET": k,
+            "TABLE": v or "NOT FOUND",
+            "ROW_COUNT": known.get(v, (None, None))[0] if v else None,
+            "LAST_ALTERED": known.get(v, (None, None))[1] if v else None,
+        }
+        for k, v in tables.items()
+    ])
     st.dataframe(resolved_df, use_container_width=True, hide_index=True)
 
 
 # -----------------------------
 # About Tab
 # -----------------------------
-with tab_about:
+def render_about() -> None:
     st.markdown('<div class="section-title">About this project</div>', unsafe_allow_html=True)
     st.write(
         """
@@ -2255,3 +2019,72 @@ with data quality checks and drill-down analysis.
 """
     )
     st.caption("Tip: In interviews, open Data Quality tab and explain why boundary months are excluded for NRR/GRR.")
+
+
+VIEW_RENDERERS = {
+    "Overview": render_overview,
+    "Analyst Q&A": render_qa,
+    "Retention": render_retention,
+    "Pipeline": render_pipeline,
+    "Customer Health": render_health,
+    "Account Explorer": render_accounts,
+    "Data Quality": render_data_quality,
+    "About": render_about,
+}
+
+# Dataset warm-ups per view (cached getters only — no UI calls off the main thread)
+VIEW_PREFETCH = {
+    "Overview": lambda: retention_data_quality(start_date, end_date, ACCOUNT_FILTER, kpis.ret_month),
+    "Analyst Q&A": current_qa_pack_json,
+    "Retention": lambda: (
+        get_mrr_movement_summary(start_date, end_date, ACCOUNT_FILTER),
+        get_top_mrr_movers(start_date, end_date, ACCOUNT_FILTER),
+    ),
+    "Pipeline": lambda: (
+        (get_stage_durations(ACCOUNT_FILTER), get_stage_conversion(ACCOUNT_FILTER)) if STAGE_HIST_TBL else None
+    ),
+    "Customer Health": lambda: get_health_snapshot(start_date, end_date, ACCOUNT_FILTER),
+    "Account Explorer": lambda term=normalize_search_term(st.session_state.get("account_search")): (
+        prefetch_account_explorer(term)
+    ),
+    "Data Quality": get_data_quality_checks,
+}
+
+router.record(active_view)
+VIEW_RENDERERS[active_view]()
+router.record_paint(active_view, time.perf_counter() - _RUN_T0)
+PROFILE.mark(f"KPI cards + {active_view} view")
+PROFILE.report(f"rerun until {active_view} rendered")
+
+next_view = router.likely_next(active_view)
+if next_view in VIEW_PREFETCH:
+    prefetch(
+        f"{next_view}|{start_date}|{end_date}|{ACCOUNT_FILTER.cache_key()}",
+        VIEW_PREFETCH[next_view],
+        thread_init=_script_ctx_initializer(),
+    )
+
+# Filter state + version of the tables the narrative context reads: reruns that change
+# neither (view switches, widget clicks) skip building the context and re-submitting
+NARRATIVE_PREFETCH_KEY = "|".join([
+    str(start_date),
+    str(end_date),
+    ACCOUNT_FILTER.cache_key(),
+    get_version_tracker().version_of(
+        [t for d in ("FCT_MRR", "MRR_DIM_ROLLUP", "FCT_PIPELINE", "ACCOUNTS", "SALES_REPS") for t in TABLE_CANDIDATES[d]]
+        + [NARRATIVES_TABLE]
+    ),
+])
+
+if EXEC_NARRATIVE_PREFETCH and st.session_state.get("_narrative_prefetch_key") != NARRATIVE_PREFETCH_KEY:
+    st.session_state["_narrative_prefetch_key"] = NARRATIVE_PREFETCH_KEY
+    # Speculative: the narrative for this filter state starts now; the click follows the job
+    narrative_ctx = exec_narrative_ctx()
+    # (not for a slice the batch job already wrote a narrative for)
+    if precomputed_exec_narrative(narrative_ctx) is None:
+        get_narrative_jobs().submit(
+            exec_narrative_key(narrative_ctx),
+            session_key(),
+            lambda: stream_exec_narrative(narrative_ctx, raise_errors=True),
+            thread_init=_script_ctx_initializer(),
+        )
@@ -0,0 +1,170 @@
+# table_versions.py
+# Purpose: Invalidate cached results when the tables behind them change, instead of
+#   expiring them on fixed TTLs (stale for up to the TTL after a load, re-queried for no
+#   reason when nothing changed).
+#     - one cheap metadata query per check (INFORMATION_SCHEMA.TABLES: LAST_ALTERED +
+#       ROW_COUNT per table; QueryBackend.table_metadata) gives every table a version
+#     - cached getters register the tables they read; when a table's version changes, the
+#       dependents are cleared (their next call re-queries)
+#     - version_of(tables) is a token for a set of tables: part of run_sql's cache key and
+#       of the shared result cache key, so unchanged tables keep hitting across restarts
+#   The pseudo-table "*" changes when tables appear or disappear (table resolution).
+#   The last metadata (row count, LAST_ALTERED per table) is kept for table resolution
+#   (dataset_sql.resolve_from_metadata) and the Data Quality tab.
+#   Without metadata (the query fails), versions fall back to time buckets of fallback_ttl_s
+#   and every dependent is cleared once per bucket, i.e. the old fixed-TTL behaviour.
+
+import hashlib
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+
+ANY_TABLE = "*"
+TRACKED_SCHEMAS = ("RAW", "MARTS", "SEMANTIC", "AGENTS")
+
+_FQN = re.compile(r"\bGTM_COPILOT\.[A-Za-z0-9_]+\.[A-Za-z0-9_]+\b", re.IGNORECASE)
+
+
+def tables_in_sql(sql: str) -> Tuple[str, ...]:
+    return tuple(sorted({m.group(0).upper() for m in _FQN.finditer(sql)}))
+
+
+def versions_from_metadata(df: pd.DataFrame, db: str = "GTM_COPILOT") -> Dict[str, str]:
+    versions: Dict[str, str] = {}
+    for schema, name, rows, altered in zip(df["TABLE_SCHEMA"], df["TABLE_NAME"], df["ROW_COUNT"], df["LAST_ALTERED"]):
+        fqn = f"{db}.{schema}.{name}".upper()
+        versions[fqn] = f"{'' if pd.isna(altered) else pd.Timestamp(altered).isoformat()}|{'' if pd.isna(rows) else int(rows)}"
+    h = hashlib.sha256("\n".join(sorted(versions)).encode("utf-8"))
+    versions[ANY_TABLE] = h.hexdigest()[:16]
+    return versions
+
+
+def table_metadata(df: pd.DataFrame, db: str = "GTM_COPILOT") -> Dict[str, Tuple[Optional[int], Optional[pd.Timestamp]]]:
+    return {
+        f"{db}.{schema}.{name}".upper(): (
+            None if pd.isna(rows) else int(rows),
+            None if pd.isna(altered) else pd.Timestamp(altered),
+        )
+        for schema, name, rows, altered in zip(df["TABLE_SCHEMA"], df["TABLE_NAME"], df["ROW_COUNT"], df["LAST_ALTERED"])
+    }
+
+
+@dataclass
+class VersionCheckStats:
+    checks: int = 0
+    skipped: int = 0  # within min_interval_s of the last check
+    errors: int = 0
+    changed_tables: int = 0
+    cleared: int = 0
+    last_check_s: Optional[float] = None  # duration of the last metadata query
+
+
+class TableVersionTracker:
+    def __init__(self, min_interval_s: float = 5.0, fallback_ttl_s: float = 900.0):
+        self.min_interval_s = float(min_interval_s)
+        self.fallback_ttl_s = float(fallback_ttl_s)
+        self.stats = VersionCheckStats()
+        self.last_changed: List[str] = []
+        self.last_checked_at: Optional[float] = None
+        self._versions: Dict[str, str] = {}
+        self._metadata: Dict[str, Tuple[Optional[int], Optional[pd.Timestamp]]] = {}
+        self._fallback_bucket: Optional[int] = None
+        self._dependents: Dict[str, Tuple[Tuple[str, ...], Callable[[], None]]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, tables: Iterable[str], clear: Callable[[], None]) -> None:
+        # Re-registering a name (every Streamlit rerun) replaces the previous entry
+        with self._lock:
+            self._dependents[name] = (tuple(sorted({t.upper() for t in tables})), clear)
+
+    def dependents_of(self, tables: Iterable[str]) -> List[str]:
+        changed = {t.upper() for t in tables}
+        with self._lock:
+            return sorted(name for name, (deps, _) in self._dependents.items() if changed.intersection(deps))
+
+    def update(self, versions: Dict[str, str], metadata: Optional[pd.DataFrame] = None) -> List[str]:
+        # Returns the changed tables; the first update only records the baseline
+        with self._lock:
+            first = not self._versions
+            changed = [] if first else sorted(
+                t for t in set(self._versions) | set(versions) if self._versions.get(t) != versions.get(t)
+            )
+            self._versions = dict(versions)
+            if metadata is not None:
+                self._metadata = table_metadata(metadata)
+            clears = [clear for deps, clear in self._dependents.values() if set(changed).intersection(deps)]
+            self.stats.changed_tables += len(changed)
+            self.stats.cleared += len(clears)
+            if changed:
+                self.last_changed = changed
+        for clear in clears:
+            try:
+                clear()
+            except Exception:
+                self.stats.errors += 1
+        return changed
+
+    def check(self, fetch: Callable[[], pd.DataFrame], force: bool = False) -> List[str]:
+        # One metadata query, at most every min_interval_s (shared by all sessions)
+        now = time.monotonic()
+        with self._lock:
+            if not force and self.last_checked_at is not None and now - self.last_checked_at < self.min_interval_s:
+                self.stats.skipped += 1
+                return []
+            self.last_checked_at = now
+        t0 = time.perf_counter()
+        try:
+            df = fetch()
+            versions = versions_from_metadata(df)
+        except Exception:
+            self.stats.errors += 1
+            self._fallback()
+            return []
+        self.stats.checks += 1
+        self.stats.last_check_s = time.perf_counter() - t0
+        return self.update(versions, df)
+
+    def _fallback(self) -> None:
+        bucket = int(time.time() // self.fallback_ttl_s)
+        with self._lock:
+            self._versions = {}
+            self._metadata = {}
+            expired = self._fallback_bucket is not None and bucket != self._fallback_bucket
+            self._fallback_bucket = bucket
+            clears = [clear for _, clear in self._dependents.values()] if expired else []
+            self.stats.cleared += len(clears)
+        for clear in clears:
+            try:
+                clear()
+            except Exception:
+                self.stats.errors += 1
+
+    @property
+    def tracking(self) -> bool:
+        return bool(self._versions)
+
+    def version_of(self, tables: Iterable[str]) -> str:
+        with self._lock:
+            if not self._versions:
+                return f"ttl:{int(time.time() // self.fallback_ttl_s)}"
+            parts = [f"{t}={self._versions.get(t, '')}" for t in sorted({t.upper() for t in tables})]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+    def known_tables(self) -> Dict[str, Tuple[Optional[int], Optional[pd.Timestamp]]]:
+        # FQN -> (row count, last altered) from the last metadata query; {} without metadata
+        with self._lock:
+            return dict(self._metadata)
+
+    def to_frame(self) -> pd.DataFrame:
+        with self._lock:
+            rows = [
+                {"TABLE": t, "ROW_COUNT": self._metadata.get(t, (None, None))[0],
+                 "LAST_ALTERED": self._metadata.get(t, (None, None))[1], "VERSION": v}
+                for t, v in sorted(self._versions.items()) if t != ANY_TABLE
+            ]
+        return pd.DataFrame(rows, columns=["TABLE", "ROW_COUNT", "LAST_ALTERED", "VERSION"])
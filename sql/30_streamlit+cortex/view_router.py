@@ -0,0 +1,74 @@
+# view_router.py
+# Purpose: Lazy view routing for the app. st.tabs executes every tab body on every rerun;
+#   the router renders only the active view. The most likely next view is predicted from
+#   this session's view transitions (falling back to a static order) and its datasets are
+#   warmed in a background thread, so the cached getters are hot when the user clicks.
+
+import threading
+from typing import Any, Callable, Dict, List, MutableMapping, Optional
+
+
+class ViewRouter:
+    def __init__(
+        self,
+        views: List[str],
+        default_next: Dict[str, str],
+        state: MutableMapping[str, Any],
+        state_key: str = "view_router",
+    ):
+        self.views = list(views)
+        self.default_next = dict(default_next)
+        if state_key not in state:
+            state[state_key] = {"last_view": None, "transitions": {}, "paint_s": {}}
+        self._state = state[state_key]
+
+    def record(self, view: str) -> None:
+        last = self._state["last_view"]
+        if last and last != view:
+            counts = self._state["transitions"].setdefault(last, {})
+            counts[view] = counts.get(view, 0) + 1
+        self._state["last_view"] = view
+
+    def likely_next(self, view: str) -> Optional[str]:
+        counts = self._state["transitions"].get(view) or {}
+        if counts:
+            # Most frequent transition; ties go to the view listed first
+            return max(counts, key=lambda v: (counts[v], -self.views.index(v) if v in self.views else 0))
+        return self.default_next.get(view)
+
+    def record_paint(self, view: str, seconds: float) -> None:
+        self._state["paint_s"][view] = round(float(seconds), 3)
+
+    def paint_timings(self) -> Dict[str, float]:
+        return dict(self._state["paint_s"])
+
+
+_inflight: Dict[str, threading.Thread] = {}
+_inflight_lock = threading.Lock()
+
+
+def prefetch(
+    key: str,
+    fn: Callable[[], Any],
+    thread_init: Optional[Callable[[], None]] = None,
+) -> Optional[threading.Thread]:
+    # One warm-up per key at a time. Results land in st.cache_data (the getters' own cache);
+    # errors are dropped — the view reruns the getter and surfaces them when it is opened.
+    with _inflight_lock:
+        for k in [k for k, t in _inflight.items() if not t.is_alive()]:
+            del _inflight[k]
+        if key in _inflight:
+            return None
+
+        def _run() -> None:
+            if thread_init is not None:
+                thread_init()
+            try:
+                fn()
+            except Exception:
+                pass
+
+        thread = threading.Thread(target=_run, name=f"gtm-prefetch-{key[:40]}", daemon=True)
+        _inflight[key] = thread
+        thread.start()
+        return thread
@@ -0,0 +1,207 @@
+# generate_slice_narratives.py
+# Purpose: Generate the executive narrative for every segment / region slice (plus all
+#   accounts) in one pass, instead of one sidebar change + Generate click per slice.
+#   1. KPIs for every slice from one grouped query (GROUPING SETS over the MRR rollup and
+#      the pipeline; exec_narrative.slice_kpis_sql)
+#   2. one prompt row per slice into AGENTS.SLICE_NARRATIVE_PROMPTS (same prompt template
+#      as the app's Generate button)
+#   3. one set-based `insert ... select AI_COMPLETE(model, prompt) from prompts` into
+#      AGENTS.EXEC_NARRATIVES; the app shows the matching row instantly on the Overview
+#
+# Usage:
+#   python sql/40_jobs/generate_slice_narratives.py                          # full MRR history
+#   python sql/40_jobs/generate_slice_narratives.py --start 2024-01-01 --end 2024-12-01
+#   python sql/40_jobs/generate_slice_narratives.py --dry-run                # KPIs only, no Cortex
+#
+# Backend: GTM_QUERY_BACKEND / GTM_LOCAL_DATA_DIR (see sql/30_streamlit+cortex/query_backend.py).
+#   The local backend has no Cortex: --mock registers an AI_COMPLETE stand-in returning the
+#   canned narrative from cortex_stream.MockStreamer, so the same SQL runs end to end.
+#   The app only matches narratives for its default window when --start/--end are left out.
+
+import argparse
+import json
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+SQL_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SQL_ROOT / "30_streamlit+cortex"))
+
+from query_backend import QueryBackend, backend_from_env, split_sql_statements  # noqa: E402
+from cortex_stream import MockStreamer  # noqa: E402
+from exec_narrative import (  # noqa: E402
+    CORTEX_MODEL,
+    LLM_PROMPT_VERSION,
+    NARRATIVES_TABLE,
+    PROMPTS_TABLE,
+    SliceContext,
+    exec_narrative_prompt,
+    narrative_ctx_key,
+    slice_contexts,
+    slice_kpis_sql,
+)
+from gtm_metrics import MetricsEngine  # noqa: E402
+from llm_cache import canonical_json  # noqa: E402
+
+
+DB = "GTM_COPILOT"
+DDL_SCRIPT = Path(__file__).resolve().parent / "slice_narratives.sql"
+ROLLUP_TBL = f"{DB}.MARTS.METRICS_MRR_BY_DIM_MONTH"
+PIPELINE_TBL = f"{DB}.MARTS.FCT_PIPELINE"
+ACCOUNTS_TBL = f"{DB}.RAW.ACCOUNTS"
+
+PROMPT_COLUMNS = [
+    "run_id", "slice_dim", "slice_value", "window_start", "window_end",
+    "ctx_key", "ctx_json", "filters_text", "prompt",
+]
+
+
+@dataclass
+class SliceResult:
+    slice_dim: str
+    slice_value: str
+    arr_latest: Optional[float]
+    nrr_latest: Optional[float]
+    win_latest: Optional[float]
+    coverage_ratio: Optional[float]
+    narrative_chars: int
+
+
+@dataclass
+class NarrativeReport:
+    run_id: str
+    window_start: str
+    window_end: str
+    model: str
+    kpi_query_s: float
+    complete_s: float
+    slices: List[SliceResult] = field(default_factory=list)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([asdict(s) for s in self.slices])
+
+
+def mrr_window(backend: QueryBackend) -> Tuple[date, date]:
+    # The app's default date range (same engine call as get_mrr_date_bounds)
+    return MetricsEngine.from_backend(backend).date_bounds()
+
+
+def install_mock_complete(backend: QueryBackend) -> None:
+    con = getattr(backend, "con", None)
+    if con is None:
+        raise SystemExit("--mock needs the local backend (GTM_QUERY_BACKEND=local)")
+    mock = MockStreamer(delay_s=0)
+    con.create_function("AI_COMPLETE", lambda model, prompt: mock.respond(prompt), ["VARCHAR", "VARCHAR"], "VARCHAR")
+
+
+def load_prompts(backend: QueryBackend, run_id: str, start_d: date, end_d: date, slices: List[SliceContext]) -> None:
+    # One multi-row insert: the prompts table is the input of the set-based completion
+    rows = ", ".join(["(" + ", ".join(["?"] * len(PROMPT_COLUMNS)) + ")"] * len(slices))
+    params: List[object] = []
+    for s in slices:
+        params += [
+            run_id, s.slice_dim, s.slice_value, start_d, end_d,
+            narrative_ctx_key(s.ctx), canonical_json(s.ctx), s.ctx["filters_text"], exec_narrative_prompt(s.ctx),
+        ]
+    backend.execute(f"insert into {PROMPTS_TABLE} ({', '.join(PROMPT_COLUMNS)}) values {rows}", params)
+
+
+def complete_all(backend: QueryBackend, run_id: str, model: str) -> None:
+    backend.execute(
+        f"""
+        insert into {NARRATIVES_TABLE} (
+            run_id, slice_dim, slice_value, window_start, window_end, model, prompt_version,
+            ctx_key, ctx_json, filters_text, narrative, generated_at
+        )
+        select
+            run_id, slice_dim, slice_value, window_start, window_end, ?, ?,
+            ctx_key, ctx_json, filters_text,
+            AI_COMPLETE('{model}', prompt),
+            current_timestamp
+        from {PROMPTS_TABLE}
+        where run_id = ?
+        """,
+        (model, LLM_PROMPT_VERSION, run_id),
+    )
+    # Prompts are only the input of this run
+    backend.execute(f"delete from {PROMPTS_TABLE} where run_id <> ?", (run_id,))
+
+
+def generate(
+    backend: QueryBackend,
+    start_d: Optional[date] = None,
+    end_d: Optional[date] = None,
+    model: str = CORTEX_MODEL,
+    dry_run: bool = False,
+) -> NarrativeReport:
+    for stmt in split_sql_statements(DDL_SCRIPT.read_text()):
+        backend.execute(stmt)
+    if start_d is None or end_d is None:
+        lo, hi = mrr_window(backend)
+        start_d, end_d = start_d or lo, end_d or hi
+
+    run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    t0 = time.perf_counter()
+    kpis = backend.query(slice_kpis_sql(ROLLUP_TBL, PIPELINE_TBL, ACCOUNTS_TBL), (start_d, end_d, start_d, end_d))
+    slices = slice_contexts(kpis, start_d, end_d)
+    kpi_s = time.perf_counter() - t0
+
+    complete_s = 0.0
+    chars = {}
+    if slices and not dry_run:
+        load_prompts(backend, run_id, start_d, end_d, slices)
+        t0 = time.perf_counter()
+        complete_all(backend, run_id, model)
+        complete_s = time.perf_counter() - t0
+        out = backend.query(
+            f"select slice_dim, slice_value, length(narrative) as n from {NARRATIVES_TABLE} where run_id = ?",
+            (run_id,),
+        )
+        chars = {(r.SLICE_DIM, r.SLICE_VALUE): int(r.N or 0) for r in out.itertuples()}
+
+    report = NarrativeReport(run_id, start_d.isoformat(), end_d.isoformat(), model, round(kpi_s, 3), round(complete_s, 3))
+    for s in slices:
+        report.slices.append(SliceResult(
+            s.slice_dim,
+            s.slice_value,
+            s.ctx["arr_latest"],
+            s.ctx["nrr_latest"],
+            s.ctx["win_latest"],
+            s.ctx["coverage_ratio"],
+            chars.get((s.slice_dim, s.slice_value), 0),
+        ))
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Batch executive narratives for every segment / region slice")
+    ap.add_argument("--start", type=date.fromisoformat, help="window start month (default: first MRR month)")
+    ap.add_argument("--end", type=date.fromisoformat, help="window end month (default: last MRR month)")
+    ap.add_argument("--model", default=CORTEX_MODEL, help=f"Cortex model (default {CORTEX_MODEL})")
+    ap.add_argument("--mock", action="store_true", help="canned narratives instead of Cortex (local backend)")
+    ap.add_argument("--dry-run", action="store_true", help="compute the slice KPIs only")
+    ap.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = ap.parse_args()
+
+    backend = backend_from_env()
+    if args.mock:
+        install_mock_complete(backend)
+
+    report = generate(backend, start_d=args.start, end_d=args.end, model=args.model, dry_run=args.dry_run)
+
+    if args.json:
+        print(json.dumps(asdict(report), indent=2))
+        return
+    print(f"run: {report.run_id}  window: {report.window_start} to {report.window_end}  model: {report.model}")
+    print(report.to_frame().to_string(index=False))
+    print(f"{len(report.slices)} slices: KPIs {report.kpi_query_s:.3f}s (one query), completions {report.complete_s:.3f}s (one statement)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+# refresh_marts.py
+# Purpose: Refresh the MRR marts incrementally instead of `create or replace` over full history.
+#   - incremental: MERGE only months >= watermark - lookback (sql/10_marts/incremental/*.sql)
+#   - full:        run the original sql/10_marts scripts for the same marts
+#   - compare:     full rebuild, then incremental over the same data; report both timings and
+#                  diff every mart against the full build (EXCEPT both ways), exit 1 on mismatch
+#
+#   The watermark is the last RAW.SUBSCRIPTION_MONTHLY_MRR month loaded, kept per mart in
+#   UTIL.MART_WATERMARKS. The chosen window is written to UTIL.MART_REFRESH_WINDOW, which
+#   every merge script reads, so the scripts also run as-is from a worksheet.
+#
+# Usage:
+#   python sql/40_jobs/refresh_marts.py                     # incremental (full if no watermark yet)
+#   python sql/40_jobs/refresh_marts.py --since 2024-06-01  # re-merge a restated range
+#   python sql/40_jobs/refresh_marts.py --full
+#   python sql/40_jobs/refresh_marts.py --compare
+#
+# Backend: GTM_QUERY_BACKEND / GTM_LOCAL_DATA_DIR (see sql/30_streamlit+cortex/query_backend.py).
+#   The local backend is in-memory, so watermarks only persist within one run (use --compare).
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+SQL_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SQL_ROOT / "30_streamlit+cortex"))
+
+from query_backend import QueryBackend, backend_from_env, split_sql_statements  # noqa: E402
+
+
+MARTS_DIR = SQL_ROOT / "10_marts"
+INCREMENTAL_DIR = MARTS_DIR / "incremental"
+CONTROL_SCRIPT = INCREMENTAL_DIR / "100_refresh_control.sql"
+
+# Mart -> (full rebuild script, incremental merge script), in dependency order
+MARTS: Dict[str, tuple] = {
+    "FCT_MRR": ("101_fct_mrr.sql", "101_fct_mrr_merge.sql"),
+    "FCT_MRR_COMPLETE": ("103_fct_mrr_complete.sql", "103_fct_mrr_complete_merge.sql"),
+    "METRICS_NRR_MONTHLY": ("104_metrics_nrr_monthly.sql", "104_metrics_nrr_monthly_merge.sql"),
+    "FCT_ARR": ("105_fct_arr.sql", "105_fct_arr_merge.sql"),
+    "METRICS_ARR_MONTHLY": ("106_metrics_arr_monthly.sql", "106_metrics_arr_monthly_merge.sql"),
+    "METRICS_GRR_MONTHLY": ("107_metrics_grr_monthly.sql", "107_metrics_grr_monthly_merge.sql"),
+    "METRICS_MRR_BY_DIM_MONTH": ("116_metrics_mrr_by_dim_month.sql", "116_metrics_mrr_by_dim_month_merge.sql"),
+}
+
+DB = "GTM_COPILOT"
+WATERMARKS = f"{DB}.UTIL.MART_WATERMARKS"
+REFRESH_WINDOW = f"{DB}.UTIL.MART_REFRESH_WINDOW"
+RAW_MRR = f"{DB}.RAW.SUBSCRIPTION_MONTHLY_MRR"
+
+
+@dataclass
+class MartResult:
+    mart: str
+    mode: str
+    rows_touched: int
+    elapsed_s: float
+
+
+@dataclass
+class RefreshReport:
+    mode: str
+    since_month: Optional[str]
+    watermark_month: Optional[str]
+    marts: List[MartResult] = field(default_factory=list)
+
+    @property
+    def elapsed_s(self) -> float:
+        return round(sum(m.elapsed_s for m in self.marts), 3)
+
+    @property
+    def rows_touched(self) -> int:
+        return sum(m.rows_touched for m in self.marts)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([asdict(m) for m in self.marts])
+
+
+def _rows_touched(df: pd.DataFrame) -> int:
+    # Snowflake DML returns "number of rows inserted/updated/deleted"; DuckDB returns "COUNT"
+    if df is None or df.empty:
+        return 0
+    row = df.iloc[0]
+    total = 0
+    for col in df.columns:
+        if col.startswith("NUMBER OF ROWS") or col == "COUNT":
+            total += int(pd.to_numeric(row[col], errors="coerce") or 0)
+    return total
+
+
+def _first_of_month(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d: date, n: int) -> date:
+    idx = d.year * 12 + d.month - 1 + n
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+def _scalar(backend: QueryBackend, sql: str) -> Optional[date]:
+    df = backend.query(sql)
+    if df.empty or pd.isna(df.iloc[0, 0]):
+        return None
+    return pd.to_datetime(df.iloc[0, 0]).date()
+
+
+def raw_watermark(backend: QueryBackend) -> Optional[date]:
+    return _scalar(backend, f"select max(month) from {RAW_MRR}")
+
+
+def stored_watermark(backend: QueryBackend) -> Optional[date]:
+    # Oldest per-mart watermark: a mart that fell behind pulls the window back for all
+    try:
+        return _scalar(
+            backend,
+            f"""
+            select min(watermark_month)
+            from (
+                select mart_name, max(watermark_month) as watermark_month
+                from {WATERMARKS}
+                group by mart_name
+            ) w
+            """,
+        )
+    except Exception:
+        return None
+
+
+def new_account_since(backend: QueryBackend) -> Optional[date]:
+    # FCT_ARR and the 116 rollup cover the full account × DIM_DATE month grid: an account
+    # not loaded yet adds a row to every calendar month, so the window has to start at the
+    # first grid month (FCT_MRR_COMPLETE is sparse, so presence is checked in FCT_ARR)
+    return _scalar(
+        backend,
+        f"""
+        select min(d.month_start)
+        from {DB}.RAW.DIM_DATE d
+        where exists (
+            select 1
+            from {DB}.RAW.ACCOUNTS a
+            left join (select distinct account_id from {DB}.MARTS.FCT_ARR) c
+                on c.account_id = a.account_id
+            where c.account_id is null
+        )
+        """,
+    )
+
+
+def run_counted(backend: QueryBackend, path: Path) -> int:
+    touched = 0
+    for stmt in split_sql_statements(path.read_text()):
+        touched += _rows_touched(backend.query(stmt))
+    return touched
+
+
+def table_rows(backend: QueryBackend, mart: str) -> int:
+    return int(backend.query(f"select count(*) as n from {DB}.MARTS.{mart}").iloc[0, 0])
+
+
+def record_watermark(backend: QueryBackend, result: MartResult, watermark: Optional[date]) -> None:
+    backend.execute(
+        f"""
+        insert into {WATERMARKS} (mart_name, watermark_month, rows_touched, refresh_mode, refreshed_at)
+        select ?, ?, ?, ?, current_timestamp
+        """,
+        (result.mart, watermark, result.rows_touched, result.mode),
+    )
+
+
+def refresh_full(backend: QueryBackend) -> RefreshReport:
+    run_counted(backend, CONTROL_SCRIPT)
+    watermark = raw_watermark(backend)
+    report = RefreshReport("full", None, watermark.isoformat() if watermark else None)
+    for mart, (full_script, _) in MARTS.items():
+        t0 = time.perf_counter()
+        backend.run_script(MARTS_DIR / full_script)
+        elapsed = time.perf_counter() - t0
+        # A full rebuild rewrites every row of the mart
+        result = MartResult(mart, "full", table_rows(backend, mart), round(elapsed, 3))
+        record_watermark(backend, result, watermark)
+        report.marts.append(result)
+    return report
+
+
+def refresh_incremental(backend: QueryBackend, since: Optional[date] = None, lookback_months: int = 1) -> RefreshReport:
+    run_counted(backend, CONTROL_SCRIPT)
+    if since is None:
+        last = stored_watermark(backend)
+        if last is None:
+            return refresh_full(backend)
+        # Re-merge the last loaded month(s): partial month loads are the common restatement
+        since = _add_months(last, 1 - lookback_months)
+    backfill = new_account_since(backend)
+    if backfill is not None and backfill < since:
+        since = backfill
+    since = _first_of_month(since)
+
+    backend.execute(f"delete from {REFRESH_WINDOW}")
+    backend.execute(f"insert into {REFRESH_WINDOW} (since_month) select ?", (since,))
+
+    watermark = raw_watermark(backend)
+    report = RefreshReport("incremental", since.isoformat(), watermark.isoformat() if watermark else None)
+    for mart, (_, merge_script) in MARTS.items():
+        t0 = time.perf_counter()
+        touched = run_counted(backend, INCREMENTAL_DIR / merge_script)
+        result = MartResult(mart, "incremental", touched, round(time.perf_counter() - t0, 3))
+        record_watermark(backend, result, watermark)
+        report.marts.append(result)
+    return report
+
+
+def snapshot_table(mart: str) -> str:
+    return f"{DB}.UTIL.{mart}__FULL"
+
+
+def except_count(backend: QueryBackend, left: str, right: str) -> int:
+    # Rows of `left` with no identical row in `right`
+    df = backend.query(f"select count(*) as n from (select * from {left} except select * from {right})")
+    return int(df.iloc[0, 0])
+
+
+def compare(backend: QueryBackend, since: Optional[date] = None, lookback_months: int = 1) -> pd.DataFrame:
+    full = refresh_full(backend)
+    # Keep the full build of every mart, then let the merges run over it
+    for mart in MARTS:
+        backend.execute(f"create or replace table {snapshot_table(mart)} as select * from {DB}.MARTS.{mart}")
+    try:
+        inc = refresh_incremental(backend, since=since, lookback_months=lookback_months)
+        diff = pd.DataFrame([
+            {
+                "mart": mart,
+                "only_full": except_count(backend, snapshot_table(mart), f"{DB}.MARTS.{mart}"),
+                "only_incremental": except_count(backend, f"{DB}.MARTS.{mart}", snapshot_table(mart)),
+            }
+            for mart in MARTS
+        ])
+    finally:
+        for mart in MARTS:
+            backend.execute(f"drop table if exists {snapshot_table(mart)}")
+
+    out = full.to_frame()[["mart", "rows_touched", "elapsed_s"]].rename(
+        columns={"rows_touched": "full_rows", "elapsed_s": "full_s"}
+    ).merge(
+        inc.to_frame()[["mart", "rows_touched", "elapsed_s"]].rename(
+            columns={"rows_touched": "incremental_rows", "elapsed_s": "incremental_s"}
+        ),
+        on="mart",
+    ).merge(diff, on="mart")
+    out["speedup"] = (out["full_s"] / out["incremental_s"].where(out["incremental_s"] > 0)).round(2)
+    out["match"] = (out["only_full"] == 0) & (out["only_incremental"] == 0)
+    out.attrs["since_month"] = inc.since_month
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Incremental (MERGE) or full refresh of the MRR marts")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--full", action="store_true", help="run the create-or-replace scripts")
+    mode.add_argument("--compare", action="store_true", help="full rebuild, then incremental; report both and diff every mart")
+    ap.add_argument("--since", type=date.fromisoformat, help="merge months >= this date (overrides the watermark)")
+    ap.add_argument("--lookback-months", type=int, default=1, help="months before the watermark to re-merge (default 1)")
+    ap.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = ap.parse_args()
+
+    backend = backend_from_env()
+
+    if args.compare:
+        out = compare(backend, since=args.since, lookback_months=args.lookback_months)
+        mismatched = out.loc[~out["match"], "mart"].tolist()
+        if args.json:
+            print(json.dumps({"since_month": out.attrs["since_month"], "marts": out.to_dict(orient="records")}, indent=2))
+        else:
+            print(f"incremental window: month >= {out.attrs['since_month']}")
+            print(out.to_string(index=False))
+            print(f"total: full {out['full_s'].sum():.3f}s vs incremental {out['incremental_s'].sum():.3f}s")
+        if mismatched:
+            print(f"MISMATCH: incremental differs from the full build for {', '.join(mismatched)}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if args.full:
+        report = refresh_full(backend)
+    else:
+        report = refresh_incremental(backend, since=args.since, lookback_months=args.lookback_months)
+
+    if args.json:
+        print(json.dumps({**asdict(report), "elapsed_s": report.elapsed_s}, indent=2))
+        return
+    print(f"mode: {report.mode}  window: {report.since_month or 'all history'}  watermark: {report.watermark_month}")
+    print(report.to_frame().to_string(index=False))
+    print(f"total: {report.rows_touched} rows touched in {report.elapsed_s:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+-- slice_narratives.sql
+-- Purpose: Prompt + output tables for batch executive narratives per segment / region slice
+--          (written by sql/40_jobs/generate_slice_narratives.py; the app reads the latest
+--           EXEC_NARRATIVES row whose slice, window, model, prompt version and ctx_key match)
+
+create table if not exists GTM_COPILOT.AGENTS.SLICE_NARRATIVE_PROMPTS (
+    run_id          varchar(64),
+    slice_dim       varchar(20),    -- ALL | SEGMENT | REGION
+    slice_value     varchar(200),
+    window_start    date,
+    window_end      date,
+    ctx_key         varchar(64),    -- fingerprint of the KPI values in ctx_json
+    ctx_json        varchar,
+    filters_text    varchar(500),
+    prompt          varchar
+);
+
+create table if not exists GTM_COPILOT.AGENTS.EXEC_NARRATIVES (
+    run_id          varchar(64),
+    slice_dim       varchar(20),
+    slice_value     varchar(200),
+    window_start    date,
+    window_end      date,
+    model           varchar(100),
+    prompt_version  varchar(20),
+    ctx_key         varchar(64),
+    ctx_json        varchar,
+    filters_text    varchar(500),
+    narrative       varchar,
+    generated_at    timestamp
+);
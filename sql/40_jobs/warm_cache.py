@@ -0,0 +1,295 @@
+# warm_cache.py
+# Purpose: Pre-fill the shared result cache (result_cache.py) so the first session after a
+#   deploy or a data load doesn't pay for startup + the KPI datasets serially.
+#   1. table resolution: one INFORMATION_SCHEMA query (also the data versions); per-table
+#      probes only when that metadata is unavailable, as in the app
+#   2. filter domains + MRR date bounds
+#   3. the KPI datasets (dataset_sql.kpi_queries) for the default filter state plus the top N
+#      segment / region combinations from UTIL.FILTER_USAGE (filter_usage.py)
+#   Each stage fans out concurrently (query_executor.run_concurrent). The SQL comes from
+#   dataset_sql.py and the data version from the same INFORMATION_SCHEMA metadata as the
+#   app, so every entry lands under the key the app's run_sql looks up.
+#
+# Usage:
+#   python sql/40_jobs/warm_cache.py                 # default state + top 10 combinations
+#   python sql/40_jobs/warm_cache.py --top 25 --days 14
+#   python sql/40_jobs/warm_cache.py --json          # per-query timings for a scheduler log
+#   python sql/40_jobs/warm_cache.py --record        # also append them to UTIL.CACHE_WARMUP_RUNS
+#
+# Backend: GTM_QUERY_BACKEND / GTM_LOCAL_DATA_DIR (see sql/30_streamlit+cortex/query_backend.py);
+#   cache store: GTM_RESULT_CACHE / GTM_RESULT_CACHE_PATH, as in the app. With the local backend
+#   set GTM_RESULT_CACHE_PATH to the path the app uses, or the job fills a different file.
+
+import argparse
+import json
+import sys
+import uuid
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+SQL_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SQL_ROOT / "30_streamlit+cortex"))
+
+import dataset_sql  # noqa: E402
+from dataset_sql import REQUIRED_TABLES, TABLE_CANDIDATES, DatasetTables  # noqa: E402
+from filter_usage import FilterUsageLog  # noqa: E402
+from query_backend import QueryBackend, backend_from_env  # noqa: E402
+from query_builder import AccountFilter  # noqa: E402
+from query_executor import run_concurrent  # noqa: E402
+from result_cache import SharedResultCache, result_cache_from_env, sql_fingerprint  # noqa: E402
+from table_versions import TRACKED_SCHEMAS, TableVersionTracker, tables_in_sql  # noqa: E402
+
+
+DB = "GTM_COPILOT"
+RUNS_TABLE = f"{DB}.UTIL.CACHE_WARMUP_RUNS"
+# Same as the app's DATA_VERSION_FALLBACK_S: without metadata both sides key on the same time bucket
+FALLBACK_TTL_S = 900
+
+RUN_COLUMNS = ["run_id", "run_at", "stage", "filter_label", "query", "status", "row_count", "elapsed_s"]
+
+
+@dataclass
+class QueryTiming:
+    stage: str
+    filter_label: str
+    query: str
+    status: str  # filled | hit | missing | error
+    row_count: int
+    elapsed_s: float
+
+
+@dataclass
+class WarmReport:
+    run_id: str
+    backend: str
+    window_start: Optional[str] = None
+    window_end: Optional[str] = None
+    filters: List[str] = field(default_factory=list)
+    stage_wall_s: Dict[str, float] = field(default_factory=dict)
+    queries: List[QueryTiming] = field(default_factory=list)
+
+    @property
+    def wall_s(self) -> float:
+        return round(sum(self.stage_wall_s.values()), 3)
+
+    @property
+    def summed_s(self) -> float:
+        return round(sum(q.elapsed_s for q in self.queries), 3)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([asdict(q) for q in self.queries])
+
+
+class CacheWarmer:
+    def __init__(self, backend: QueryBackend, cache: SharedResultCache, tracker: TableVersionTracker):
+        self.backend = backend
+        self.cache = cache
+        self.tracker = tracker
+
+    def run(self, sql: str, params: Optional[Tuple[Any, ...]] = None) -> Tuple[pd.DataFrame, str]:
+        # run_sql's shared tier: same fingerprint (SQL text, params, data version)
+        version = self.tracker.version_of(tables_in_sql(sql))
+        cache_key = sql_fingerprint(sql, params, version)
+        df = self.cache.get(cache_key)
+        if df is not None:
+            return df, "hit"
+        df = self.backend.query(sql, params)
+        self.cache.put(cache_key, version, df)
+        return df, "filled"
+
+
+def _stage(
+    report: WarmReport,
+    stage: str,
+    tasks: Dict[str, Callable[[], Tuple[Optional[pd.DataFrame], str]]],
+    labels: Dict[str, Tuple[str, str]],
+    max_workers: int,
+) -> Dict[str, Optional[pd.DataFrame]]:
+    # Failures are recorded per query; one broken dataset doesn't stop the others warming
+    statuses: Dict[str, str] = {}
+
+    def _guard(name: str, fn: Callable[[], Tuple[Optional[pd.DataFrame], str]]) -> Callable[[], Optional[pd.DataFrame]]:
+        def _task() -> Optional[pd.DataFrame]:
+            try:
+                df, statuses[name] = fn()
+                return df
+            except Exception:
+                statuses[name] = "error"
+                return None
+        return _task
+
+    results, fan_out = run_concurrent({name: _guard(name, fn) for name, fn in tasks.items()}, max_workers=max_workers)
+    report.stage_wall_s[stage] = round(fan_out.wall_s, 3)
+    for name, elapsed in fan_out.query_s.items():
+        df = results.get(name)
+        filter_label, query = labels[name]
+        report.queries.append(QueryTiming(
+            stage, filter_label, query, statuses.get(name, "error"), 0 if df is None else len(df), round(elapsed, 3),
+        ))
+    return results
+
+
+def resolve_tables(warmer: CacheWarmer, report: WarmReport, max_workers: int) -> Dict[str, Optional[str]]:
+    # Mirrors the app's resolve_tables: matched against the table metadata when there is
+    # any, else the first candidate that answers the probe wins
+    known = warmer.tracker.known_tables()
+    if known:
+        return dataset_sql.resolve_from_metadata(known)
+    found: Dict[str, Optional[str]] = {}
+
+    def _probe(key: str) -> Callable[[], Tuple[Optional[pd.DataFrame], str]]:
+        def _task() -> Tuple[Optional[pd.DataFrame], str]:
+            for fqn in TABLE_CANDIDATES[key]:
+                try:
+                    df, status = warmer.run(dataset_sql.table_probe_sql(fqn))
+                except Exception:
+                    continue
+                found[key] = fqn
+                return df, status
+            found[key] = None
+            return None, "missing"
+        return _task
+
+    tasks = {key: _probe(key) for key in TABLE_CANDIDATES}
+    _stage(report, "resolve_tables", tasks, {key: ("", key) for key in tasks}, max_workers)
+    return {key: found.get(key) for key in TABLE_CANDIDATES}
+
+
+def usage_filters(
+    backend: QueryBackend,
+    default: AccountFilter,
+    top: int,
+    days: int,
+) -> List[Tuple[str, AccountFilter]]:
+    # Default state first; usage combinations keep the other dimensions at their defaults
+    filters = [("default", default)]
+    if top <= 0:
+        return filters
+    try:
+        combos = FilterUsageLog(backend).top(top, days=days)
+    except Exception:
+        return filters
+    seen = {default}
+    for (segments, regions), _uses in combos:
+        f = replace(default, segments=segments, regions=regions)
+        if f in seen:
+            continue
+        seen.add(f)
+        filters.append((AccountFilter(segments=segments, regions=regions).cache_key(), f))
+    return filters
+
+
+def warm(
+    backend: QueryBackend,
+    cache: SharedResultCache,
+    top: int = 10,
+    days: int = 30,
+    max_workers: int = 8,
+) -> WarmReport:
+    report = WarmReport(run_id=f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}", backend=backend.name)
+    tracker = TableVersionTracker(fallback_ttl_s=FALLBACK_TTL_S)
+    tracker.check(lambda: backend.table_metadata(TRACKED_SCHEMAS), force=True)
+    report.stage_wall_s["table_metadata"] = round(tracker.stats.last_check_s or 0.0, 3)
+    report.queries.append(QueryTiming(
+        "table_metadata", "", "information_schema.tables", "filled" if tracker.tracking else "error",
+        len(tracker.known_tables()), report.stage_wall_s["table_metadata"],
+    ))
+    warmer = CacheWarmer(backend, cache, tracker)
+
+    tables = resolve_tables(warmer, report, max_workers)
+    missing = [k for k in REQUIRED_TABLES if not tables.get(k)]
+    if missing:
+        raise SystemExit(f"missing required tables: {', '.join(missing)}")
+    t = DatasetTables.from_resolved(tables)
+
+    startup: Dict[str, Callable[[], Tuple[Optional[pd.DataFrame], str]]] = {
+        "account_domains": lambda: warmer.run(dataset_sql.account_domains_sql(t)),
+        "date_bounds": lambda: warmer.run(dataset_sql.date_bounds_sql(t)),
+    }
+    reps_sql = dataset_sql.rep_domains_sql(t)
+    if reps_sql:
+        startup["rep_domains"] = lambda: warmer.run(reps_sql)
+    out = _stage(report, "startup", startup, {name: ("", name) for name in startup}, max_workers)
+    if out.get("account_domains") is None or out.get("date_bounds") is None:
+        raise SystemExit("could not load filter domains / MRR date bounds")
+
+    start_d, end_d = dataset_sql.date_bounds(out["date_bounds"])
+    report.window_start, report.window_end = start_d.isoformat(), end_d.isoformat()
+    default = dataset_sql.default_filter(dataset_sql.filter_domains(out["account_domains"], out.get("rep_domains")), t)
+    filters = usage_filters(backend, default, top, days)
+    report.filters = [label for label, _ in filters]
+
+    tasks: Dict[str, Callable[[], Tuple[Optional[pd.DataFrame], str]]] = {}
+    labels: Dict[str, Tuple[str, str]] = {}
+    for label, account_filter in filters:
+        for name, (sql, params) in dataset_sql.kpi_queries(t, start_d, end_d, account_filter).items():
+            key = f"{label}/{name}"
+            tasks[key] = lambda sql=sql, params=params: warmer.run(sql, params)
+            labels[key] = (label, name)
+    _stage(report, "kpi_datasets", tasks, labels, max_workers)
+    return report
+
+
+def record(backend: QueryBackend, report: WarmReport) -> None:
+    # One row per query per run: cold-start cost over time
+    backend.execute(
+        f"""
+        create table if not exists {RUNS_TABLE} (
+            run_id varchar,
+            run_at timestamp,
+            stage varchar,
+            filter_label varchar,
+            query varchar,
+            status varchar,
+            row_count integer,
+            elapsed_s double
+        )
+        """
+    )
+    if not report.queries:
+        return
+    run_at = datetime.now()
+    rows = ", ".join(["(" + ", ".join(["?"] * len(RUN_COLUMNS)) + ")"] * len(report.queries))
+    params: List[object] = []
+    for q in report.queries:
+        params += [report.run_id, run_at, q.stage, q.filter_label, q.query, q.status, q.row_count, q.elapsed_s]
+    backend.execute(f"insert into {RUNS_TABLE} ({', '.join(RUN_COLUMNS)}) values {rows}", params)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Pre-fill the shared result cache for the default and most-used filters")
+    ap.add_argument("--top", type=int, default=10, help="most-used segment / region combinations to warm (default 10)")
+    ap.add_argument("--days", type=int, default=30, help="usage window in days (default 30)")
+    ap.add_argument("--workers", type=int, default=8, help="concurrent queries per stage (default 8)")
+    ap.add_argument("--record", action="store_true", help=f"append per-query timings to {RUNS_TABLE}")
+    ap.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    args = ap.parse_args()
+
+    backend = backend_from_env()
+    cache = result_cache_from_env(backend)
+    if cache.store is None:
+        raise SystemExit("shared result cache is off (GTM_RESULT_CACHE); nothing to warm")
+
+    report = warm(backend, cache, top=args.top, days=args.days, max_workers=args.workers)
+    if args.record:
+        record(backend, report)
+
+    if args.json:
+        print(json.dumps({**asdict(report), "wall_s": report.wall_s, "summed_s": report.summed_s}, indent=2))
+        return
+    print(f"run: {report.run_id}  backend: {report.backend}  window: {report.window_start} to {report.window_end}")
+    print(report.to_frame().to_string(index=False))
+    counts = report.to_frame()["status"].value_counts().to_dict()
+    print(
+        f"{len(report.filters)} filter states, {len(report.queries)} queries "
+        f"({', '.join(f'{n} {s}' for s, n in sorted(counts.items()))}): "
+        f"wall {report.wall_s:.3f}s vs {report.summed_s:.3f}s serial"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+# conftest.py
+# Purpose: Put the app modules (sql/30_streamlit+cortex) and the synthetic data generator
+#   (benchmarks/) on sys.path, as the benchmarks and jobs do.
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "sql" / "30_streamlit+cortex"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
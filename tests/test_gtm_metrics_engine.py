@@ -0,0 +1,156 @@
+# test_gtm_metrics_engine.py
+# Purpose: MetricsEngine on the local DuckDB backend. The MRR datasets must be the same
+#   whether they come from the METRICS_MRR_BY_DIM_MONTH rollup or from the account-level
+#   cube, and AccountFilter must render canonical SQL + bind parameters.
+
+from dataclasses import replace
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from gtm_metrics import AccountFilter, DatasetTables, MetricsEngine, retention_quality
+
+
+@pytest.fixture(scope="module")
+def backend():
+    pytest.importorskip("duckdb")
+    from query_backend import LocalBackend
+    from synthetic_data import generate
+
+    b = LocalBackend()
+    for name, df in generate(accounts=300, months=8, end_month=date(2025, 6, 1), seed=11):
+        b.load_frame(f"GTM_COPILOT.RAW.{name}", df)
+    b.build_marts()
+    yield b
+    b.con.close()
+
+
+@pytest.fixture(scope="module")
+def engines(backend):
+    rollup = MetricsEngine.from_backend(backend, frame_cache_size=0)
+    assert rollup.tables.mrr_rollup, "rollup table should resolve"
+    cube = MetricsEngine(backend.query, replace(rollup.tables, mrr_rollup=None), frame_cache_size=0)
+    return rollup, cube
+
+
+FILTERS = [
+    AccountFilter(),
+    AccountFilter.from_selections(segments=["SMB", "Mid-Market"]),
+    AccountFilter.from_selections(regions=["NA"], industries=["Software", "Retail"]),
+]
+RANGES = [
+    (date(2024, 11, 1), date(2025, 6, 1)),  # full MRR window
+    (date(2025, 2, 1), date(2025, 5, 1)),   # first month mid-history: re-classified as New / Flat
+]
+
+
+def _same(a: pd.DataFrame, b: pd.DataFrame) -> None:
+    pd.testing.assert_frame_equal(a.reset_index(drop=True), b.reset_index(drop=True), check_dtype=False)
+
+
+@pytest.mark.parametrize("account_filter", FILTERS, ids=lambda f: f.cache_key())
+@pytest.mark.parametrize("start_d,end_d", RANGES, ids=["full", "mid"])
+@pytest.mark.parametrize("dataset", ["arr_trend", "retention_trend", "mrr_movement_summary"])
+def test_rollup_matches_cube(engines, dataset, start_d, end_d, account_filter):
+    rollup, cube = engines
+    assert rollup.mrr_rollup_monthly(start_d, end_d, account_filter) is not None
+    assert cube.mrr_rollup_monthly(start_d, end_d, account_filter) is None
+
+    expected = getattr(cube, dataset)(start_d, end_d, account_filter)
+    assert not expected.empty
+    _same(getattr(rollup, dataset)(start_d, end_d, account_filter), expected)
+
+
+def test_nrr_grr_in_expected_range(engines):
+    rollup, _ = engines
+    trend = rollup.retention_trend(*RANGES[0], AccountFilter())
+    assert (trend["GRR_PCT"] <= 100).all()
+    assert (trend["NRR_PCT"] >= trend["GRR_PCT"]).all()
+
+
+@pytest.mark.parametrize("cohort_month", [date(2025, 3, 1), date(2025, 5, 1), date(2025, 6, 1)])
+def test_retention_data_quality_rollup_matches_cube(engines, cohort_month):
+    rollup, cube = engines
+    start_d, end_d = RANGES[0]
+    expected = cube.retention_data_quality(start_d, end_d, AccountFilter(), cohort_month)
+    assert expected["cohort_accounts"] > 0
+    assert rollup.retention_data_quality(start_d, end_d, AccountFilter(), cohort_month) == expected
+
+
+def test_movement_summary_totals_match_arr_change(engines):
+    # Net change over the range = last month's MRR (every in-range month is counted)
+    rollup, _ = engines
+    start_d, end_d = RANGES[1]
+    summary = rollup.mrr_movement_summary(start_d, end_d, AccountFilter())
+    arr = rollup.arr_trend(start_d, end_d, AccountFilter())
+    assert summary["NET_MRR_CHANGE"].sum() == pytest.approx(arr["TOTAL_ARR"].iloc[-1] / 12, abs=0.1)
+
+
+# -----------------------------
+# AccountFilter
+# -----------------------------
+def test_account_filter_is_canonical():
+    a = AccountFilter.from_selections(segments=["SMB", "Enterprise", "SMB"], regions=["NA", None])
+    b = AccountFilter.from_selections(segments=["Enterprise", "SMB"], regions=["NA"])
+    assert a == b
+    assert hash(a) == hash(b)
+    assert a.segments == ("Enterprise", "SMB")
+    assert a.cache_key() == "SEGMENT=Enterprise|SMB;REGION=NA"
+    assert AccountFilter.from_selections().cache_key() == "ALL"
+
+
+def test_account_filter_sql_and_params():
+    flt = AccountFilter.from_selections(
+        segments=["SMB", "Enterprise"], industries=["Retail"], rep_teams=["SMB AE"], rep_regions=["EMEA", "APAC"]
+    )
+    sql, params = flt.to_sql()
+    assert sql == "a.segment in (?, ?) and a.industry in (?) and r.team in (?) and r.region in (?, ?)"
+    assert params == ["Enterprise", "SMB", "Retail", "SMB AE", "APAC", "EMEA"]
+
+    # No SALES_REPS: rep dimensions are dropped along with their params
+    sql, params = flt.to_sql("acc", None)
+    assert sql == "acc.segment in (?, ?) and acc.industry in (?)"
+    assert params == ["Enterprise", "SMB", "Retail"]
+
+
+def test_account_filter_values_are_never_in_sql_text():
+    flt = AccountFilter.from_selections(segments=["O'Brien; drop table x"])
+    sql, params = flt.to_sql()
+    assert "O'Brien" not in sql
+    assert params == ["O'Brien; drop table x"]
+
+
+def test_empty_filter_renders_true():
+    assert AccountFilter().to_sql() == ("1=1", [])
+
+
+def test_rollup_columns_filter():
+    flt = AccountFilter.from_selections(regions=["NA"], rep_regions=["EMEA"])
+    sql, params = flt.to_sql_columns({"REGION": "region", "REP_REGION": "rep_region"})
+    assert sql == "region in (?) and rep_region in (?)"
+    assert params == ["NA", "EMEA"]
+
+
+def test_dataset_tables_filter_sql_uses_reps_only_when_resolved():
+    flt = AccountFilter.from_selections(segments=["SMB"], rep_teams=["SMB AE"])
+    with_reps = DatasetTables("A", "F", "P", reps="R")
+    without = DatasetTables("A", "F", "P")
+    assert with_reps.filter_sql(flt) == ("a.segment in (?) and r.team in (?)", ["SMB", "SMB AE"])
+    assert without.filter_sql(flt) == ("a.segment in (?)", ["SMB"])
+
+
+# -----------------------------
+# Retention data-quality gate
+# -----------------------------
+def test_retention_quality_threshold():
+    ok = retention_quality(date(2025, 3, 1), 100, 95)
+    assert ok["next_month_coverage_pct"] == 95.0
+    assert ok["retention_interpretable"] is True
+
+    low = retention_quality(date(2025, 3, 1), 100, 50)
+    assert low["retention_interpretable"] is False
+
+    missing = retention_quality(None, None, None)
+    assert missing["retention_interpretable"] is False
+    assert missing["cohort_accounts"] is None
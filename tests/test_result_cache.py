@@ -0,0 +1,70 @@
+# test_result_cache.py
+# Purpose: SharedResultCache write path. A miss in get_or_query returns the query result and
+#   stores it on the background writer; put() stays synchronous (warm_cache.py); queued writes
+#   past max_pending_writes are dropped rather than blocking the request.
+
+import threading
+
+import pandas as pd
+import pytest
+
+from result_cache import DiskResultStore, SharedResultCache
+
+pytest.importorskip("pyarrow")
+
+FRAME = pd.DataFrame({"account_id": ["A1", "A2"], "arr": [1200.0, 3400.0]})
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DiskResultStore(str(tmp_path / "results.sqlite"))
+
+
+class BlockingStore:
+    # Wraps a store; put() waits until the test releases it
+    def __init__(self, inner):
+        self.inner = inner
+        self.release = threading.Event()
+
+    def put(self, row):
+        self.release.wait(5)
+        self.inner.put(row)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+def test_get_or_query_stores_miss_in_background(store):
+    cache = SharedResultCache(store, ttl_s=3600, max_bytes=1 << 20)
+    calls = []
+
+    def query():
+        calls.append(1)
+        return FRAME
+
+    first = cache.get_or_query("select 1", None, "v1", query)
+    assert cache.flush()
+    second = cache.get_or_query("select 1", None, "v1", query)
+    pd.testing.assert_frame_equal(first, FRAME)
+    pd.testing.assert_frame_equal(second, FRAME)
+    assert len(calls) == 1
+    assert cache.stats.stores == 1 and cache.stats.hits == 1
+
+
+def test_put_is_synchronous(store):
+    cache = SharedResultCache(store, ttl_s=3600, max_bytes=1 << 20)
+    cache.put("k", "v1", FRAME)
+    assert cache.stats.stores == 1
+    pd.testing.assert_frame_equal(cache.get("k"), FRAME)
+
+
+def test_backed_up_writes_are_skipped(store):
+    slow = BlockingStore(store)
+    cache = SharedResultCache(slow, ttl_s=3600, max_bytes=1 << 20, max_pending_writes=2)
+    for i in range(5):
+        result = cache.get_or_query(f"select {i}", None, "v1", lambda: FRAME)
+        pd.testing.assert_frame_equal(result, FRAME)
+    assert cache.stats.skipped == 3
+    slow.release.set()
+    assert cache.flush()
+    assert cache.stats.stores == 2